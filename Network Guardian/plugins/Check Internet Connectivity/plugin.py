@@ -1,5 +1,5 @@
-from urllib.error import URLError
-from urllib.request import urlopen
+import asyncio
+from urllib.parse import urlparse
 
 from networkguardian.framework.plugin import AbstractPlugin, PluginCategory, executor
 from networkguardian.framework.registry import register_plugin
@@ -10,29 +10,53 @@ class CheckInternetConnectivityPlugin(AbstractPlugin):
     """
         Internet Connectivity Plugin v1.0
         This plugin determines whether the local machine has access to the internet.
-        It works by using the urllib module which loops through three different URL’s, tries to connect to them and then returns the results back to the user.
+        It works by connecting to three different URL’s at the same time, sending a request to each of them and then returns the results back to the user.
     """
 
     @executor("template.html")
-    def execute(self):
+    async def execute(self):
         """
         Function is used to return whether the local machine has internet access
 
-        Works by looping through multiple URL's and connecting to them, if one successfully connects
-        it will return True, otherwise False
+        Works by connecting to multiple URL's concurrently, each URL which responds is marked as True, otherwise False
         """
 
-        urls = {
-            "https://google.co.uk": False,
-            "https://youtube.com": False,
-            "https://bbc.co.uk": False
-        }
+        urls = [
+            "https://google.co.uk",
+            "https://youtube.com",
+            "https://bbc.co.uk"
+        ]
 
-        for url in urls.keys():  # loop through all URL's
-            try:
-                urlopen(url, timeout=5)
-                urls[url] = True  # if connect, internet is working, return True
-            except URLError:
-                continue
+        results = await asyncio.gather(*(self.connect(url) for url in urls))
+
+        return {"results": dict(zip(urls, results))}
+
+    @staticmethod
+    async def connect(url: str, timeout: int = 5) -> bool:
+        """
+        Sends a HEAD request to the URL
 
-        return {"results": urls}
\ No newline at end of file
+        :return: True if the server responded within the timeout, False if not
+        """
+        url = urlparse(url)
+        secure = url.scheme == "https"
+
+        async def request() -> bytes:
+            reader, writer = await asyncio.open_connection(url.hostname, url.port or (443 if secure else 80),
+                                                           ssl=secure)
+            try:
+                writer.write(f"HEAD / HTTP/1.1\r\nHost: {url.hostname}\r\nConnection: close\r\n\r\n".encode())
+                await writer.drain()
+                return await reader.readline()
+            finally:
+                writer.close()
+                try:
+                    await writer.wait_closed()  # the transport is closed before the shared loop moves on
+                except OSError:  # the connection failed, it is closed either way
+                    pass
+
+        try:
+            status_line = await asyncio.wait_for(request(), timeout)  # connecting, the request and closing
+            return status_line.startswith(b"HTTP/")
+        except (OSError, asyncio.TimeoutError):
+            return False
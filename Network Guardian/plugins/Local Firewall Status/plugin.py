@@ -1,29 +1,26 @@
-import subprocess
-
-from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, SystemPlatform, executor
+from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, SystemPlatform, executor, WorkClass
 from networkguardian.framework.registry import register_plugin
 
 
 @register_plugin("Local Firewall Status", PluginCategory.NETWORK, "Velislav", 1.0)
 class LocalFirewallStatus(AbstractPlugin):
 
-    @executor("mac.template.html", SystemPlatform.MAC_OS)
-    def mac(self):
-        process = subprocess.Popen(["defaults", "read", "/Library/Preferences/com.apple.alf", "globalstate"],
-                                   stdout=subprocess.PIPE)
+    @executor("mac.template.html", SystemPlatform.MAC_OS, work_class=WorkClass.SUBPROCESS)
+    def mac(self, cancellation):
+        output = cancellation.run(["defaults", "read", "/Library/Preferences/com.apple.alf", "globalstate"])[0]
         """ Checks the state of the firewall in a command line and returns the result back to the user. """
 
-        return {"firewall": bool(int(process.communicate()[0].rstrip()))}
+        return {"firewall": bool(int(output.rstrip()))}
 
-    @executor("windows.template.html", SystemPlatform.WINDOWS)
-    def windows(self):
+    @executor("windows.template.html", SystemPlatform.WINDOWS, work_class=WorkClass.SUBPROCESS)
+    def windows(self, cancellation):
         """
         Windows Firewall Checker
         """
-        process = subprocess.Popen(["netsh", "advfirewall", "show", "allprofiles", "state"], stdout=subprocess.PIPE)
+        output = cancellation.run(["netsh", "advfirewall", "show", "allprofiles", "state"])[0]
 
         """ Checks whether or not the Firewall State is ON or OFF and Returns the result in a table. """
-        output = process.communicate()[0].decode()
+        output = output.decode()
         lines = output.split("\n")
         domain = "ON" in lines[3]
         private = "ON" in lines[7]
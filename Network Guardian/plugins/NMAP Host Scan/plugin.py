@@ -1,48 +1,60 @@
-import ipaddress
+import shlex
+import shutil
 
-import psutil
 from netaddr import IPNetwork
 from nmap import nmap
 
-from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor
+from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor, WorkClass
 from networkguardian.framework.registry import register_plugin
 
 
+def nmap_path():
+    """Finds the nmap binary in the same places python-nmap searches, python-nmap only keeps the path it found as a
+    private attribute"""
+    for path in ("nmap", "/usr/bin/nmap", "/usr/local/bin/nmap", "/sw/bin/nmap", "/opt/local/bin/nmap"):
+        found = shutil.which(path)
+        if found is not None:
+            return found
+
+    raise nmap.PortScannerError("nmap program was not found in path")
+
+
 @register_plugin("NMAP Host Scan", PluginCategory.NETWORK, "Owen", 1.0)
 class HostScanner(AbstractPlugin):
     """
         Uses Nmap to do a network scan and display information about each machine on the network
     """
 
+    volatile = ("uptime",)  # nmap's estimate of the uptime and last boot changes every scan
+
     @staticmethod
-    def get_networks():
-        """Uses psutil to go through all network interfaces and excludes interfaces that are of no use such as
-        loopbacks or if the interface is down"""
+    def get_networks(snapshot):
+        """Uses the system snapshot to go through all network interfaces and excludes interfaces that are of no use
+        such as loopbacks or if the interface is down"""
         network_list = []
-        for interface_name, interfaces in psutil.net_if_addrs().items():
-            for interface in interfaces:
-                try:
-                    # Validate Interface / Network
-                    assert not ipaddress.ip_address(interface.address).is_loopback  # if loopback
-                    assert not ipaddress.ip_address(interface.address).is_link_local  # if  link local
-                    assert psutil.net_if_stats()[interface_name].isup  # if disabled (down)
-                except (AssertionError, ValueError):  # not valid ip address
-                    continue  # goto next one
-
-                ipn = IPNetwork(f"{interface.address}/{interface.netmask}")
+        for interface_name, interface in snapshot.usable_addresses():
+            ipn = IPNetwork(f"{interface.address}/{interface.netmask}")
 
-                network_list.append(ipn)
+            network_list.append(ipn)
 
         return network_list
 
-    @executor("template.html", requires_elevation=True)
-    def execute(self):
+    @staticmethod
+    def scan(nm, hosts, arguments, cancellation):
+        """Runs an nmap scan through the cancellation token so nmap is killed if the plugin is cancelled or runs past
+        its deadline, the output is then parsed by python-nmap in the same way as PortScanner.scan"""
+        args = [nmap_path(), "-oX", "-"] + shlex.split(hosts) + shlex.split(arguments)
+        output, error = cancellation.run(args)
+        return nm.analyse_nmap_xml_scan(nmap_xml_output=output, nmap_err=error.decode())
+
+    @executor("template.html", requires_elevation=True, produces="hosts", work_class=WorkClass.SUBPROCESS)
+    def execute(self, snapshot, cancellation):
         temp_dict = {}
         new_dict = {}
         c = 0
         d = 0
 
-        networks = self.get_networks()
+        networks = self.get_networks(snapshot)
         nm = nmap.PortScanner()
         """Creates a dictionary the size of all the network interfaces in use"""
         for network in networks:
@@ -52,7 +64,13 @@ class HostScanner(AbstractPlugin):
         """Starts a nmap scan for a network interface and then stores all the information into a dictionary,
         then loops and goes through next interface in the list"""
         for network in networks:
-            temp_dict[d] = nm.scan(hosts=str(network.cidr), arguments="-O -F -T5")
+            restored = cancellation.restore(str(network.cidr))  # scanned before the report was resumed
+            if restored is not None:
+                new_dict[d] = restored
+                d += 1
+                continue
+
+            temp_dict[d] = self.scan(nm, str(network.cidr), "-O -F -T5", cancellation)
             keys = temp_dict[d]['scan'].keys()
             keys = list(keys)
             i = 0
@@ -63,5 +81,15 @@ class HostScanner(AbstractPlugin):
                     new_dict[d][keys[i]] = temp_dict[d]['scan'][keys[i]]
                     x += 1
                 i += 1
+            cancellation.checkpoint(str(network.cidr), new_dict[d])  # don't scan the network again if resumed
             d += 1
+            cancellation.partial({'parent_dict': new_dict})  # keep the networks scanned so far if cancelled
         return {'parent_dict': new_dict}
+
+    def rows(self, data):
+        """Networks are numbered in the order the interfaces were found, so rows are keyed by the address of the host,
+        the uptime is left out when comparing reports"""
+        return {
+            (address,): {k: v for k, v in host.items() if k not in self.volatile}
+            for hosts in data['parent_dict'].values() for address, host in hosts.items()
+        }
@@ -1,19 +1,40 @@
+import shlex
+import shutil
 import socket
 
 from nmap import nmap
 
-from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor
+from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor, WorkClass
 from networkguardian.framework.registry import register_plugin
 
 
+def nmap_path():
+    """Finds the nmap binary in the same places python-nmap searches, python-nmap only keeps the path it found as a
+    private attribute"""
+    for path in ("nmap", "/usr/bin/nmap", "/usr/local/bin/nmap", "/sw/bin/nmap", "/opt/local/bin/nmap"):
+        found = shutil.which(path)
+        if found is not None:
+            return found
+
+    raise nmap.PortScannerError("nmap program was not found in path")
+
+
 @register_plugin("TCP Scan", PluginCategory.NETWORK, "Owen", 1.0)
 class TCPScanner(AbstractPlugin):
     """
        Uses NMAP to scan the current machines open TCP ports
     """
 
-    @executor("template.html")
-    def execute(self):
+    @staticmethod
+    def scan(nm, hosts, arguments, cancellation):
+        """Runs an nmap scan through the cancellation token so nmap is killed if the plugin is cancelled or runs past
+        its deadline, the output is then parsed by python-nmap in the same way as PortScanner.scan"""
+        args = [nmap_path(), "-oX", "-"] + shlex.split(hosts) + shlex.split(arguments)
+        output, error = cancellation.run(args)
+        return nm.analyse_nmap_xml_scan(nmap_xml_output=output, nmap_err=error.decode())
+
+    @executor("template.html", work_class=WorkClass.SUBPROCESS)
+    def execute(self, cancellation):
         nested_dict = {}
         new_dict = {}
         i = 0
@@ -22,7 +43,7 @@ class TCPScanner(AbstractPlugin):
         ip_addr = socket.gethostbyname(hostname)
 
         nm = nmap.PortScanner()
-        a = nm.scan(ip_addr)
+        a = self.scan(nm, ip_addr, "-sV", cancellation)
         nested_dict.update({'tcp': {'Port': a['scan'][ip_addr]['tcp']}})
         keys = nested_dict['tcp']['Port'].keys()
         keys = list(keys)
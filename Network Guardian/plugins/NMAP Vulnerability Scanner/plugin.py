@@ -1,6 +1,3 @@
-import ipaddress
-
-import psutil
 from netaddr import IPNetwork
 
 from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor
@@ -11,23 +8,14 @@ from networkguardian.framework.registry import register_plugin
 class NMAPVulnerabilityScanner(AbstractPlugin):
 
     @staticmethod
-    def get_networks():
+    def get_networks(snapshot):
         networks = {}
-        for interface_name, interfaces in psutil.net_if_addrs().items():
-            for interface in interfaces:
-                try:
-                    # Validate Interface / Network
-                    assert not ipaddress.ip_address(interface.address).is_loopback  # if loopback
-                    assert not ipaddress.ip_address(interface.address).is_link_local  # if  link local
-                    assert psutil.net_if_stats()[interface_name].isup  # if disabled (down)
-                except (AssertionError, ValueError):  # not valid ip address
-                    continue  # goto next one
-
-                ipn = IPNetwork(f"{interface.address}/{interface.netmask}")
-                networks[interface_name] = ipn
+        for interface_name, interface in snapshot.usable_addresses():
+            ipn = IPNetwork(f"{interface.address}/{interface.netmask}")
+            networks[interface_name] = ipn
 
         return networks
 
     @executor("template.html")
-    def execute(self):
+    def execute(self, snapshot):
         pass
\ No newline at end of file
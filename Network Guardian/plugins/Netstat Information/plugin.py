@@ -15,9 +15,9 @@ class NetStatInformation(AbstractPlugin):
     """
 
     @executor("template.html")
-    def execute(self):
+    def execute(self, snapshot):
         """
-            Get information using psutil and stores into variables
+            Get information using psutil and the system snapshot, and stores into variables
         """
         AF_INET6 = getattr(socket, 'AF_INET6', object())
         proto_map = {
@@ -29,10 +29,8 @@ class NetStatInformation(AbstractPlugin):
 
         main_list = {}
         i = 1
-        proc_names = {}
+        proc_names = snapshot.processes
 
-        for p in psutil.process_iter(attrs=['pid', 'name']):
-            proc_names[p.info['pid']] = p.info['name']
         for c in psutil.net_connections(kind='inet'):
             laddr = "%s:%s" % (c.laddr)
             if c.raddr:
@@ -49,3 +47,21 @@ class NetStatInformation(AbstractPlugin):
                 i += 1
 
         return {"result": main_list}
+
+    def rows(self, data):
+        """
+            Connections are numbered in the order psutil lists them, so rows are keyed by the connection itself. The
+            same connection can be listed more than once, i.e. by each process sharing the socket, so repeated
+            connections are also keyed by how many times they have been listed, ordered by program
+        """
+        rows = {}
+        connections = sorted(data["result"].values(), key=lambda c: (str(c["ProgramName"]), str(c["Status"])))
+        for c in connections:
+            key = (c["Protocol"], c["LocalAddress"], c["RemoteAddress"])
+            occurrence = 1
+            while key in rows:
+                occurrence += 1
+                key = (c["Protocol"], c["LocalAddress"], c["RemoteAddress"], occurrence)
+            rows[key] = c
+
+        return rows
@@ -15,10 +15,12 @@ class NetworkInterfaceInformation(AbstractPlugin):
         It works by gathering information about all the network interfaces and then it puts it to a list which is then passed on to the table which shows things such as whether the device is online or not, the IP, Broadcast Address, netmask, mac address, packets information, speed, dropped packets and more.
     """
 
+    counters = ("bytesin", "packetsin", "errorsin", "dropsin", "bytesout", "packetsout", "errorsout", "dropsout")
+
     @executor("template.html")
-    def execute(self):
+    def execute(self, snapshot):
         """
-        Using psutil it gathers all the information required and puts it all into a list so it
+        Using the system snapshot it gathers all the information required and puts it all into a list so it
         can be used in the template to be displayed into a table.
         """
         af_map = {
@@ -35,9 +37,9 @@ class NetworkInterfaceInformation(AbstractPlugin):
 
         main_list = {}
 
-        stats = psutil.net_if_stats()
-        io_counters = psutil.net_io_counters(pernic=True)
-        for nic, addrs in psutil.net_if_addrs().items():
+        stats = snapshot.interface_stats
+        io_counters = snapshot.io_counters
+        for nic, addrs in snapshot.interfaces.items():
             st = stats[nic]
             io = io_counters[nic]
 
@@ -67,3 +69,12 @@ class NetworkInterfaceInformation(AbstractPlugin):
                     main_list[nic][key_netmask] = addr.netmask or "-"
 
         return {"result": main_list}
+
+    def rows(self, data):
+        """
+        The packet counters change every time the plugin is run, so they are left out when comparing reports
+        """
+        return {
+            (nic,): {k: v for k, v in interface.items() if k not in self.counters}
+            for nic, interface in data["result"].items()
+        }
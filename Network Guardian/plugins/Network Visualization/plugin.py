@@ -1,14 +1,12 @@
-import ipaddress
 import xml
 
 import networkx
-import psutil
 from libnmap.parser import NmapParser
 from libnmap.process import NmapProcess
 from netaddr import IPNetwork
 from networkx.readwrite import json_graph
 
-from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor
+from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor, WorkClass
 from networkguardian.framework.registry import register_plugin
 
 
@@ -16,20 +14,11 @@ from networkguardian.framework.registry import register_plugin
 class NetworkVisualization(AbstractPlugin):
 
     @staticmethod
-    def get_networks():
+    def get_networks(snapshot):
         networks = {}
-        for interface_name, interfaces in psutil.net_if_addrs().items():
-            for interface in interfaces:
-                try:
-                    # Validate Interface / Network
-                    assert not ipaddress.ip_address(interface.address).is_loopback  # if loopback
-                    assert not ipaddress.ip_address(interface.address).is_link_local  # if  link local
-                    assert psutil.net_if_stats()[interface_name].isup  # if disabled (down)
-                except (AssertionError, ValueError):  # not valid ip address
-                    continue  # goto next one
-
-                ipn = IPNetwork(f"{interface.address}/{interface.netmask}")
-                networks[interface_name] = ipn
+        for interface_name, interface in snapshot.usable_addresses():
+            ipn = IPNetwork(f"{interface.address}/{interface.netmask}")
+            networks[interface_name] = ipn
 
         return networks
 
@@ -42,45 +31,77 @@ class NetworkVisualization(AbstractPlugin):
         }
         return data
 
-    @executor("template.html", requires_elevation=True)
-    def execute(self):
-        networks = self.get_networks()
-        graph = networkx.Graph()
-        print(networks)
+    @staticmethod
+    def get_scanned_node_data(host):
+        """Converts a host scanned by the NMAP Host Scan plugin into the same node data as get_node_data"""
+        os_matches = host.get("osmatch", [])
+        data = {
+            "hostname": [hostname["name"] for hostname in host.get("hostnames", []) if hostname.get("name")],
+            "ports": [(port, "tcp") for port in host.get("tcp", {})],
+            "os": os_matches[0]["name"] if os_matches else "",
+        }
+        return data
 
+    def discover_hosts(self, networks, cancellation):
+        """Scans each network for hosts which are up, yielding the address and node data of each host"""
         for interface_name, network in networks.items():
             # Host Discovery
-            network_scan = NmapProcess(str(network), options="-A -n")
+            network_scan = cancellation.register(NmapProcess(str(network), options="-A -n"))
             network_scan.run()
+            cancellation.check()
             parsed = NmapParser.parse(network_scan.stdout)
 
-            # Trace-route
-            traceroute_scan = NmapProcess("google.com", options="--traceroute")
-            traceroute_scan.run()
-            collection = xml.etree.ElementTree.fromstring(traceroute_scan.stdout)
-            traceroute_nodes = collection.getiterator("hop")
+            for host in parsed.hosts:
+                if host.is_up():
+                    yield host.address, self.get_node_data(host)
+
+    def get_scanned_hosts(self, hosts):
+        """Yields the address and node data of each host which is up from the data produced by NMAP Host Scan"""
+        for network_hosts in hosts["parent_dict"].values():
+            for address, host in network_hosts.items():
+                if host.get("status", {}).get("state") == "up":
+                    yield address, self.get_scanned_node_data(host)
 
-            trace_list = []
-            pre_node = ''
+    @staticmethod
+    def trace_route(graph, cancellation):
+        """Adds each hop between the system and the internet to the graph, returning the list of hops"""
+        traceroute_scan = cancellation.register(NmapProcess("google.com", options="--traceroute"))
+        traceroute_scan.run()
+        cancellation.check()
+        collection = xml.etree.ElementTree.fromstring(traceroute_scan.stdout)
+        traceroute_nodes = collection.getiterator("hop")
 
-            for node in traceroute_nodes:
-                print(node.attrib)
+        trace_list = []
+        pre_node = ''
 
-                trace_list.append(node.attrib["ipaddr"])
-                graph.add_node(node.attrib["ipaddr"])
+        for node in traceroute_nodes:
+            trace_list.append(node.attrib["ipaddr"])
+            graph.add_node(node.attrib["ipaddr"])
 
-                if pre_node != '':
-                    print("pre node")
-                    graph.add_edge(node.attrib["ipaddr"], pre_node)
+            if pre_node != '':
+                graph.add_edge(node.attrib["ipaddr"], pre_node)
 
-                pre_node = node.attrib["ipaddr"]
+            pre_node = node.attrib["ipaddr"]
 
-            for host in parsed.hosts:
-                if host.is_up():
-                    graph.add_node(host.address, **self.get_node_data(host))
-                    if len(trace_list) > 0:
-                        print("edge")
-                        graph.add_edge(host.address, trace_list[0])
+        return trace_list
+
+    @executor("template.html", requires_elevation=True, consumes=("hosts",), run_in_process=True,
+              work_class=WorkClass.CPU)
+    def execute(self, snapshot, cancellation, hosts=None):
+        graph = networkx.Graph()
+
+        # Trace-route, the same for every network so only needs to be performed once
+        trace_list = self.trace_route(graph, cancellation)
+
+        if hosts is None:  # NMAP Host Scan isn't part of the report, so the hosts need to be discovered
+            discovered_hosts = self.discover_hosts(self.get_networks(snapshot), cancellation)
+        else:  # reuse the hosts already discovered by NMAP Host Scan
+            discovered_hosts = self.get_scanned_hosts(hosts)
+
+        for address, node_data in discovered_hosts:
+            graph.add_node(address, **node_data)
+            if len(trace_list) > 0:
+                graph.add_edge(address, trace_list[0])
 
         return {
             "graph_json": json_graph.node_link_data(graph)
@@ -1,6 +1,5 @@
 import ipaddress
 
-import psutil
 from netaddr import IPNetwork
 
 from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor
@@ -11,9 +10,9 @@ from networkguardian.framework.registry import register_plugin
 class SubnetInformation(AbstractPlugin):
 
     @executor("template.html")
-    def execute(self):
+    def execute(self, snapshot):
         networks = {}
-        for interface_name, interfaces in psutil.net_if_addrs().items():
+        for interface_name, interfaces in snapshot.interfaces.items():
             for interface in interfaces:
 
                 # Validate
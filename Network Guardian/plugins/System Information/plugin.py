@@ -1,7 +1,4 @@
 import os
-import platform
-
-import psutil
 
 from networkguardian.framework.plugin import AbstractPlugin, PluginCategory, executor
 from networkguardian.framework.registry import register_plugin
@@ -15,14 +12,15 @@ class SystemInformationPlugin(AbstractPlugin):
     """
 
     @executor("template.html")
-    def execute(self):
+    def execute(self, snapshot):
         # get information required
-        system_name = platform.node()
+        information = snapshot.platform_information
+        system_name = information["system_name"]
         username = os.getlogin()
-        system_platform = platform.platform()
-        system = platform.system()
-        processor = platform.processor()
-        memory = self.get_memory()
+        system_platform = information["platform"]
+        system = information["system"]
+        processor = information["processor"]
+        memory = self.get_memory(information["memory"])
         # return information to be formatted in the template with appropriate data label
         return {
             "information": {
@@ -35,14 +33,14 @@ class SystemInformationPlugin(AbstractPlugin):
             }
         }
 
-    def get_memory(self):
+    def get_memory(self, total_memory):
         """
         Converts bytes to a string representation providing the size to 2 decimal points, and the correct label for
         kilobytes, megabytes, gigabytes, and terabytes
 
+        :param total_memory: total memory installed in bytes
         :return:
         """
-        total_memory = psutil.virtual_memory().total
         size, power = self.format_bytes(total_memory)
         return f'{size:.2f} {power}'
 
@@ -1,9 +1,10 @@
 import csv
+import os
 from io import StringIO
 
 import psutil
 
-from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor, SystemPlatform
+from networkguardian.framework.plugin import PluginCategory, AbstractPlugin, executor, SystemPlatform, WorkClass
 from networkguardian.framework.registry import register_plugin
 
 
@@ -15,11 +16,26 @@ class UserEnumerationPlugin(AbstractPlugin):
 
     """
 
-    @executor("windows.template.html", SystemPlatform.WINDOWS)
-    def windows(self):
-        import subprocess
-        process = subprocess.Popen(["wmic", "useraccount", "list", "full", "/format:csv"], stdout=subprocess.PIPE)
-        users_output = process.communicate()[0]
+    account_files = ("/etc/passwd", "/etc/group")  # changed whenever a user or group is added on Linux and Mac OS X
+
+    def fingerprint(self):
+        """
+        Users rarely change so the results are cached, on Linux and Mac OS X the cache is also invalidated whenever
+        the account files are modified
+        """
+        return ",".join(str(os.stat(path).st_mtime_ns) for path in self.account_files if os.path.exists(path))
+
+    def rows(self, data):
+        """
+        Users listed by wmic are keyed by their name, the users listed on Linux and Mac OS X use the default rows
+        """
+        if "reader" in data:
+            return {(user.get("Name"),): user for user in data["reader"]}
+        return None
+
+    @executor("windows.template.html", SystemPlatform.WINDOWS, work_class=WorkClass.SUBPROCESS, cache_ttl=300)
+    def windows(self, cancellation):
+        users_output = cancellation.run(["wmic", "useraccount", "list", "full", "/format:csv"])[0]
         file_stream = StringIO(users_output.decode())
         psutil.users()
         for i in range(2):
@@ -29,7 +45,7 @@ class UserEnumerationPlugin(AbstractPlugin):
 
         return {"reader": list(reader)}
 
-    @executor("linux.template.html", SystemPlatform.LINUX)
+    @executor("linux.template.html", SystemPlatform.LINUX, cache_ttl=300)
     def linux(self):
         import grp
         return {
@@ -38,7 +54,7 @@ class UserEnumerationPlugin(AbstractPlugin):
             }
         }
 
-    @executor("mac.template.html", SystemPlatform.MAC_OS)
+    @executor("mac.template.html", SystemPlatform.MAC_OS, cache_ttl=300)
     def mac(self):
         return {
             "users": [
@@ -1,4 +1,7 @@
+import multiprocessing
+
 from networkguardian.__main__ import cli
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # required for plugin worker processes when frozen
     cli()
\ No newline at end of file
@@ -1,8 +1,14 @@
+import sys
+
+from networkguardian.framework import profiling  # only uses the standard library
+
+if profiling.requested(sys.argv[1:]):  # started before anything else is imported so every import is timed
+    profiling.start_profile()
+
 # noinspection PyUnresolvedReferences
 import encodings.idna  # needed to fix random LookupError when starting when frozen
 import logging
 import os
-import sys
 
 application_name = "Network Guardian"
 application_version = 1.0
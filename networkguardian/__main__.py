@@ -1,3 +1,4 @@
+import json
 import logging
 import os
 import sys
@@ -7,18 +8,31 @@ import click
 import psutil
 
 from networkguardian import logger, application_frozen, application_directory, plugins_directory, reports_directory
+from networkguardian.framework import profiling
+from networkguardian.framework.diff import diff_reports, format_key, format_row
 from networkguardian.framework.registry import registered_plugins, load_plugins, import_external_plugins
-from networkguardian.framework.report import load_reports, processing_reports, start_quick_report
+from networkguardian.framework.jobs import jobs
+from networkguardian.framework.report import load_reports, start_quick_report, resume_report, get_report
+from networkguardian.framework.retention import start_compactor
 from networkguardian.gui.server import start_server, is_alive
 from networkguardian.gui.webview import open_window
 
 
 @click.group(invoke_without_command=True)
 @click.option('--debug/--no-debug', default=False)
+@click.option(profiling.startup_option, 'profile_startup', is_flag=True,
+              help="Print where the time is spent while starting")
+@click.option(profiling.trace_option, 'profile_trace', type=click.Path(dir_okay=False),
+              help="Write the startup profile as a Chrome trace to the file")
 @click.pass_context
-def cli(ctx, debug):
+def cli(ctx, debug, profile_startup, profile_trace):
     enable_debugging(debug)
 
+    if profile_startup or profile_trace:
+        profiling.record_phase("Module Imports")
+        profiling.start_profile().trace_path = profile_trace
+        ctx.call_on_close(profiling.finish_profile)  # commands which don't start the server finish here
+
     logger.debug('Starting Network Guardian')
 
     create_directories()
@@ -29,11 +43,13 @@ def cli(ctx, debug):
 
     # Import Plugins from directory
     logger.debug('Importing External Plugins')
-    import_external_plugins(plugins_directory)
+    with profiling.measure("Plugin Import"):
+        import_external_plugins(plugins_directory)
 
     # Load Plugins
     logger.debug("Loading Plugins")
-    load_plugins()
+    with profiling.measure("Plugin Load"):
+        load_plugins()
 
     total_plugins = len(registered_plugins)
     total_loaded = len([p for p in registered_plugins.values() if p.loaded])
@@ -42,21 +58,80 @@ def cli(ctx, debug):
     logger.debug(f'Loaded {total_plugins} plugins ({total_loaded} successfully, {total_failed} failed)')
 
     if ctx.invoked_subcommand is None:
-        gui()  # Start GUI if no specific command specified
+        ctx.invoke(gui)  # Start GUI if no specific command specified
 
 
 @cli.command()
 def quick_report():
     print("Starting Report")
-    thread_id = start_quick_report()
-    thread = processing_reports[thread_id]
+    wait_for_report(start_quick_report())
+
+
+@cli.command()
+@click.argument('report_id', type=int)
+def resume(report_id):
+    with profiling.measure("Report Loading"):
+        load_reports()
+
+    job_id = resume_report(report_id)
+    if job_id is None:
+        print(f"Report {report_id} can't be resumed, either every plugin finished or the report doesn't exist")
+        sys.exit(1)
+
+    print("Resuming Report")
+    wait_for_report(job_id)
+
+
+@cli.command()
+@click.argument('before_id', type=int)
+@click.argument('after_id', type=int)
+@click.option('--json', 'as_json', is_flag=True, help="Print the changes as JSON")
+def diff(before_id, after_id, as_json):
+    with profiling.measure("Report Loading"):
+        load_reports()
+
+    before = get_report(before_id)
+    after = get_report(after_id)
+    if before is None or after is None:
+        print(f"Report {before_id if before is None else after_id} doesn't exist")
+        sys.exit(1)
+
+    diffs = diff_reports(before, after)
+    if as_json:
+        print(json.dumps([plugin_diff.to_dict() for plugin_diff in diffs], indent=2))
+        return
+
+    for plugin_diff in diffs:
+        status = plugin_diff.after_status
+        if plugin_diff.status_changed:
+            status = f"{plugin_diff.before_status} -> {plugin_diff.after_status}"
+
+        print(f"{plugin_diff.name} ({status}): {len(plugin_diff.added)} added, {len(plugin_diff.removed)} removed, "
+              f"{len(plugin_diff.changed)} changed, {plugin_diff.unchanged} unchanged")
+
+        for key, row in plugin_diff.added.items():
+            print(f"  + {format_key(key)}: {format_row(row)}")
+        for key, row in plugin_diff.removed.items():
+            print(f"  - {format_key(key)}: {format_row(row)}")
+        for key, (before_row, after_row) in plugin_diff.changed.items():
+            print(f"  ~ {format_key(key)}: {format_row(before_row)} -> {format_row(after_row)}")
+
+
+def wait_for_report(job_id):
+    """
+    Function shows the progress of a report until it has finished
+    :param job_id: Job ID of the report
+    """
+    processor = jobs[job_id].processor
 
     progress = 0
+    position = 0
     with click.progressbar(length=100, label='Creating report', show_eta=False) as bar:
-        while thread.progress < 100:
-            if thread.progress > progress:
-                bar.update(thread.progress - progress)
-                progress = thread.progress
+        while not processor.finished:
+            position += len(processor.wait_for_events(position, timeout=1))
+            if processor.progress > progress:
+                bar.update(processor.progress - progress)
+                progress = processor.progress
 
     print("Finished Report")
 
@@ -67,14 +142,19 @@ def gui(debug):
     enable_debugging(debug)
 
     logger.debug('Importing Reports')
-    load_reports()
+    with profiling.measure("Report Loading"):
+        load_reports()
+    start_compactor()
 
     logger.debug('Starting Flask Server')
-    start_server()
+    with profiling.measure("Server Readiness"):
+        start_server()
 
-    logger.debug('Waiting for Server Availability')
-    while not is_alive():  # wait until web server is running and application  is responding
-        sleep(1)
+        logger.debug('Waiting for Server Availability')
+        while not is_alive():  # wait until web server is running and application  is responding
+            sleep(1)
+
+    profiling.finish_profile()
 
     logger.debug('Creating Webview Window')
 
@@ -89,14 +169,19 @@ def server(debug, host, port):
     enable_debugging(debug)
 
     logger.debug('Importing Reports')
-    load_reports()
+    with profiling.measure("Report Loading"):
+        load_reports()
+    start_compactor()
 
     logger.debug('Starting Flask Server')
-    start_server(host, port)
+    with profiling.measure("Server Readiness"):
+        start_server(host, port)
+
+        logger.debug('Waiting for Server Availability')
+        while not is_alive():  # wait until web server is running and application  is responding
+            sleep(1)
 
-    logger.debug('Waiting for Server Availability')
-    while not is_alive():  # wait until web server is running and application  is responding
-        sleep(1)
+    profiling.finish_profile()
 
     logger.info(f'Server running at {host}:{port}')
     while True:
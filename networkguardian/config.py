@@ -0,0 +1,63 @@
+"""
+Module is used to read and write the user configurable settings of Network Guardian, which are stored in the config
+file within the application directory
+"""
+import configparser
+import os
+
+from networkguardian import config_path, logger
+
+# Default value of every setting, config files are merged on top of these so only changed settings need to be stored
+default_settings = {
+    "workers": {
+        "max_threads": "0",  # maximum threads within any worker pool, 0 for no limit
+        "io_workers": "0",  # workers for I/O bound executors, 0 to size automatically
+        "subprocess_workers": "0",  # workers for executors which wait on subprocesses, 0 to size automatically
+        "cpu_workers": "0",  # workers for CPU bound executors, 0 to size automatically
+    },
+    "reports": {
+        "plugin_timeout": "1800",  # seconds a plugin is given to finish unless it sets its own timeout, 0 for no limit
+        "report_timeout": "0",  # seconds a whole report is given to finish, 0 for no limit
+        "max_reports": "2",  # reports processed at once, others wait in the queue, 0 for no limit
+        "compression": "zlib",  # codec report sections are compressed with, zlib, lzma or none
+        "keep_per_system": "0",  # most recent reports kept for each system, 0 for no limit
+        "max_age": "0",  # days reports are kept for, 0 for no limit
+        "max_size": "0",  # maximum size of the reports directory in megabytes, 0 for no limit
+        "compact_interval": "3600",  # seconds between applying the retention settings, 0 to only apply them at start
+    },
+    "cache": {
+        "enabled": "true",  # whether plugins which set a cache_ttl can reuse data from previous reports
+        "persist": "false",  # whether the cache is saved so it is kept when the application restarts
+        "max_entries": "256",  # maximum plugin results kept in the cache, 0 for no limit
+        "max_size": "64",  # maximum size of the cache in megabytes, 0 for no limit
+        "templates": "true",  # whether compiled plugin templates are saved so they aren't compiled again on restart
+    },
+}
+
+config = configparser.ConfigParser()
+config.read_dict(default_settings)
+
+
+def load_config() -> bool:
+    """
+    Function reads the config file, if it exists, over the default settings
+    :return: True if the config file was read
+    """
+    try:
+        return len(config.read(config_path)) > 0
+    except configparser.Error as e:
+        logger.error(f'Failed to read config file {config_path}, using default settings.')
+        logger.debug(e)
+        return False
+
+
+def save_config():
+    """
+    Function writes the current settings to the config file
+    """
+    os.makedirs(os.path.dirname(config_path), exist_ok=True)
+    with open(config_path, "w") as f:
+        config.write(f)
+
+
+load_config()
@@ -46,3 +46,19 @@ class PluginExecutorError(PluginException):
     Exception is raised when a plugin is attempted to be loaded but the plugin contains no valid methods of executing
     i.e there is no @executor in the class
     """
+
+
+class PluginTimeoutError(PluginProcessingError):
+    """
+    Exception is stored in a plugin's result when the plugin did not finish processing before its deadline, either the
+    plugin's own timeout or the report's
+    """
+    ...
+
+
+class PluginCancelledError(PluginProcessingError):
+    """
+    Exception is raised by a plugin when it notices it has been cancelled, and stored in the result of plugins which
+    were cancelled before they finished processing
+    """
+    ...
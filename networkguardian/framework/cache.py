@@ -0,0 +1,209 @@
+"""
+Module contains the cache used to reuse the data produced by plugins between reports.
+
+Plugins opt in with the cache_ttl parameter of their executor. Data is stored pickled, so every report gets its own copy
+which can't be changed by other reports or plugins, and the size of the pickle is used to limit the memory used by the
+cache. The least recently used entries are evicted once the cache is full, and the cache can be kept between restarts
+with the persist setting.
+"""
+import os
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from networkguardian import logger, find_user_resource
+from networkguardian.config import config
+
+cache_path = find_user_resource("cache.pickle")
+
+result_cache = None
+result_cache_lock = Lock()
+
+
+class CacheEntry:
+    """
+    Class is used to store the data produced by a plugin within the cache
+    """
+    __slots__ = ("key", "pickled_data", "created", "expires")
+
+    def __init__(self, key: tuple, pickled_data: bytes, created: float, expires: float):
+        """
+        :param key: Key the entry is stored under
+        :param pickled_data: Plugin Executor data, pickled
+        :param created: time.time() value when the data was produced
+        :param expires: time.time() value after which the data can't be reused
+        """
+        self.key = key
+        self.pickled_data = pickled_data
+        self.created = created
+        self.expires = expires
+
+    @property
+    def data(self) -> {}:
+        """
+        :return: Returns a new copy of the Plugin Executor data
+        """
+        return pickle.loads(self.pickled_data)
+
+    @property
+    def age(self) -> float:
+        """
+        :return: Returns the seconds since the data was produced
+        """
+        return time.time() - self.created
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires
+
+    @property
+    def size(self) -> int:
+        return len(self.pickled_data)
+
+
+class ResultCache:
+    """
+    Class is used to store plugin data with a time to live, evicting the least recently used data once either the
+    number of entries or their total size is over the limit
+    """
+
+    def __init__(self, max_entries: int, max_size: int, path: str = None):
+        """
+        :param max_entries: Maximum number of entries, 0 for no limit
+        :param max_size: Maximum total size in bytes of the pickled data, 0 for no limit
+        :param path: Path of the file the cache is saved to, None to only keep the cache in memory
+        """
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.path = path
+
+        self.entries = OrderedDict()  # key, CacheEntry ordered from least to most recently used
+        self.size = 0  # total size of the pickled data
+        self.lock = Lock()
+
+    def get(self, key: tuple) -> CacheEntry:
+        """
+        :param key: Key the data was stored under
+        :return: Returns the entry for the key, or None if there isn't one or it has expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            if entry.expired:
+                self._remove(key)
+                return None
+
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, data: {}, ttl: float) -> bool:
+        """
+        Function stores data in the cache, replacing anything already stored under the key
+
+        :param key: Key to store the data under
+        :param data: Plugin Executor data, this must be able to be pickled
+        :param ttl: Seconds the data can be reused for
+        :return: True if the data was stored
+        """
+        try:
+            pickled_data = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f'Unable to cache data for {key[0]}: {e}')
+            return False
+
+        if self.max_size and len(pickled_data) > self.max_size:
+            return False  # would evict everything else and still not fit
+
+        created = time.time()
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+            self.entries[key] = CacheEntry(key, pickled_data, created, created + ttl)
+            self.size += len(pickled_data)
+            self._evict()
+
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key: tuple):
+        self.size -= self.entries.pop(key).size
+
+    def _evict(self):
+        """
+        Function removes expired entries, then the least recently used entries until the cache is within its limits
+        """
+        for key in [key for key, entry in self.entries.items() if entry.expired]:
+            self._remove(key)
+
+        while self.entries and ((self.max_entries and len(self.entries) > self.max_entries)
+                                or (self.max_size and self.size > self.max_size)):
+            self._remove(next(iter(self.entries)))
+
+    def save(self):
+        """
+        Function writes the entries which haven't expired to the cache file, if the cache is persistent
+        """
+        if self.path is None:
+            return
+
+        with self.lock:
+            self._evict()
+            entries = [(e.key, e.pickled_data, e.created, e.expires) for e in self.entries.values()]
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "wb") as f:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            logger.error(f'Failed to save result cache to {self.path}')
+            logger.debug(e)
+
+    def load(self) -> bool:
+        """
+        Function reads the entries from the cache file, if the cache is persistent and the file exists
+        :return: True if the cache file was read
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.path, "rb") as f:
+                entries = pickle.load(f)
+        except Exception as e:
+            logger.error(f'Failed to read result cache {self.path}, starting with an empty cache.')
+            logger.debug(e)
+            return False
+
+        with self.lock:
+            for key, pickled_data, created, expires in entries:
+                self.entries[key] = CacheEntry(key, pickled_data, created, expires)
+                self.size += len(pickled_data)
+
+            self._evict()
+
+        return True
+
+
+def get_result_cache() -> ResultCache:
+    """
+    :return: Returns the result cache shared by all reports, creating it from the cache settings if required
+    """
+    global result_cache
+
+    with result_cache_lock:
+        if result_cache is None:
+            persist = config.getboolean("cache", "persist", fallback=False)
+            result_cache = ResultCache(config.getint("cache", "max_entries", fallback=0),
+                                       config.getint("cache", "max_size", fallback=0) * 1024 * 1024,
+                                       cache_path if persist else None)
+            result_cache.load()
+
+    return result_cache
@@ -0,0 +1,170 @@
+import subprocess
+import time
+from threading import Event, Lock
+
+import psutil
+
+from networkguardian import logger
+from networkguardian.exceptions import PluginCancelledError
+
+
+class CancellationToken:
+    """
+    Class is used to cooperatively cancel a plugin executor, either because its deadline has passed or because the user
+    cancelled the report.
+
+    Executors receive a token by declaring a cancellation parameter. Threads can't be killed, so executors are expected
+    to check the token between steps of work, pass the remaining time to anything that blocks, and register any child
+    processes they start so the processes can be killed when the token is cancelled. Data gathered so far can be stored
+    with partial() to be kept in the report if the plugin doesn't finish.
+
+    Executors which work through independent shards, such as scanning one network at a time, can store each shard with
+    checkpoint() once it is done. If the report is interrupted and later resumed, restore() returns the shards which
+    were completed so the executor only needs to process the rest.
+    """
+
+    def __init__(self, deadline: float = None, checkpoints: {} = None, on_checkpoint=None):
+        """
+        :param deadline: time.monotonic() value after which the executor should give up, None for no deadline
+        :param checkpoints: Dictionary of shard key, data of the shards completed before the report was resumed
+        :param on_checkpoint: Function called with the key and data of each shard stored with checkpoint()
+        """
+        self.deadline = deadline
+        self.partial_data = None  # data stored by the executor before it was cancelled
+        self.checkpoints = dict(checkpoints or {})  # shard key, data of each completed shard
+        self.on_checkpoint = on_checkpoint
+
+        self._event = Event()
+        self._lock = Lock()
+        self._processes = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self) -> float:
+        """
+        :return: Returns the seconds until the deadline, or None if there is no deadline
+        """
+        if self.deadline is None:
+            return None
+
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """
+        Function raises PluginCancelledError if the token has been cancelled or the deadline has passed, executors
+        should call this between steps of work
+        """
+        if self.cancelled or self.expired:
+            raise PluginCancelledError("Plugin was cancelled before it finished processing")
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Function blocks until the token is cancelled or the timeout passes
+        :return: True if the token was cancelled
+        """
+        return self._event.wait(timeout)
+
+    def partial(self, data: {}):
+        """
+        Function stores the data gathered so far by the executor, which is used as the result if it doesn't finish
+        :param data: Data in the same format as the executor returns
+        """
+        self.partial_data = data
+
+    def checkpoint(self, key: str, data):
+        """
+        Function stores the data of a shard of work which has been completed, so it doesn't need to be repeated if the
+        report is resumed
+
+        :param key: Key identifying the shard, i.e. the network which was scanned
+        :param data: Data of the shard, in a format which can be stored in a report
+        """
+        with self._lock:
+            self.checkpoints[key] = data
+
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(key, data)
+
+    def restore(self, key: str):
+        """
+        :param key: Key identifying the shard
+        :return: Returns the data of the shard if it was completed before the report was resumed, otherwise None
+        """
+        with self._lock:
+            return self.checkpoints.get(key)
+
+    def register(self, process):
+        """
+        Function registers a child process so it is killed when the token is cancelled, if the token has already been
+        cancelled the process is killed immediately
+
+        :param process: subprocess.Popen, psutil.Process, or any object with a stop() method (i.e. libnmap NmapProcess)
+        :return: The process passed in
+        """
+        with self._lock:
+            self._processes.append(process)
+
+        if self.cancelled:
+            self._terminate(process)
+
+        return process
+
+    def popen(self, *args, **kwargs) -> subprocess.Popen:
+        """
+        Function starts a subprocess which is killed if the token is cancelled, accepts the same arguments as
+        subprocess.Popen
+        """
+        return self.register(subprocess.Popen(*args, **kwargs))
+
+    def run(self, args, **kwargs) -> (bytes, bytes):
+        """
+        Function runs a subprocess to completion, the process is killed if the token is cancelled or its deadline passes
+        first. Accepts the same arguments as subprocess.Popen, other than stdout and stderr which are always captured
+
+        :return: Tuple of the stdout and stderr output of the process
+        :raises PluginCancelledError: if the process was killed because the token was cancelled
+        """
+        process = self.popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+        try:
+            output = process.communicate(timeout=self.remaining())
+        except subprocess.TimeoutExpired:  # deadline passed
+            self._terminate(process)
+            output = process.communicate()
+
+        self.check()
+        return output
+
+    def cancel(self):
+        """
+        Function cancels the token and kills all registered processes and their children
+        """
+        self._event.set()
+
+        with self._lock:
+            processes = list(self._processes)
+
+        for process in processes:
+            self._terminate(process)
+
+    @staticmethod
+    def _terminate(process):
+        try:
+            if isinstance(process, subprocess.Popen) and process.poll() is not None:
+                return  # already finished, the pid may now belong to something else
+            if hasattr(process, "pid"):
+                parent = psutil.Process(process.pid)
+                for child in parent.children(recursive=True):
+                    child.kill()
+                parent.kill()
+            elif hasattr(process, "stop"):
+                process.stop()
+        except psutil.NoSuchProcess:  # already finished
+            pass
+        except Exception as e:
+            logger.debug(f'Failed to terminate {process}: {e}')
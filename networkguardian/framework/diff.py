@@ -0,0 +1,202 @@
+"""
+Module contains the report diff, used to find what changed between two reports, i.e. the same report run on different
+days.
+
+The data of each plugin is split into rows keyed by something which identifies the row between reports, such as the
+port of an open port or the name of a user, rather than the position of the row within the data, which usually depends
+on the order the rows were found in. Plugins control how their data is split by overriding AbstractPlugin.rows(). The
+rows of the two reports are compared as dictionaries, so comparing reports takes time in proportion to the number of
+rows rather than the square of it.
+"""
+import json
+from itertools import islice
+
+from networkguardian import logger
+from networkguardian.framework.index import result_status
+from networkguardian.framework.registry import registered_plugins, resolve_plugin
+from networkguardian.framework.storage import encode_value
+
+
+class PluginDiff:
+    """
+    Class is used to store the differences between the results of a plugin in two reports
+    """
+
+    def __init__(self, name: str, before_status: str, after_status: str):
+        """
+        :param name: Name of the plugin
+        :param before_status: Status of the plugin's result in the earlier report, Missing if it has no result
+        :param after_status: Status of the plugin's result in the later report, Missing if it has no result
+        """
+        self.name = name
+        self.before_status = before_status
+        self.after_status = after_status
+
+        self.added = {}  # row key, row only in the later report
+        self.removed = {}  # row key, row only in the earlier report
+        self.changed = {}  # row key, (row in the earlier report, row in the later report)
+        self.unchanged = 0  # number of rows which are the same in both reports
+
+    def __repr__(self):
+        return f"PluginDiff(name='{self.name}', added={len(self.added)}, removed={len(self.removed)}, " \
+               f"changed={len(self.changed)})"
+
+    @property
+    def changes(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    @property
+    def status_changed(self) -> bool:
+        return self.before_status != self.after_status
+
+    def to_dict(self) -> {}:
+        """
+        :return: Returns the differences in a form which can be serialised as JSON
+        """
+        return {
+            "name": self.name,
+            "before_status": self.before_status,
+            "after_status": self.after_status,
+            "added": [{"key": encode_value(list(key)), "row": encode_value(row)} for key, row in self.added.items()],
+            "removed": [{"key": encode_value(list(key)), "row": encode_value(row)}
+                        for key, row in self.removed.items()],
+            "changed": [{"key": encode_value(list(key)), "before": encode_value(before), "after": encode_value(after)}
+                        for key, (before, after) in self.changed.items()],
+            "unchanged": self.unchanged,
+        }
+
+
+def canonical(value):
+    """
+    :return: Returns a hashable value which is equal for equal values, used to key rows by values which are lists or
+    dictionaries
+    """
+    if isinstance(value, (dict, list, tuple, set, frozenset)):
+        return json.dumps(encode_value(value), sort_keys=True)
+
+    return value
+
+
+def default_rows(data) -> {}:
+    """
+    Function splits data into rows, each item of the values within the data is a row, keyed by the name of the value
+    and the key of the item, or the item itself for lists. Values which aren't collections are a row on their own.
+
+    :param data: Data produced by a plugin executor
+    :return: Dictionary of row key tuple, row
+    """
+    if not isinstance(data, dict):
+        return {(): data}
+
+    rows = {}
+    for name, value in data.items():
+        if isinstance(value, dict):
+            for key, item in value.items():
+                rows[(name, canonical(key))] = item
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            for item in value:
+                rows[(name, canonical(item))] = item
+        else:
+            rows[(name,)] = value
+
+    return rows
+
+
+def plugin_rows(name: str, data) -> {}:
+    """
+    Function splits the data of a plugin result into rows, using the plugin's own rows if it is registered
+
+    :param name: Name of the plugin which produced the data
+    :param data: Data produced by the plugin, or None if it produced none
+    :return: Dictionary of row key tuple, row
+    """
+    if data is None:
+        return {}
+
+    plugin = registered_plugins.get(name)
+    if plugin is not None:
+        try:
+            rows = resolve_plugin(plugin).rows(data)
+            if rows is not None:
+                return rows
+        except Exception as e:  # data from an older version of the plugin may not be in the format it expects
+            logger.debug(f'Failed to split the data of {name} into rows, using the default rows: {e}')
+
+    return default_rows(data)
+
+
+def diff_rows(plugin_diff: PluginDiff, before: {}, after: {}):
+    """
+    Function compares the rows of two results, storing the differences in the plugin diff
+    """
+    for key, row in after.items():
+        if key not in before:
+            plugin_diff.added[key] = row
+        elif before[key] != row:
+            plugin_diff.changed[key] = (before[key], row)
+        else:
+            plugin_diff.unchanged += 1
+
+    for key, row in before.items():
+        if key not in after:
+            plugin_diff.removed[key] = row
+
+
+def diff_reports(before, after) -> [PluginDiff]:
+    """
+    Function compares the results of two reports, results are matched by the name of the plugin which produced them
+
+    :param before: Earlier Report
+    :param after: Later Report
+    :return: List of PluginDiff, one for each plugin in either report, in the order of the later report
+    """
+    before_results = {}
+    for result in before.results:
+        before_results.setdefault(result.name, result)
+
+    after_results = {}
+    for result in after.results:
+        after_results.setdefault(result.name, result)
+
+    diffs = []
+    for name in dict.fromkeys([*after_results, *before_results]):
+        before_result = before_results.get(name)
+        after_result = after_results.get(name)
+
+        plugin_diff = PluginDiff(name,
+                                 result_status(before_result.exception) if before_result else "Missing",
+                                 result_status(after_result.exception) if after_result else "Missing")
+
+        diff_rows(plugin_diff,
+                  plugin_rows(name, before_result.data) if before_result else {},
+                  plugin_rows(name, after_result.data) if after_result else {})
+
+        diffs.append(plugin_diff)
+
+    return diffs
+
+
+def format_key(key: tuple) -> str:
+    """
+    :return: Returns a row key as text to display
+    """
+    return " / ".join(str(part) for part in key) if key else "Value"
+
+
+def format_row(row) -> str:
+    """
+    :return: Returns a row as text to display
+    """
+    if isinstance(row, dict):
+        return ", ".join(f"{name}: {value}" for name, value in row.items())
+    if isinstance(row, (list, tuple, set, frozenset)):
+        return ", ".join(str(value) for value in row)
+
+    return str(row)
+
+
+def first_rows(rows: {}, limit: int) -> [tuple]:
+    """
+    :return: Returns the first rows of a diff as (row key, row) tuples, used to show part of a large diff
+    """
+    return list(islice(rows.items(), limit))
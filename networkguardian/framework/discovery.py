@@ -0,0 +1,246 @@
+"""
+Module contains the static discovery of plugins, used so plugin modules don't need to be imported when the application
+starts.
+
+Importing a plugin module also imports everything it depends on, such as nmap, libnmap, networkx and netaddr, before
+the interface can show anything. Instead each module is parsed, without being run, and the arguments of its
+register_plugin and executor decorators are read from the syntax tree. This is enough to list the plugin, and to know
+which platforms it supports and whether it requires elevation, so it can be loaded as a LazyPlugin. The module is only
+imported, and the plugin initialized, once the plugin is first used by a report, see registry.resolve_plugin().
+
+Decorator arguments must be literals, or members of PluginCategory, SystemPlatform and WorkClass, to be read. Modules
+with any other arguments, or which register plugins without the decorator, are imported when the application starts as
+they always were.
+"""
+import ast
+import inspect
+
+from networkguardian.exceptions import PluginExecutorError, PluginUnsupportedPlatformError, \
+    PluginRequiresElevationError
+from networkguardian.framework.plugin import PluginInformation, PluginCategory, SystemPlatform, WorkClass
+
+enums = {enum.__name__: enum for enum in (PluginCategory, SystemPlatform, WorkClass)}  # enums decorators can use
+
+register_parameters = ("name", "category", "author", "version")
+executor_keywords = ("requires_elevation", "produces", "consumes", "run_in_process", "work_class", "timeout",
+                     "cache_ttl")
+
+
+class NotStaticError(Exception):
+    """
+    Exception is raised when a plugin module can't be discovered without importing it
+    """
+
+
+class PluginDeclaration:
+    """
+    Class is used to store what a plugin module declares about a plugin through its decorators
+    """
+
+    def __init__(self, path: str, class_name: str, name: str, category: PluginCategory, author: str, version: float,
+                 description: str, executors: {}):
+        """
+        :param path: Path of the module
+        :param class_name: Name of the plugin class within the module
+        :param executors: Dictionary of SystemPlatform, dictionary of the executor's decorator keywords
+        """
+        self.path = path
+        self.class_name = class_name
+        self.name = name
+        self.category = category
+        self.author = author
+        self.version = version
+        self.description = description
+        self.executors = executors
+
+    def __repr__(self):
+        return f"PluginDeclaration(name='{self.name}', path='{self.path}')"
+
+
+class LazyPlugin(PluginInformation):
+    """
+    Plugin which was discovered without importing its module, it stands in for the plugin in the registry until the
+    plugin is first used, when the module is imported and the plugin it registers replaces it
+    """
+
+    def __init__(self, declaration: PluginDeclaration):
+        super().__init__(declaration.name, declaration.category, declaration.author, declaration.version)
+        self.description = declaration.description
+        self.declaration = declaration
+
+        self.loading_exception = None  # used to store any exception raised when load() is called to be displayed in GUI
+        self.execute = None  # the executor is only known once the module is imported
+        self.template = None
+
+        self.import_duration = None  # seconds taken to discover the plugin, the module is timed again once imported
+        self.load_duration = None
+
+        self._loaded = False
+        self._running_platform = None
+        self._running_elevated = False
+
+    def __repr__(self):
+        return 'LazyPlugin(name=%r, author=%r, version=%r, path=%r)' \
+               % (self.name, self.author, self.version, self.declaration.path)
+
+    def load(self, running_platform: SystemPlatform, running_elevated: bool):
+        """
+        Function makes the same checks as AbstractPlugin.load() which can be made from the declaration, the plugin's
+        initialize() is called once the module is imported
+        """
+        self._running_platform = running_platform
+        self._running_elevated = running_elevated
+        if not self.declaration.executors:
+            raise PluginExecutorError("No executor found within class")
+
+        if not self.supported:
+            raise PluginUnsupportedPlatformError(
+                f'Plugin is only supported on {", ".join(str(x) for x in self.supported_platforms)}')
+
+        if self.declaration.executors[running_platform].get("requires_elevation") and not running_elevated:
+            raise PluginRequiresElevationError("Plugin requires elevated system permissions to run")
+
+        self._loaded = True
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def running_elevated(self) -> bool:
+        return self._running_elevated
+
+    @property
+    def running_platform(self) -> SystemPlatform:
+        return self._running_platform
+
+    @property
+    def supported(self) -> bool:
+        return self._running_platform in self.declaration.executors
+
+    @property
+    def supported_platforms(self) -> [SystemPlatform]:
+        return list(self.declaration.executors.keys())
+
+
+def literal(node: ast.AST):
+    """
+    :return: Returns the value of a decorator argument
+    :raises NotStaticError: if the argument isn't a literal or a member of one of the plugin enums
+    """
+    if isinstance(node, ast.Attribute) and isinstance(node.value, (ast.Name, ast.Attribute)):
+        enum_name = node.value.id if isinstance(node.value, ast.Name) else node.value.attr
+        enum = enums.get(enum_name)
+        if enum is not None and node.attr in enum.__members__:
+            return enum[node.attr]
+
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return tuple(literal(element) for element in node.elts)
+
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise NotStaticError(f"Argument on line {node.lineno} is not a literal")
+
+
+def decorator_name(node: ast.AST) -> str:
+    """
+    :return: Returns the name of the function a decorator calls, or None if it isn't a call
+    """
+    if not isinstance(node, ast.Call):
+        return None
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+
+    return None
+
+
+def call_arguments(call: ast.Call, names: (str,)) -> {}:
+    """
+    :return: Returns the arguments of a call keyed by the name of their parameter, positional arguments are matched
+    with the names in order
+    """
+    if any(isinstance(argument, ast.Starred) for argument in call.args) or \
+            any(keyword.arg is None for keyword in call.keywords):
+        raise NotStaticError(f"Call on line {call.lineno} unpacks its arguments")
+
+    arguments = {name: literal(argument) for name, argument in zip(names, call.args)}
+    arguments.update((keyword.arg, literal(keyword.value)) for keyword in call.keywords)
+    return arguments
+
+
+def executor_declaration(call: ast.Call) -> (list, {}):
+    """
+    :return: Returns the platforms and the keywords of an executor decorator
+    """
+    if not call.args or any(isinstance(argument, ast.Starred) for argument in call.args):
+        raise NotStaticError(f"Executor on line {call.lineno} doesn't name its template")
+
+    platforms = [literal(argument) for argument in call.args[1:]]
+    if not all(isinstance(platform, SystemPlatform) for platform in platforms):
+        raise NotStaticError(f"Executor on line {call.lineno} has platforms which aren't SystemPlatform members")
+
+    if any(keyword.arg is None for keyword in call.keywords):
+        raise NotStaticError(f"Executor on line {call.lineno} unpacks its arguments")
+
+    keywords = {keyword.arg: literal(keyword.value) for keyword in call.keywords}
+    if not set(keywords) <= set(executor_keywords):
+        raise NotStaticError(f"Executor on line {call.lineno} has unknown keywords")
+
+    keywords["template_path"] = literal(call.args[0])
+    return platforms or list(SystemPlatform), keywords
+
+
+def discover_plugins(path: str) -> [PluginDeclaration]:
+    """
+    Function reads the plugins a module registers without importing it
+
+    :param path: Path of the module
+    :return: Returns a declaration for each plugin the module registers, which is empty if it doesn't register any
+    :raises NotStaticError: if the module has to be imported to know what it registers
+    :raises SyntaxError: if the module can't be parsed, importing it would fail in the same way
+    """
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    declarations = []
+    decorated = set()  # register_plugin calls which are class decorators
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+
+        registrations = [d for d in node.decorator_list if decorator_name(d) == "register_plugin"]
+        if not registrations:
+            continue
+        if len(registrations) > 1:
+            raise NotStaticError(f"Class {node.name} is registered more than once")
+
+        decorated.add(registrations[0])
+        arguments = call_arguments(registrations[0], register_parameters)
+        if set(arguments) != set(register_parameters) or not isinstance(arguments["category"], PluginCategory):
+            raise NotStaticError(f"Class {node.name} is registered with arguments which can't be read")
+
+        executors = {}
+        for item in node.body:
+            if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+
+            for decorator in item.decorator_list:
+                if decorator_name(decorator) == "executor":
+                    platforms, keywords = executor_declaration(decorator)
+                    for platform in platforms:
+                        executors[platform] = keywords
+
+        docstring = ast.get_docstring(node, clean=False)
+        description = inspect.cleandoc(docstring) if docstring else "No description available."
+
+        declarations.append(PluginDeclaration(path, node.name, arguments["name"], arguments["category"],
+                                              arguments["author"], arguments["version"], description, executors))
+
+    for node in ast.walk(tree):  # plugins registered any other way are only known once the module is run
+        if decorator_name(node) == "register_plugin" and node not in decorated:
+            raise NotStaticError(f"register_plugin is called on line {node.lineno} without decorating a class")
+
+    return declarations
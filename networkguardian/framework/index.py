@@ -0,0 +1,513 @@
+"""
+Module contains the report index, a summary of every report file kept in the reports directory so reports can be listed
+and searched without opening them.
+
+The index is an SQLite database next to the reports, holding a row for each report and each of its results. The data
+and templates of results stay within the report files, or the shared sections they use, which are also listed so shared
+sections no report uses can be found. When the application starts the reports directory is compared
+with the index, and only report files which are new or have changed since they were indexed are read, and then only
+their manifest. Each report is given an ID when it is first indexed which stays the same for as long as the report
+exists.
+
+The database uses write-ahead logging so reports being stored by report jobs don't block pages reading the index. The
+tables are created once by the first connection, then each thread has its own connection, and every query is a fixed
+statement with parameters so the statement cache of each connection can reuse it.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+from networkguardian import logger
+from networkguardian.exceptions import PluginTimeoutError, PluginCancelledError
+from networkguardian.framework.storage import read_manifest, is_pickled_report, migrate_report, decode_exception, \
+    manifest_shared_sections
+
+INDEX_VERSION = 2  # stored as the user_version of the database, the index is rebuilt when it changes
+index_filename = "index.sqlite"
+
+schema = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    system_name TEXT,
+    system_platform TEXT,
+    date TEXT,
+    software_version TEXT,
+    modified INTEGER,
+    size INTEGER,
+    interrupted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS results (
+    report_id INTEGER NOT NULL REFERENCES reports (report_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    plugin TEXT NOT NULL,
+    version TEXT,
+    status TEXT,
+    size INTEGER,
+    telemetry TEXT,
+    PRIMARY KEY (report_id, position)
+);
+CREATE TABLE IF NOT EXISTS sections (
+    report_id INTEGER NOT NULL REFERENCES reports (report_id) ON DELETE CASCADE,
+    digest TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (report_id, digest)
+);
+CREATE INDEX IF NOT EXISTS reports_date ON reports (date);
+CREATE INDEX IF NOT EXISTS reports_system_name ON reports (system_name);
+CREATE INDEX IF NOT EXISTS reports_system_platform ON reports (system_platform);
+CREATE INDEX IF NOT EXISTS results_plugin ON results (plugin, version);
+CREATE INDEX IF NOT EXISTS sections_digest ON sections (digest);
+"""
+
+report_columns = "report_id, path, name, system_name, system_platform, date, software_version, modified, size, " \
+                 "interrupted"
+
+select_report = f"SELECT {report_columns} FROM reports WHERE report_id = ?"
+select_report_id = "SELECT report_id FROM reports WHERE path = ?"
+select_report_files = "SELECT report_id, path, modified, size FROM reports"
+select_results = "SELECT plugin, version, status, size, telemetry FROM results WHERE report_id = ? ORDER BY position"
+select_telemetry = "SELECT plugin, version, telemetry FROM results WHERE telemetry IS NOT NULL"
+count_reports = "SELECT COUNT(*) FROM reports"
+select_report_listing = "SELECT report_id, path, system_name, date, size FROM reports ORDER BY report_id"
+select_report_sections = "SELECT digest FROM sections WHERE report_id = ?"
+select_shared_sections = "SELECT DISTINCT digest FROM sections"
+select_total_size = "SELECT (SELECT COALESCE(SUM(size), 0) FROM reports) + " \
+                    "(SELECT COALESCE(SUM(length), 0) FROM (SELECT DISTINCT digest, length FROM sections))"
+select_previous_report = "SELECT report_id FROM reports WHERE name = ? AND system_name IS ? AND report_id < ? " \
+                         "ORDER BY report_id DESC LIMIT 1"
+insert_report = f"""
+INSERT INTO reports ({report_columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (report_id) DO UPDATE SET path = excluded.path, name = excluded.name, system_name = excluded.system_name,
+    system_platform = excluded.system_platform, date = excluded.date, software_version = excluded.software_version,
+    modified = excluded.modified, size = excluded.size, interrupted = excluded.interrupted
+"""
+insert_result = "INSERT INTO results (report_id, position, plugin, version, status, size, telemetry) " \
+                "VALUES (?, ?, ?, ?, ?, ?, ?)"
+delete_report = "DELETE FROM reports WHERE report_id = ?"
+delete_replaced_path = "DELETE FROM reports WHERE path = ? AND report_id IS NOT ?"
+delete_results = "DELETE FROM results WHERE report_id = ?"
+insert_section = "INSERT OR IGNORE INTO sections (report_id, digest, length) VALUES (?, ?, ?)"
+delete_sections = "DELETE FROM sections WHERE report_id = ?"
+
+distinct_values = {  # filter name, statement listing the values it can take
+    "system_name": "SELECT DISTINCT system_name FROM reports WHERE system_name IS NOT NULL ORDER BY system_name",
+    "system_platform": "SELECT DISTINCT system_platform FROM reports WHERE system_platform IS NOT NULL "
+                       "ORDER BY system_platform",
+    "plugin": "SELECT DISTINCT plugin FROM results ORDER BY plugin",
+}
+
+
+def result_status(exception: Exception) -> str:
+    """
+    :param exception: Exception of a plugin result, None if the plugin finished without one
+    :return: Returns Done, Timed Out, Cancelled or Failed
+    """
+    if exception is None:
+        return "Done"
+    if isinstance(exception, PluginTimeoutError):
+        return "Timed Out"
+    if isinstance(exception, PluginCancelledError):
+        return "Cancelled"
+
+    return "Failed"
+
+
+class ReportSummary:
+    """
+    Class is used to store the details of a report within the index
+    """
+
+    def __init__(self, report_id: int, path: str, name: str, system_name: str, system_platform: str, date: str,
+                 software_version, results: [{}], modified: int = None, size: int = None, interrupted: bool = False,
+                 shared_sections: {} = None):
+        """
+        :param report_id: ID of the report
+        :param path: Path of the report file
+        :param results: List of dictionaries containing the name, version, status, data size and telemetry of each
+        result in the report
+        :param modified: Modification time of the report file in nanoseconds when it was indexed
+        :param size: Size of the report file in bytes when it was indexed
+        :param interrupted: True if the report was recovered after the application stopped while processing it
+        :param shared_sections: Dictionary of digest, length of the shared sections the report uses, only read from
+        the manifest as the index doesn't need them to list reports
+        """
+        self.report_id = report_id
+        self.path = path
+        self.name = name
+        self.system_name = system_name
+        self.system_platform = system_platform
+        self.date = date
+        self.software_version = software_version
+        self.results = results
+        self.modified = modified
+        self.size = size
+        self.interrupted = bool(interrupted)
+        self.shared_sections = shared_sections or {}
+
+    def __repr__(self):
+        return f"ReportSummary(report_id={self.report_id}, name='{self.name}', path='{self.path}')"
+
+    @staticmethod
+    def from_manifest(report_id: int, path: str, manifest: {}, stat: os.stat_result):
+        """
+        Function creates the summary of a report file from its manifest
+        """
+        information = manifest["report"]
+        results = []
+        for entry in manifest["results"]:
+            results.append({
+                "name": entry["name"],
+                "version": entry["version"],
+                "status": result_status(decode_exception(entry["exception"])),
+                "size": entry["data"]["size"] if entry["data"] else 0,
+                "telemetry": entry["telemetry"],
+            })
+
+        return ReportSummary(report_id, path, information["name"], information["system_name"],
+                             information["system_platform"], information["date"], information["software_version"],
+                             results, stat.st_mtime_ns, stat.st_size, manifest["interrupted"],
+                             manifest_shared_sections(manifest))
+
+    @property
+    def plugins(self) -> [str]:
+        return [result["name"] for result in self.results]
+
+    @property
+    def status(self) -> str:
+        """
+        :return: Returns Interrupted if the report was recovered after the application stopped, Complete if every
+        plugin finished, Cancelled if any plugin was cancelled or timed out, or Errors if any plugin failed
+        """
+        if self.interrupted:
+            return "Interrupted"
+
+        statuses = {result["status"] for result in self.results}
+        if statuses <= {"Done"}:
+            return "Complete"
+        if statuses & {"Cancelled", "Timed Out"}:
+            return "Cancelled"
+
+        return "Errors"
+
+    @property
+    def resumable(self) -> bool:
+        """
+        :return: Returns True if the report has plugins which didn't finish, which can be processed again
+        """
+        return self.status in ("Interrupted", "Cancelled")
+
+    @property
+    def data_size(self) -> int:
+        return sum(result["size"] for result in self.results)
+
+    def to_dict(self) -> {}:
+        return dict(vars(self))
+
+    @staticmethod
+    def from_rows(row: sqlite3.Row, results: [sqlite3.Row]):
+        """
+        Function creates a summary from its row in the reports table and the rows of its results
+        """
+        return ReportSummary(**dict(row), results=[{
+            "name": result["plugin"],
+            "version": result["version"],
+            "status": result["status"],
+            "size": result["size"],
+            "telemetry": json.loads(result["telemetry"]) if result["telemetry"] is not None else None,
+        } for result in results])
+
+
+class ReportIndex:
+    """
+    Class is used to store the summary of every report, persisted to the index database in the reports directory
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: Reports directory, the index database is stored within it
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, index_filename)
+
+        self.local = threading.local()  # connection of each thread
+        self.created = False  # set once the tables have been created by the first connection
+        self.lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        :return: Returns the connection of the current thread, it is opened the first time the thread uses the index,
+        the database and its tables are only created by the first connection
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA synchronous = NORMAL")  # WAL stays consistent, the index can be rebuilt
+            connection.execute("PRAGMA foreign_keys = ON")
+            self.local.connection = connection
+
+            with self.lock:
+                if not self.created:  # write-ahead logging is stored in the database, so it applies to every connection
+                    connection.execute("PRAGMA journal_mode = WAL")
+                    connection.executescript(schema)
+                    self.created = True
+
+        return connection
+
+    def __len__(self):
+        return self.connection.execute(count_reports).fetchone()[0]
+
+    def get(self, report_id: int) -> ReportSummary:
+        connection = self.connection
+        row = connection.execute(select_report, (report_id,)).fetchone()
+        if row is None:
+            return None
+
+        return ReportSummary.from_rows(row, connection.execute(select_results, (report_id,)).fetchall())
+
+    def previous(self, summary: ReportSummary) -> int:
+        """
+        :param summary: Summary of a report in the index
+        :return: Returns the ID of the report with the same name created on the same system before it, or None
+        """
+        row = self.connection.execute(select_previous_report,
+                                      (summary.name, summary.system_name, summary.report_id)).fetchone()
+        return row[0] if row is not None else None
+
+    def all(self) -> [ReportSummary]:
+        """
+        :return: Returns the summary of every report, in the order they were indexed
+        """
+        return self.query()
+
+    def query(self, system_name: str = None, system_platform: str = None, plugin: str = None, since: str = None,
+              until: str = None, limit: int = None) -> [ReportSummary]:
+        """
+        Function searches the index, filters which are None aren't applied
+
+        :param system_name: Name of the system the reports were created on
+        :param system_platform: Platform of the system the reports were created on
+        :param plugin: Name of a plugin the reports must contain a result for
+        :param since: Earliest report date, inclusive
+        :param until: Latest report date, inclusive
+        :param limit: Number of reports to return, the most recently indexed reports are returned
+        :return: Returns the summaries of the matching reports, in the order they were indexed
+        """
+        conditions = []
+        parameters = []
+        for condition, value in (("system_name = ?", system_name),
+                                 ("system_platform = ?", system_platform),
+                                 ("report_id IN (SELECT report_id FROM results WHERE plugin = ?)", plugin),
+                                 ("date >= ?", since),
+                                 ("date <= ?", until)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        statement = f"SELECT {report_columns} FROM reports {where} ORDER BY report_id DESC"
+        if limit is not None:
+            statement += " LIMIT ?"
+            parameters.append(limit)
+
+        connection = self.connection
+        rows = connection.execute(statement, parameters).fetchall()
+        if not rows:
+            return []
+
+        # read the results of every matching report at once, rather than once per report
+        results = {}
+        result_statement = f"SELECT report_id, plugin, version, status, size, telemetry FROM results " \
+                           f"WHERE report_id IN (SELECT report_id FROM ({statement})) ORDER BY report_id, position"
+        for result in connection.execute(result_statement, parameters):
+            results.setdefault(result["report_id"], []).append(result)
+
+        return [ReportSummary.from_rows(row, results.get(row["report_id"], [])) for row in reversed(rows)]
+
+    def values(self, name: str) -> [str]:
+        """
+        :param name: Name of the filter, system_name, system_platform or plugin
+        :return: Returns every value of the filter within the index, used to offer the filters of query()
+        """
+        return [row[0] for row in self.connection.execute(distinct_values[name])]
+
+    def telemetry(self) -> [{}]:
+        """
+        :return: Returns the name, version and telemetry of every result which has telemetry
+        """
+        return [{"name": row["plugin"], "version": row["version"], "telemetry": json.loads(row["telemetry"])}
+                for row in self.connection.execute(select_telemetry)]
+
+    def load(self) -> bool:
+        """
+        Function opens the index database, creating it if it doesn't exist, an index written by another version is
+        rebuilt
+        :return: True if an existing index was opened
+        """
+        existed = os.path.exists(self.path)
+        connection = self.connection
+
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if existed and version not in (0, INDEX_VERSION):
+            logger.info("Report index was written by another version, rebuilding it")
+            with connection:
+                connection.execute("DROP TABLE IF EXISTS sections")
+                connection.execute("DROP TABLE IF EXISTS results")
+                connection.execute("DROP TABLE IF EXISTS reports")
+            connection.executescript(schema)
+            existed = False
+
+        connection.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        return existed
+
+    def insert(self, summary: ReportSummary) -> int:
+        """
+        Function adds or replaces the rows of a summary, which must be done within a transaction
+        :return: Returns the ID of the report, a new ID is given if the summary doesn't have one
+        """
+        connection = self.connection
+
+        # a report file which was indexed under another ID, such as the file of a resumed report which was indexed
+        # before the report replaced it, is replaced rather than breaking the unique path
+        connection.execute(delete_replaced_path, (summary.path, summary.report_id))
+        cursor = connection.execute(insert_report, (summary.report_id, summary.path, summary.name, summary.system_name,
+                                                    summary.system_platform, summary.date, summary.software_version,
+                                                    summary.modified, summary.size, summary.interrupted))
+        report_id = summary.report_id if summary.report_id is not None else cursor.lastrowid
+
+        connection.execute(delete_results, (report_id,))
+        connection.executemany(insert_result, [
+            (report_id, position, result["name"], result["version"], result["status"], result["size"],
+             json.dumps(result["telemetry"]) if result["telemetry"] is not None else None)
+            for position, result in enumerate(summary.results)
+        ])
+
+        connection.execute(delete_sections, (report_id,))
+        connection.executemany(insert_section, [
+            (report_id, digest, length) for digest, length in summary.shared_sections.items()
+        ])
+
+        return report_id
+
+    def index_file(self, path: str, report_id: int = None) -> ReportSummary:
+        """
+        Function reads the manifest of a report file and adds or updates its summary, reports written with pickle by
+        older versions are migrated first
+
+        :param path: Path of the report file
+        :param report_id: ID to update, the ID the file was indexed with, or a new ID if it wasn't, is used if None
+        :return: Summary of the report
+        """
+        return self.index_files([(path, report_id)])[0]
+
+    def index_files(self, files: [(str, int)]) -> [ReportSummary]:
+        """
+        Function adds or updates the summaries of several report files in a single transaction
+
+        :param files: List of the path of each report file and the ID to update, as passed to index_file()
+        :return: Summary of each report, in the same order
+        """
+        manifests = []
+        for path, report_id in files:
+            if is_pickled_report(path):
+                migrate_report(path)
+
+            path = os.path.abspath(path)
+            manifests.append((path, report_id, read_manifest(path), os.stat(path)))
+
+        summaries = []
+        with self.connection as connection:
+            for path, report_id, manifest, stat in manifests:
+                if report_id is None:
+                    row = connection.execute(select_report_id, (path,)).fetchone()
+                    report_id = row["report_id"] if row is not None else None
+
+                summary = ReportSummary.from_manifest(report_id, path, manifest, stat)
+                summary.report_id = self.insert(summary)
+                summaries.append(summary)
+
+        return summaries
+
+    def remove(self, report_id: int) -> ReportSummary:
+        """
+        :return: Returns the summary which was removed, or None if there wasn't one
+        """
+        summary = self.get(report_id)
+        if summary is not None:
+            with self.connection as connection:
+                connection.execute(delete_report, (report_id,))
+
+        return summary
+
+    def listing(self) -> [sqlite3.Row]:
+        """
+        :return: Returns the ID, path, system name, date and file size of every report, in the order they were indexed,
+        without reading their results
+        """
+        return self.connection.execute(select_report_listing).fetchall()
+
+    def report_sections(self, report_id: int) -> [str]:
+        """
+        :return: Returns the digests of the shared sections a report uses
+        """
+        return [row[0] for row in self.connection.execute(select_report_sections, (report_id,))]
+
+    def shared_sections(self) -> {str}:
+        """
+        :return: Returns the digests of the shared sections used by any report
+        """
+        return {row[0] for row in self.connection.execute(select_shared_sections)}
+
+    def total_size(self) -> int:
+        """
+        :return: Returns the bytes used by the report files and the shared sections they use
+        """
+        return self.connection.execute(select_total_size).fetchone()[0]
+
+    def refresh(self, extension: str) -> bool:
+        """
+        Function brings the index up to date with the reports directory, report files which are new or have changed
+        since they were indexed are read, and reports which no longer exist are removed
+
+        :param extension: Extension of report files
+        :return: True if the index changed
+        """
+        changed = False
+        indexed = {row["path"]: row for row in self.connection.execute(select_report_files)}
+
+        found = set()
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or not entry.name.endswith(f".{extension}"):
+                    continue
+
+                path = os.path.abspath(entry.path)
+                found.add(path)
+
+                row = indexed.get(path)
+                stat = entry.stat()
+                if row is not None and row["modified"] == stat.st_mtime_ns and row["size"] == stat.st_size:
+                    continue  # unchanged since it was indexed
+
+                try:
+                    self.index_file(path, row["report_id"] if row is not None else None)
+                    changed = True
+                    logger.debug(f'Indexed {path}')
+                except AttributeError:
+                    logger.error(f'Failed to import {path} due to missing dependency, skipping.')
+                except Exception as e:
+                    logger.error(f'Failed to import {path} due to an exception, skipping.')
+                    logger.debug(e)
+
+        for path, row in indexed.items():
+            if path not in found:
+                self.remove(row["report_id"])
+                changed = True
+                logger.debug(f'Removed {path} from the report index as it no longer exists')
+
+        return changed
@@ -0,0 +1,183 @@
+"""
+Module contains the job table used to run reports.
+
+Every report which is started is added to the table as a job. Only a limited number of reports are processed at once,
+set by the max_reports setting, and the rest wait in the queue in the order they were started. The plugins of running
+reports share the worker pools, which split the workers fairly between them.
+"""
+import time
+from enum import Enum
+from itertools import count
+from threading import Thread, Lock
+
+from networkguardian import logger, threading_enabled
+from networkguardian.config import config
+
+jobs = {}  # Job ID, Job
+job_ids = count(1)
+jobs_lock = Lock()
+
+finished_job_limit = 50  # finished jobs kept in the table so their processing pages can still redirect to the report
+
+
+class JobState(Enum):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    SAVING = "Saving"  # every plugin has completed, the report writer is storing the report
+    FINISHED = "Finished"
+
+    def __repr__(self):
+        return self.value
+
+
+class Job:
+    """
+    Class is used to store a report within the job table
+    """
+
+    def __init__(self, job_id: int, processor):
+        """
+        :param job_id: ID of the job within the job table
+        :param processor: ReportProcessor which processes the report
+        """
+        self.job_id = job_id
+        self.processor = processor
+        self.state = JobState.QUEUED
+
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def __repr__(self):
+        return f"Job(job_id={self.job_id}, report='{self.processor.report.name}', state={self.state!r})"
+
+    @property
+    def position(self) -> int:
+        """
+        :return: Returns the number of jobs ahead of the job in the queue, or None if it isn't queued
+        """
+        if self.state is not JobState.QUEUED:
+            return None
+
+        with jobs_lock:
+            return len([job for job in jobs.values() if job.state is JobState.QUEUED and job.job_id < self.job_id])
+
+    def run(self):
+        """
+        Function processes the report, then starts the next queued job while the report is stored
+        """
+        try:
+            self.processor.start()
+        except Exception as e:
+            logger.error(f'Report {self.processor.report.name} failed')
+            logger.debug(e)
+        finally:
+            stored = self.processor.stored
+            if stored is not None:
+                with jobs_lock:
+                    self.state = JobState.SAVING
+                self.processor.add_event({"type": "job", "state": self.state.value})
+                stored.add_done_callback(lambda future: self.finish())
+            else:
+                self.finish()
+
+            admit_jobs()
+
+    def finish(self):
+        """
+        Function marks the job as finished, if the report wasn't stored anything waiting on the processor is told the
+        report finished without one
+        """
+        with jobs_lock:
+            self.state = JobState.FINISHED
+            self.finished = time.time()
+
+        self.processor.add_event({"type": "job", "state": self.state.value})
+        if not self.processor.finished:
+            self.processor.finished = True
+            self.processor.add_event({"type": "finished", "report_id": None})
+
+
+def max_reports() -> int:
+    """
+    :return: Returns the number of reports which can be processed at once, 0 if there is no limit
+    """
+    return config.getint("reports", "max_reports", fallback=0)
+
+
+def admit_jobs():
+    """
+    Function starts as many queued jobs as the report limit allows, in the order they were submitted
+    """
+    with jobs_lock:
+        limit = max_reports()
+        running = len([job for job in jobs.values() if job.state is JobState.RUNNING])
+
+        admitted = []
+        for job in sorted(jobs.values(), key=lambda j: j.job_id):
+            if limit > 0 and running >= limit:
+                break
+
+            if job.state is JobState.QUEUED:
+                job.state = JobState.RUNNING
+                job.started = time.time()
+                admitted.append(job)
+                running += 1
+
+        # forget the oldest finished jobs
+        finished = sorted(job.job_id for job in jobs.values() if job.state is JobState.FINISHED)
+        for job_id in finished[:-finished_job_limit]:
+            del jobs[job_id]
+
+    for job in admitted:
+        logger.debug(f"Starting {job}")
+        job.processor.add_event({"type": "job", "state": job.state.value})
+
+        if threading_enabled:
+            thread = Thread(target=job.run, name=f"Report Job {job.job_id}")
+            thread.daemon = True
+            thread.start()
+        else:
+            job.run()
+
+
+def submit_job(processor) -> int:
+    """
+    Function adds a report to the job table, the report is started immediately if the report limit allows it, otherwise
+    it is queued until another report finishes
+
+    :param processor: ReportProcessor which processes the report
+    :return: Job ID of the report
+    """
+    with jobs_lock:
+        job = Job(next(job_ids), processor)
+        jobs[job.job_id] = job
+
+    logger.debug(f"Queued {job}")
+    admit_jobs()
+
+    return job.job_id
+
+
+def cancel_job(job_id: int) -> bool:
+    """
+    Function cancels a job, a queued job is removed from the queue without being processed, and a running job cancels
+    its plugins and stores the results produced so far
+
+    :param job_id: ID of the job to cancel
+    :return: True if the job was queued or running
+    """
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None or job.state in (JobState.SAVING, JobState.FINISHED):
+            return False
+
+        queued = job.state is JobState.QUEUED
+        if queued:
+            job.state = JobState.FINISHED  # stops the job from being admitted
+
+    job.processor.cancel()
+    if queued:
+        job.finish()
+
+    return True
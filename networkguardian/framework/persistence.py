@@ -0,0 +1,130 @@
+"""
+Module contains the background writer used to store reports once they have finished processing.
+
+Report processors hand their finished report to the writer rather than storing it themselves, so the processing thread
+can move on as soon as the last plugin completes. The writer runs on a single thread and works through the reports in
+the order they finished. Reports which finish while another is being stored are stored together as a batch, so the
+report index is updated once for the whole batch rather than once for each report. If completing a batch fails, each
+write in it is completed on its own, so one report which can't be indexed doesn't fail the others.
+
+The writer's thread is a daemon so it can't keep the application open, the writes still queued when the application
+exits are waited for by join().
+"""
+import queue
+import time
+from concurrent import futures
+from threading import Thread, Lock
+
+from networkguardian import logger, threading_enabled
+
+
+class BackgroundWriter:
+    """
+    Class is used to run writes on a background thread in the order they were submitted, completing each batch of
+    writes with a single call
+    """
+
+    def __init__(self, complete_batch, name: str = "Report Writer", batch_limit: int = 16):
+        """
+        :param complete_batch: Function called with the values returned by each write in a batch, which returns the
+        result of each write in the same order
+        :param name: Name of the writer thread
+        :param batch_limit: Maximum number of writes completed together
+        """
+        self.complete_batch = complete_batch
+        self.name = name
+        self.batch_limit = batch_limit
+
+        self.queue = queue.Queue()  # (write function, Future)
+        self.thread = None
+        self.lock = Lock()
+
+    def submit(self, write) -> futures.Future:
+        """
+        Function queues a write, if threading is disabled the write is run immediately
+
+        :param write: Function which performs the write, its return value is passed to complete_batch
+        :return: Future which completes with the result complete_batch returned for the write
+        """
+        future = futures.Future()
+        if not threading_enabled:
+            self._run([(write, future)])
+            return future
+
+        self.queue.put((write, future))
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self._work, name=self.name)
+                self.thread.daemon = True
+                self.thread.start()
+
+        return future
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Function blocks until every queued write has been completed
+
+        :param timeout: Maximum seconds to wait, waits indefinitely if None
+        :return: Returns True if every write was completed, False if the timeout passed first
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+
+        return True
+
+    def _work(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_limit:  # take any other writes which are waiting, up to the batch limit
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._run(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _run(self, batch: [tuple]):
+        """
+        Function runs each write in a batch, then completes the writes which succeeded together
+        """
+        written = []  # (Future, value returned by the write)
+        for write, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                written.append((future, write()))
+            except Exception as e:
+                logger.debug(f'{self.name} failed to write: {e}')
+                future.set_exception(e)
+
+        if not written:
+            return
+
+        try:
+            results = self.complete_batch([value for _, value in written])
+        except Exception as e:
+            logger.debug(f'{self.name} failed to complete a batch of {len(written)} writes: {e}')
+            if len(written) == 1:
+                written[0][0].set_exception(e)
+                return
+
+            for future, value in written:  # complete each write on its own, so only the ones which fail are failed
+                try:
+                    future.set_result(self.complete_batch([value])[0])
+                except Exception as e:
+                    logger.debug(f'{self.name} failed to complete a write: {e}')
+                    future.set_exception(e)
+            return
+
+        for (future, _), result in zip(written, results):
+            future.set_result(result)
@@ -1,11 +1,16 @@
+import asyncio
 import inspect
 import os
 import platform
 from enum import Enum
+from threading import Lock
 
 from networkguardian.exceptions import PluginUnsupportedPlatformError, PluginProcessingError, \
     PluginRequiresElevationError, PluginExecutorError
 
+template_cache = {}  # template path, tuple of the modification time and contents of templates which have been read
+template_cache_lock = Lock()
+
 
 class SystemPlatform(Enum):
     """
@@ -57,10 +62,28 @@ class PluginCategory(Enum):
         return self.value
 
 
-def executor(template_path: str, *platforms: SystemPlatform, requires_elevation: bool = False):
+class WorkClass(Enum):
+    """
+    Enum is used to describe what an executor spends most of its time doing, each work class has its own worker limit
+    so slow network requests don't hold back CPU heavy plugins and vice versa
+    """
+    IO = 'I/O'  # waiting on the network or file system i.e. urlopen
+    SUBPROCESS = 'Subprocess'  # waiting on another program i.e. nmap, netsh, wmic
+    CPU = 'CPU'  # processing data within Python
+
+    def __repr__(self):
+        return self.value
+
+
+def executor(template_path: str, *platforms: SystemPlatform, requires_elevation: bool = False, produces: str = None,
+             consumes: (str,) = (), run_in_process: bool = False, work_class: WorkClass = WorkClass.IO,
+             timeout: float = None, cache_ttl: float = None):
     """
         Executor is what plugins use to identify the function which is required to be called to produce data as an output
 
+        Executors can either be normal functions, which are run in a worker thread, or coroutine functions (async def),
+        which are run on the event loop shared by the report processor so they don't tie up a thread while waiting
+
         Decorators are called BEFORE class is built i.e __new__, so with a decorator we can tag the function with the
         supported platform e.t.c, and then post process it later with the base class
 
@@ -68,18 +91,39 @@ def executor(template_path: str, *platforms: SystemPlatform, requires_elevation:
         :param platforms: A list containing the supported platforms enums that the function can run on
         :param requires_elevation: Boolean stating whether the plugin requires the software to be running with elevated
         system permissions (i.e. root/Administrator)
+        :param produces: Name the data returned by the executor is shared under with other plugins in the same report
+        :param consumes: Names of data produced by other plugins which the executor can use, the data is passed as the
+        parameter of the same name if a plugin producing it is in the report, so the executor must also work without it
+        :param run_in_process: Boolean stating whether the executor should be run in a separate worker process, which
+        should be used by CPU heavy executors so they don't block the web server and other plugins. Resources and the
+        data returned must be able to be pickled
+        :param work_class: WorkClass describing what the executor spends most of its time doing, used to decide how many
+        executors of the same kind can run at once
+        :param timeout: Seconds the executor is given to finish before it is cancelled, by default the plugin timeout
+        setting is used
+        :param cache_ttl: Seconds the data returned by the executor can be reused by later reports instead of processing
+        the plugin again, by default results aren't cached. Plugins can override fingerprint() so cached data is only
+        reused while whatever it was gathered from is unchanged
         :return:
     """
 
     def decorator(fn):
         # Locate template file relative to where the plugin is located on the system
         plugin_path = os.path.dirname(inspect.getfile(fn))
-        # Open the template and store the data in a variable
-        template_data = open(os.path.join(plugin_path, template_path)).read()
 
         # add attributes to function
-        fn._template = template_data
+        # the template is only read once the plugin is loaded, see template
+        fn._template_path = os.path.join(plugin_path, template_path)
         fn._requires_elevation = requires_elevation
+        fn._parameters = tuple(inspect.signature(fn).parameters)  # used to decide which resources are passed through
+        fn._asynchronous = inspect.iscoroutinefunction(fn)
+        fn._run_in_process = run_in_process
+        fn._work_class = work_class
+        fn._timeout = timeout
+        fn._cache_ttl = cache_ttl
+        fn._path = inspect.getfile(fn)  # used by worker processes to import the plugin
+        fn._produces = produces
+        fn._consumes = tuple(consumes)
 
         if len(platforms) == 0:  # if no platform specified, automatically support all Platforms...
             fn._platforms = [p for p in SystemPlatform]
@@ -91,6 +135,33 @@ def executor(template_path: str, *platforms: SystemPlatform, requires_elevation:
     return decorator
 
 
+def load_template(template_path: str) -> str:
+    """
+    Function reads a plugin template, the template is cached once read and only read again if its file is modified
+
+    :param template_path: Path of the template file
+    :return: Returns the contents of the template
+    :raises OSError: if the template has never been read and can't be
+    """
+    try:
+        modified = os.stat(template_path).st_mtime_ns
+    except OSError:
+        modified = None  # the last contents read are used if the file has since been removed
+
+    with template_cache_lock:
+        cached = template_cache.get(template_path)
+    if cached is not None and (modified is None or cached[0] == modified):
+        return cached[1]
+
+    with open(template_path) as f:
+        template_data = f.read()
+
+    with template_cache_lock:
+        template_cache[template_path] = (modified, template_data)
+
+    return template_data
+
+
 class MetaPlugin(type):
     """
         Metaclass modifies the class-creation behavior
@@ -115,6 +186,7 @@ class PluginInformation:
     """
         Class is used to store the information required by all plugins
     """
+    __slots__ = ("name", "category", "description", "author", "version")
 
     def __init__(self, name: str, category: PluginCategory, author: str, version: float):
         """
@@ -143,7 +215,9 @@ class AbstractPlugin(PluginInformation, metaclass=MetaPlugin):
         self._running_platform = None  # used to store the system platform that is running
 
         self.execute = None  # used to store platform specific execute function
-        self.template = None  # used to store platform specific template data
+
+        self.import_duration = None  # seconds taken to import the plugin's module, displayed in GUI
+        self.load_duration = None  # seconds taken to load the plugin, including initialize()
 
     def __repr__(self):
         return 'Plugin(name=%r, description=%r, author=%r, version=%r)' \
@@ -168,7 +242,11 @@ class AbstractPlugin(PluginInformation, metaclass=MetaPlugin):
         self.initialize()  # call plugin's initialization method  MAY :raise: PluginInitializationError
 
         self.execute = self._executors[running_platform]  # monkey patch the function execute with executor
-        self.template = self.execute._template  # copy template data loaded from executor and set to template for the instance
+
+        try:  # only the running platform's template is read
+            load_template(self.execute._template_path)
+        except OSError as e:
+            raise PluginExecutorError(f"Template {self.execute._template_path} can't be read: {e.strerror}")
 
         if self.execute._requires_elevation and not running_elevated:
             raise PluginRequiresElevationError("Plugin requires elevated system permissions to run")
@@ -179,6 +257,13 @@ class AbstractPlugin(PluginInformation, metaclass=MetaPlugin):
     def loaded(self) -> bool:
         return self._loaded
 
+    @property
+    def template(self) -> str:
+        """
+        :return: Returns the template of the running platform's executor, the file is read again if it is modified
+        """
+        return load_template(self.execute._template_path) if self.execute else None
+
     def initialize(self):
         """
         If a derived plugin class requires additional functionality when being initialized such as checking the system
@@ -188,15 +273,144 @@ class AbstractPlugin(PluginInformation, metaclass=MetaPlugin):
         """
         pass
 
-    def process(self) -> {}:
+    def process(self, **resources) -> {}:
         """
         Function is used to produce the data by a plugin executor
+
+        Resources shared by the report processor (i.e. the SystemSnapshot as snapshot) are only passed through to the
+        executor if it has a parameter with the same name, so executors only need to ask for what they use.
+
+        :param resources: Resources provided by the report processor
         :return: Plugin Executor data
         """
         if not self.loaded:  # further check to ensure somehow the plugin isn't executed if not loaded
             raise PluginProcessingError("Plugin must be loaded before processing.")
 
-        return self.execute(self)
+        if self.runs_in_process:
+            from networkguardian.framework.pool import submit_to_process_pool  # avoid circular import
+            return submit_to_process_pool(self, resources).result()
+
+        return self.process_locally(**resources)
+
+    def process_locally(self, **resources) -> {}:
+        """
+        Function runs the plugin executor within the calling process and thread, this is used by worker processes and
+        should not be called directly
+
+        :param resources: Resources provided by the report processor
+        :return: Plugin Executor data
+        """
+        if self.asynchronous:  # coroutine executors are run to completion on their own event loop
+            return asyncio.run(self.execute(self, **self._arguments(resources)))
+
+        return self.execute(self, **self._arguments(resources))
+
+    async def process_async(self, **resources) -> {}:
+        """
+        Coroutine is used to produce the data by a plugin executor on an already running event loop, normal executors
+        are run in the loop's default executor so both kinds can be awaited
+
+        :param resources: Resources provided by the report processor
+        :return: Plugin Executor data
+        """
+        if not self.loaded:
+            raise PluginProcessingError("Plugin must be loaded before processing.")
+
+        if self.asynchronous:
+            return await self.execute(self, **self._arguments(resources))
+
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: self.process(**resources))
+
+    def fingerprint(self, **resources) -> str:
+        """
+        If the data produced by a plugin depends on something which can be checked cheaply, such as the modification
+        time of a file, this function should be overridden to return a string which changes whenever it does, so cached
+        data is only reused while it is still correct. Resources are passed through in the same way as the executor.
+
+        :return: Fingerprint of the executor's inputs, or None if the data only depends on the plugin and platform
+        """
+        return None
+
+    def rows(self, data: {}) -> {}:
+        """
+        Function splits the data produced by the plugin into rows keyed by something which identifies them between
+        reports, such as a port or user name, this is used to compare the results of two reports. By default each item
+        of the values within the data is a row, keyed by the name of the value and the key of the item, or the item
+        itself for lists. This should be overridden if the keys of the data aren't stable, i.e. rows are numbered in the
+        order they were found, or if rows contain values which change every time, i.e. counters.
+
+        :param data: Data produced by the executor
+        :return: Dictionary of row key tuple, row, or None to use the default rows
+        """
+        return None
+
+    def cache_key(self, resources: {}) -> tuple:
+        """
+        :param resources: Resources provided by the report processor
+        :return: Returns the key the plugin's data is cached under
+        """
+        parameters = inspect.signature(self.fingerprint).parameters
+        if not any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+            resources = {name: value for name, value in resources.items() if name in parameters}
+
+        fingerprint = self.fingerprint(**resources)
+
+        return self.name, self.version, str(self._running_platform), fingerprint
+
+    def _arguments(self, resources: {}) -> {}:
+        """
+        :return: Returns the resources which are named as parameters of the executor
+        """
+        return {name: value for name, value in resources.items() if name in self.execute._parameters}
+
+    @property
+    def asynchronous(self) -> bool:
+        """
+        :return: Returns True if the plugin's executor is a coroutine function
+        """
+        return self.execute._asynchronous if self.execute else False
+
+    @property
+    def runs_in_process(self) -> bool:
+        """
+        :return: Returns True if the plugin's executor should be run in a worker process
+        """
+        return self.execute._run_in_process if self.execute else False
+
+    @property
+    def work_class(self) -> WorkClass:
+        """
+        :return: Returns the WorkClass of the plugin's executor
+        """
+        return self.execute._work_class if self.execute else WorkClass.IO
+
+    @property
+    def timeout(self) -> float:
+        """
+        :return: Returns the seconds the plugin's executor is given to finish, or None to use the plugin timeout setting
+        """
+        return self.execute._timeout if self.execute else None
+
+    @property
+    def cache_ttl(self) -> float:
+        """
+        :return: Returns the seconds the plugin's data can be reused from the cache, or None if it isn't cached
+        """
+        return self.execute._cache_ttl if self.execute else None
+
+    @property
+    def produces(self) -> str:
+        """
+        :return: Returns the name the plugin's data is shared under with other plugins, or None
+        """
+        return self.execute._produces if self.execute else None
+
+    @property
+    def consumes(self) -> (str,):
+        """
+        :return: Returns the names of the data produced by other plugins which the plugin can use
+        """
+        return self.execute._consumes if self.execute else ()
 
     @property
     def supported(self) -> bool:
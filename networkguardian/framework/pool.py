@@ -0,0 +1,390 @@
+"""
+Module contains the worker pools shared by every report, a thread pool for each work class which is used to run normal
+plugin executors, and the worker process pool used to run plugin executors which are marked to run in a separate
+process.
+
+The pools are created the first time they are required and are then reused by every report, so the number of plugins
+running at once is limited across the whole application rather than per report, and the cost of starting worker
+processes and importing plugins within them is only paid once.
+"""
+import multiprocessing
+import pickle
+import time
+from collections import OrderedDict, deque
+from concurrent import futures
+from concurrent.futures.process import ProcessPoolExecutor, BrokenProcessPool
+from threading import Lock, Timer, Condition, Thread, Event, current_thread
+
+from networkguardian import logger
+from networkguardian.framework.cancellation import CancellationToken
+from networkguardian.framework.plugin import AbstractPlugin, SystemPlatform, WorkClass
+from networkguardian.framework.registry import registered_plugins, import_plugin, is_elevated, get_thread_count
+from networkguardian.framework.telemetry import PluginTelemetry
+
+process_pool = None
+process_pool_lock = Lock()
+
+manager = None  # multiprocessing manager holding the events used to cancel executors running in worker processes
+manager_lock = Lock()
+cancellation_poll_interval = 0.5  # seconds between a worker checking whether its executor is still running
+
+thread_pools = {}  # WorkClass, FairThreadPool
+thread_pools_lock = Lock()
+
+
+class FairThreadPool:
+    """
+    Class is a thread pool shared between reports which gives each report a fair share of the worker threads.
+
+    Tasks are queued per owner (the report which submitted them), and whenever a worker thread becomes free it takes the
+    next task from the owner after the one it last served, so one report with many queued plugins can't hold back the
+    plugins of reports started after it. Worker threads are started as they are needed up to the maximum.
+
+    Threads can't be killed, so a task which is given up on, see abandon(), keeps its thread until it returns. The
+    thread stops counting towards the maximum as soon as the task is abandoned and leaves the pool once it returns, so
+    plugins which hang can't starve the reports started after them.
+    """
+
+    def __init__(self, max_workers: int, name: str):
+        """
+        :param max_workers: Maximum number of worker threads
+        :param name: Name the worker threads are given
+        """
+        self.max_workers = max_workers
+        self.name = name
+
+        self.queues = OrderedDict()  # owner, deque of queued tasks, in the order the owners are served
+        self.condition = Condition()
+        self.threads = []
+        self.idle = 0  # number of worker threads waiting for a task
+        self.running = {}  # Future, worker thread running its task
+        self.abandoned = set()  # worker threads running a task which has been given up on
+
+    def submit(self, owner, fn, /, *args, **kwargs) -> futures.Future:
+        """
+        Function queues a task to be run by a worker thread
+
+        :param owner: Object the task belongs to, tasks are shared fairly between owners
+        :param fn: Callable to run
+        :return: Future which completes with the result of the callable
+        """
+        future = futures.Future()
+        with self.condition:
+            self.queues.setdefault(owner, deque()).append((future, fn, args, kwargs))
+            self._start_workers()
+            self.condition.notify()
+
+        return future
+
+    def abandon(self, future: futures.Future):
+        """
+        Function gives up on a task which is running, its thread is replaced so the pool keeps its size while the task
+        finishes in the background
+
+        :param future: Future returned by submit(), futures of other pools are ignored
+        """
+        with self.condition:
+            thread = self.running.get(future)
+            if thread is None:
+                return
+
+            self.abandoned.add(thread)
+            self._start_workers()
+
+    @property
+    def workers(self) -> int:
+        """
+        :return: Returns the number of worker threads counted towards the maximum
+        """
+        return len(self.threads) - len(self.abandoned)
+
+    def _start_workers(self):
+        """
+        Function starts worker threads until there is one for every queued task or the maximum is reached, the
+        condition must be held
+        """
+        queued = sum(len(queue) for queue in self.queues.values())
+        while queued > self.idle and self.workers < self.max_workers:
+            thread = Thread(target=self._work, name=f"{self.name} {len(self.threads) + 1}")
+            thread.daemon = True
+            self.threads.append(thread)
+            self.idle += 1  # counted as idle until it takes its first task, so it isn't started twice
+            thread.start()
+
+    def cancel(self, owner) -> int:
+        """
+        Function cancels every task of an owner which hasn't started yet
+
+        :param owner: Object the tasks belong to
+        :return: Number of tasks cancelled
+        """
+        with self.condition:
+            queue = self.queues.pop(owner, ())
+
+        for future, *_ in queue:
+            future.cancel()
+
+        return len(queue)
+
+    @property
+    def queued(self) -> int:
+        with self.condition:
+            return sum(len(queue) for queue in self.queues.values())
+
+    def _next(self) -> tuple:
+        """
+        Function takes the next task from the owner at the front of the queue, then moves the owner to the back
+        """
+        owner, queue = next(iter(self.queues.items()))
+        task = queue.popleft()
+
+        del self.queues[owner]
+        if queue:
+            self.queues[owner] = queue
+
+        return task
+
+    def _work(self):
+        thread = current_thread()
+        with self.condition:
+            self.idle -= 1  # started as idle by _start_workers()
+
+        while True:
+            with self.condition:
+                self.idle += 1
+                self.condition.wait_for(lambda: self.queues)
+                self.idle -= 1
+
+                future, fn, args, kwargs = self._next()
+                if not future.set_running_or_notify_cancel():
+                    continue  # cancelled while queued
+                self.running[future] = thread
+
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+            with self.condition:
+                del self.running[future]
+                if thread in self.abandoned:  # a replacement was started when the task was abandoned
+                    self.abandoned.discard(thread)
+                    self.threads.remove(thread)
+                    return
+
+
+def get_thread_pool(work_class: WorkClass) -> FairThreadPool:
+    """
+    :param work_class: Work class of the executors which will be run in the pool
+    :return: Returns the thread pool shared by all reports for the work class, creating it if required
+    """
+    with thread_pools_lock:
+        if work_class not in thread_pools:
+            logger.debug(f"Starting {work_class.value} thread pool")
+            thread_pools[work_class] = FairThreadPool(0, f"{work_class.value} Worker")
+
+        thread_pool = thread_pools[work_class]
+
+    # the worker limits can be changed in the settings while the application is running
+    thread_pool.max_workers = get_thread_count(work_class=work_class)
+    return thread_pool
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    :return: Returns the process pool shared by all reports, creating it if required
+    """
+    global process_pool
+
+    with process_pool_lock:
+        if process_pool is None:
+            logger.debug("Starting plugin process pool")
+            process_pool = ProcessPoolExecutor(max_workers=get_thread_count(work_class=WorkClass.CPU))
+
+    return process_pool
+
+
+def reset_process_pool():
+    """
+    Function discards the shared process pool, used when a worker process has died and the pool is no longer usable
+    """
+    global process_pool
+
+    with process_pool_lock:
+        if process_pool is not None:
+            process_pool.shutdown(wait=False)
+            process_pool = None
+
+
+def create_cancel_event():
+    """
+    :return: Returns an event which can be set by the report processor and waited on by a worker process, or None if
+    the manager which holds the events couldn't be started
+    """
+    global manager
+
+    with manager_lock:
+        if manager is None:
+            try:
+                logger.debug("Starting plugin cancellation manager")
+                manager = multiprocessing.Manager()
+            except Exception as e:
+                logger.error('Failed to start the cancellation manager, '
+                             'plugins in worker processes can\'t be cancelled')
+                logger.debug(e)
+                manager = False  # not tried again
+
+        if not manager:
+            return None
+
+    try:
+        return manager.Event()
+    except Exception as e:  # the manager's process has stopped
+        logger.debug(f'Failed to create a cancellation event: {e}')
+        return None
+
+
+class RemoteCancellation:
+    """
+    Class is registered with the cancellation token of an executor running in a worker process, when the token is
+    cancelled the event is set so the worker cancels its own token, killing the executor's processes
+    """
+
+    def __init__(self, event):
+        self.event = event
+
+    def stop(self):
+        self.event.set()
+
+
+def submit_to_process_pool(plugin: AbstractPlugin, resources: {}, telemetry: PluginTelemetry = None) -> futures.Future:
+    """
+    Function submits a plugin to be processed by a worker process
+
+    :param plugin: Plugin to process
+    :param resources: Resources passed through to the plugin executor, these must be able to be pickled
+    :param telemetry: PluginTelemetry to store the cost measured by the worker in
+    :return: Future which completes with the data produced by the plugin
+    """
+    # only the resources used by the executor are sent to the worker
+    arguments = plugin._arguments(resources)
+
+    # cancellation tokens can't be sent between processes, the worker creates its own with the same deadline and
+    # restored checkpoints instead, shards checkpointed within the worker are only kept for the one execution. The
+    # worker's token is cancelled through an event when the report cancels the plugin.
+    token = arguments.pop("cancellation", None)
+    timeout = token.remaining() if token is not None else None
+    checkpoints = token.checkpoints if token is not None else None
+
+    cancel_event = None
+    if token is not None:
+        cancel_event = create_cancel_event()
+        if cancel_event is not None:
+            token.register(RemoteCancellation(cancel_event))
+
+    task = (process_in_worker, plugin.name, plugin.execute._path, arguments, timeout, checkpoints, cancel_event)
+    try:
+        worker_future = get_process_pool().submit(*task)
+    except BrokenProcessPool:
+        reset_process_pool()
+        worker_future = get_process_pool().submit(*task)
+
+    future = futures.Future()
+
+    def on_done(completed: futures.Future):
+        if not future.set_running_or_notify_cancel():  # the report gave up on the plugin, its result isn't needed
+            if not completed.cancelled() and isinstance(completed.exception(), BrokenProcessPool):
+                reset_process_pool()
+            return
+
+        try:
+            pickled_data, measured = completed.result()
+            if telemetry is not None:
+                telemetry.update(measured)
+                telemetry.bytes_returned = len(pickled_data)
+
+            future.set_result(pickle.loads(pickled_data))
+        except BrokenProcessPool as e:
+            reset_process_pool()
+            future.set_exception(e)
+        except Exception as e:
+            measured = getattr(e, "telemetry", None)  # attached by the worker when the executor raised
+            if telemetry is not None and measured is not None:
+                telemetry.update(measured)
+
+            future.set_exception(e)
+
+    worker_future.add_done_callback(on_done)
+    return future
+
+
+def watch_cancellation(cancel_event, token: CancellationToken, finished: Event):
+    """
+    Function is run on a thread within a worker process, it cancels the executor's token once the report cancels the
+    plugin, until the executor finishes
+    """
+    while not finished.is_set() and not token.cancelled:
+        try:
+            if cancel_event.wait(cancellation_poll_interval):
+                token.cancel()
+                return
+        except (EOFError, OSError):  # the manager has stopped, the application is exiting
+            return
+
+
+def process_in_worker(plugin_name: str, plugin_path: str, resources: {}, timeout: float = None,
+                      checkpoints: {} = None, cancel_event=None) -> (bytes, {}):
+    """
+    Function is run within a worker process to process a plugin, if the plugin hasn't been imported into the worker yet
+    it is imported and loaded first
+
+    The data is pickled with the highest protocol available before it is returned, which is quicker and smaller than
+    the default protocol used by the process pool for large nested data i.e. nmap results
+
+    :param plugin_name: Name of the plugin to process
+    :param plugin_path: Path of the module containing the plugin
+    :param resources: Resources passed through to the plugin executor
+    :param timeout: Seconds until the executor's cancellation token is cancelled, None for no deadline
+    :param checkpoints: Shards completed before the report was resumed, restored by the executor's cancellation token
+    :param cancel_event: Event set when the report cancels the plugin, None if the plugin can't be cancelled
+    :return: Tuple of the pickled Plugin Executor data and the PluginTelemetry measured as a dictionary
+    :raises Exception: exceptions raised by the executor, with the PluginTelemetry measured as a telemetry attribute
+    """
+    plugin = registered_plugins.get(plugin_name)
+    if plugin is None or plugin.execute is None or plugin.execute._path != plugin_path:
+        import_plugin(plugin_path)
+        plugin = registered_plugins[plugin_name]
+
+    if not plugin.loaded:
+        plugin.load(SystemPlatform.detect(), is_elevated())
+
+    token = CancellationToken(time.monotonic() + timeout if timeout is not None else None, checkpoints)
+    timer = None
+    if timeout is not None:  # kill the executor's processes when the deadline passes, as the parent can't reach them
+        timer = Timer(timeout, token.cancel)
+        timer.daemon = True
+        timer.start()
+
+    finished = Event()
+    if cancel_event is not None:
+        watcher = Thread(target=watch_cancellation, args=(cancel_event, token, finished), name="Cancellation Watcher")
+        watcher.daemon = True
+        watcher.start()
+
+    telemetry = PluginTelemetry()
+    try:
+        with telemetry.measure(process_wide=True):  # the worker only processes one plugin at a time
+            data = plugin.process_locally(cancellation=token, **resources)
+    except Exception as e:
+        # the telemetry is attached to the exception so failed plugins still record their cost, attributes of an
+        # exception are kept when it is pickled back to the parent process
+        e.telemetry = telemetry.to_dict()
+        raise
+    finally:
+        finished.set()
+        if timer is not None:
+            timer.cancel()
+
+    return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), telemetry.to_dict()
@@ -0,0 +1,263 @@
+"""
+Module contains the startup profiler, used by the --profile-startup option to show where the time between starting
+Network Guardian and it being usable goes.
+
+Most of the startup time is spent importing modules, which happens before the command line is parsed, so the profiler is
+started from the top of the networkguardian package if the option is in sys.argv. An ImportTimer is put at the front of
+sys.meta_path to time each module as it is executed. A module's time excludes the modules it imported itself, so the
+times can be added up by package without counting any module twice. The main phases of startup, such as importing and
+loading plugins, loading reports and waiting for the server, are measured with measure().
+
+The profile is printed as a ranked breakdown once the application is ready, and can also be written as a Chrome trace
+(chrome://tracing or https://ui.perfetto.dev) with the --profile-trace option to compare startup between releases.
+
+This module only uses the standard library so it can be imported before anything else.
+"""
+import importlib.abc
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+startup_option = "--profile-startup"
+trace_option = "--profile-trace"
+
+tracked_packages = ("flask", "webview", "nmap", "networkx", "psutil")  # always listed, even if they aren't imported
+ranked_limit = 15  # packages listed in the import breakdown, besides the tracked packages
+
+startup_profile = None
+startup_profile_lock = threading.Lock()
+
+
+class StartupProfile:
+    """
+    Class is used to store the times measured while the application starts
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events = []  # tuple of name, category, start and end time, and thread ID of everything measured
+        self.imports = {}  # top level package, seconds spent executing its modules
+        self.trace_path = None  # path the Chrome trace is written to, if any
+        self.lock = threading.Lock()
+
+    def add_event(self, name: str, category: str, start: float, end: float):
+        with self.lock:
+            self.events.append((name, category, start, end, threading.get_ident()))
+
+    def add_import(self, module_name: str, start: float, end: float, own_duration: float):
+        """
+        :param own_duration: Seconds spent executing the module, excluding the modules it imported
+        """
+        package = module_name.partition(".")[0]
+        with self.lock:
+            self.events.append((module_name, "import", start, end, threading.get_ident()))
+            self.imports[package] = self.imports.get(package, 0) + own_duration
+
+    def phases(self) -> [(str, float)]:
+        """
+        :return: Returns the name and duration of each phase, longest first
+        """
+        with self.lock:
+            phases = [(name, end - start) for name, category, start, end, _ in self.events if category == "phase"]
+        return sorted(phases, key=lambda phase: phase[1], reverse=True)
+
+    def ranked_imports(self) -> [(str, float)]:
+        """
+        :return: Returns the package and time spent importing it of the slowest packages and the tracked packages,
+        slowest first, the time is None for tracked packages which weren't imported
+        """
+        with self.lock:
+            imports = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)
+
+        ranked = imports[:ranked_limit]
+        ranked.extend(item for item in imports[ranked_limit:] if item[0] in tracked_packages)
+        ranked.extend((package, None) for package in tracked_packages if package not in self.imports)
+        return ranked
+
+    def format(self) -> str:
+        """
+        :return: Returns the ranked breakdown of the profile
+        """
+        total = time.perf_counter() - self.started
+        lines = [f"Startup took {total:.3f}s", "", "Phases:"]
+        for name, duration in self.phases():
+            lines.append(f"  {duration:8.3f}s {duration / total:6.1%}  {name}")
+
+        lines.extend(["", "Imports (excluding the modules each imported):"])
+        for package, duration in self.ranked_imports():
+            if duration is None:
+                lines.append(f"  {'-':>9} {'':>6}  {package} (not imported)")
+            else:
+                lines.append(f"  {duration:8.3f}s {duration / total:6.1%}  {package}")
+
+        return "\n".join(lines)
+
+    def trace(self) -> {}:
+        """
+        :return: Returns the profile in the Chrome trace event format
+        """
+        with self.lock:
+            events = list(self.events)
+
+        return {
+            "traceEvents": [{
+                "name": name,
+                "cat": category,
+                "ph": "X",  # complete event, with a duration
+                "ts": (start - self.started) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": 0,
+                "tid": thread_id,
+            } for name, category, start, end, thread_id in events],
+            "displayTimeUnit": "ms",
+        }
+
+    def write_trace(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
+
+
+class TimedLoader(importlib.abc.Loader):
+    """
+    Class wraps the loader of a module to time executing it, the module is given back its own loader before it is
+    executed so nothing else sees the wrapper
+    """
+
+    def __init__(self, loader, timer):
+        self.loader = loader
+        self.timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        spec = module.__spec__
+        spec.loader = module.__loader__ = self.loader
+
+        nested = self.timer.nested()
+        nested.append(0)  # seconds spent importing the modules this module imports
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            end = time.perf_counter()
+            imported = nested.pop()
+            if nested:
+                nested[-1] += end - start
+
+            self.timer.profile.add_import(spec.name, start, end, end - start - imported)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    Class is used to time every module imported, it finds modules through the other finders on sys.meta_path
+    """
+
+    def __init__(self, profile: StartupProfile):
+        self.profile = profile
+        self.local = threading.local()
+
+    def nested(self) -> [float]:
+        """
+        :return: Returns the stack of modules being executed by the current thread
+        """
+        if not hasattr(self.local, "nested"):
+            self.local.nested = []
+        return self.local.nested
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = TimedLoader(spec.loader, self)
+                return spec
+
+        return None
+
+
+def requested(arguments: [str]) -> bool:
+    """
+    :return: Returns True if the command line arguments ask for the startup to be profiled
+    """
+    return any(argument in (startup_option, trace_option) or argument.startswith(trace_option + "=")
+               for argument in arguments)
+
+
+def start_profile() -> StartupProfile:
+    """
+    Function starts profiling the startup, timing every module imported from now on
+    """
+    global startup_profile
+
+    with startup_profile_lock:
+        if startup_profile is None:
+            startup_profile = StartupProfile()
+            sys.meta_path.insert(0, ImportTimer(startup_profile))
+
+    return startup_profile
+
+
+def stop_profile() -> StartupProfile:
+    """
+    Function stops profiling the startup
+    :return: Returns the profile, or None if the startup isn't being profiled
+    """
+    global startup_profile
+
+    with startup_profile_lock:
+        profile, startup_profile = startup_profile, None
+        sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, ImportTimer)]
+
+    return profile
+
+
+@contextmanager
+def measure(name: str):
+    """
+    Function measures a phase of startup, if the startup is being profiled
+    """
+    profile = startup_profile
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.add_event(name, "phase", start, time.perf_counter())
+
+
+def record_phase(name: str, start: float = None):
+    """
+    Function records a phase of startup which ends now
+    :param start: perf_counter() value the phase started, when the profile started if None
+    """
+    profile = startup_profile
+    if profile is not None:
+        profile.add_event(name, "phase", profile.started if start is None else start, time.perf_counter())
+
+
+def finish_profile():
+    """
+    Function stops profiling the startup, printing the breakdown and writing the trace if requested
+    """
+    profile = stop_profile()
+    if profile is None:
+        return
+
+    print(profile.format())
+    if profile.trace_path:
+        try:
+            profile.write_trace(profile.trace_path)
+            print(f"Startup trace written to {profile.trace_path}")
+        except OSError as e:
+            print(f"Failed to write the startup trace to {profile.trace_path}: {e}")
+
+    sys.stdout.flush()  # the server command keeps running, so the output may otherwise sit in the buffer
@@ -1,15 +1,35 @@
 import ctypes
 import glob
+import hashlib
 import importlib.util
 import multiprocessing
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from os.path import basename
+from threading import Lock
 
-from networkguardian import logger
-from networkguardian.framework.plugin import PluginCategory, SystemPlatform, AbstractPlugin
+from networkguardian import logger, threading_enabled
+from networkguardian.config import config
+from networkguardian.exceptions import PluginExecutorError
+from networkguardian.framework.discovery import discover_plugins, LazyPlugin, NotStaticError
+from networkguardian.framework.plugin import PluginCategory, SystemPlatform, AbstractPlugin, WorkClass, \
+    PluginInformation
 
 registered_plugins = {}
+resolve_lock = Lock()  # held while a discovered plugin's module is imported, so it is only imported once
+importing = threading.local()  # plugins registered by the module each importer thread is importing
+
+slow_plugin_duration = 0.5  # seconds a plugin can take to import or load before it is highlighted as slow
+
+# WorkClass, name of the setting containing its worker limit
+work_class_settings = {
+    WorkClass.IO: "io_workers",
+    WorkClass.SUBPROCESS: "subprocess_workers",
+    WorkClass.CPU: "cpu_workers",
+}
 
 
 def usable_plugins() -> [AbstractPlugin]:
@@ -29,7 +49,12 @@ def register_plugin(name: str, category: PluginCategory, author: str, version: f
 
     def __init__(cls):
         instance = cls(name, category, author, version)  # create an instance
-        registered_plugins[name] = instance  # add to list
+
+        collected = getattr(importing, "plugins", None)
+        if collected is not None:  # module is being imported by import_external_plugins(), which registers it in order
+            collected.append(instance)
+        else:
+            registered_plugins[name] = instance  # add to list
 
     return __init__
 
@@ -38,45 +63,166 @@ def import_external_plugins(directory: str):
     """
     Import's python modules from directory paths
 
+    Modules are discovered or imported concurrently on a bounded thread pool, the plugins are then registered in the
+    order the modules were found so the order doesn't depend on which module finished first
+
     :param directory: directory to look for modules
     """
 
     # for each file in directory with .py extension
-    for file_path in glob.iglob(os.path.join(directory, '**/*.py'), recursive=True):
-        if os.path.isfile(file_path):  # double check its not a folder
-            module_name = basename(file_path)[:-3]  # get the name of the module
+    file_paths = [file_path for file_path in glob.iglob(os.path.join(directory, '**/*.py'), recursive=True)
+                  if os.path.isfile(file_path)]  # double check its not a folder
+
+    if threading_enabled and len(file_paths) > 1:
+        with ThreadPoolExecutor(get_thread_count(len(file_paths), WorkClass.IO),
+                                thread_name_prefix="Plugin Importer") as pool:
+            module_plugins = list(pool.map(import_module_plugins, file_paths))
+    else:
+        module_plugins = [import_module_plugins(file_path) for file_path in file_paths]
+
+    for plugins in module_plugins:
+        for plugin in plugins:
+            registered_plugins[plugin.name] = plugin
+
+
+def import_module_plugins(file_path: str) -> [PluginInformation]:
+    """
+    Function discovers the plugins of a module, the module is only imported if its plugins can't be discovered without
+    importing it
+
+    :param file_path: path to the module
+    :return: Returns the plugins the module registers, with the time taken to import the module
+    """
+    start = time.perf_counter()
+    plugins = []
+    try:
+        try:
+            declarations = discover_plugins(file_path)
+        except (NotStaticError, SyntaxError, ValueError, OSError) as e:
+            logger.debug(f'Importing module {file_path} as its plugins can\'t be discovered without it ({e})')
+
+            importing.plugins = plugins
             try:
-                spec = importlib.util.spec_from_file_location(module_name, file_path)
-                module = importlib.util.module_from_spec(spec)
-                sys.modules[module_name] = module
-                spec.loader.exec_module(module)  # import and exec
-            except Exception as e:
-                """
-                Using a broader expression is difficult here because there are so many which the user plugin may raise.
-                Therefore it is easier, and safer for program execution, to just ignore loading the plugin if any
-                exception is raised.
-                """
-                logger.debug(f'Failed to load module {module_name}', e)
-                continue  # goto next file
+                import_plugin(file_path)
+            finally:
+                importing.plugins = None
+        else:
+            plugins.extend(LazyPlugin(declaration) for declaration in declarations)  # imported once they are used
+    except Exception as e:
+        """
+        Using a broader expression is difficult here because there are so many which the user plugin may raise.
+        Therefore it is easier, and safer for program execution, to just ignore loading the plugin if any
+        exception is raised.
+        """
+        logger.debug(f'Failed to load module {file_path}')
+        logger.debug(e)
+
+    import_duration = time.perf_counter() - start
+    for plugin in plugins:
+        plugin.import_duration = import_duration
+
+    return plugins
+
+
+def import_plugin(file_path: str):
+    """
+    Import's a single python module from its path, any plugins within the module are registered when it is executed
+
+    Plugin modules usually share the same file name, so the module is named after the digest of its path to keep each
+    module separate in sys.modules. The name is the same in worker processes, which pickle the data plugins return.
+
+    :param file_path: path to the module
+    """
+    path_digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:12]
+    module_name = f'{basename(file_path)[:-3]}_{path_digest}'  # get the name of the module
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)  # import and exec
+
+
+def resolve_plugin(plugin: AbstractPlugin) -> AbstractPlugin:
+    """
+    Function imports the module of a plugin which was discovered without importing it, the plugin the module registers
+    replaces the LazyPlugin in registered_plugins and is loaded on the same platform
+
+    :param plugin: Plugin to resolve, plugins which were imported are returned as they are
+    :return: Returns the imported plugin
+    :raises Exception: if the module can't be imported or the plugin fails to load, the exception is also stored in the
+    plugin's loading_exception to be displayed in GUI
+    """
+    if not isinstance(plugin, LazyPlugin):
+        return plugin
+
+    with resolve_lock:
+        resolved = registered_plugins.get(plugin.name)
+        try:
+            if resolved is None or isinstance(resolved, LazyPlugin):
+                logger.debug(f'Importing {plugin.declaration.path} to resolve {plugin}')
+                start = time.perf_counter()
+                import_plugin(plugin.declaration.path)
+                resolved = registered_plugins.get(plugin.name)
+                if resolved is not None:
+                    resolved.import_duration = time.perf_counter() - start
+
+            if resolved is None or isinstance(resolved, LazyPlugin):
+                raise PluginExecutorError(f"{plugin.declaration.path} didn't register {plugin.name} when imported")
+        except Exception as loading_exception:
+            plugin.loading_exception = loading_exception
+            raise
+
+        if not resolved.loaded:
+            if resolved.loading_exception is not None:  # already failed to load when another report used it
+                raise resolved.loading_exception
+
+            start = time.perf_counter()
+            try:
+                resolved.load(plugin.running_platform, plugin.running_elevated)
+            except Exception as loading_exception:
+                resolved.loading_exception = loading_exception
+                raise
+            finally:
+                resolved.load_duration = time.perf_counter() - start
+
+    return resolved
 
 
 def load_plugins() -> bool:
     """
-    Function is used to all plugins stored in the registered_plugins list
+    Function is used to all plugins stored in the registered_plugins list, the plugins are loaded concurrently on a
+    bounded thread pool as initialize() may probe the system
     """
     running_platform = SystemPlatform.detect()  # store running platform as a variable for efficiency
     running_elevated = is_elevated()  # get status on whether software is running with adminstrator rights
-    for plugin in registered_plugins.values():  # loop through all plugins
-        try:
-            plugin.load(running_platform, running_elevated)  # attempt to load
-            logger.debug(f'Successfully loaded {plugin}')
-        except Exception as loading_exception:  # if exception add to the plugin so it can be displayed later in GUI
-            logger.debug(f'Failed to load {plugin} due to {loading_exception}, disabling.')
-            plugin.loading_exception = loading_exception
+
+    plugins = list(registered_plugins.values())
+    if threading_enabled and len(plugins) > 1:
+        with ThreadPoolExecutor(get_thread_count(len(plugins), WorkClass.SUBPROCESS),
+                                thread_name_prefix="Plugin Loader") as pool:
+            for plugin in plugins:  # loop through all plugins
+                pool.submit(load_plugin, plugin, running_platform, running_elevated)
+    else:
+        for plugin in plugins:  # loop through all plugins
+            load_plugin(plugin, running_platform, running_elevated)
 
     return len(usable_plugins()) > 0
 
 
+def load_plugin(plugin: PluginInformation, running_platform: SystemPlatform, running_elevated: bool):
+    """
+    Function loads a single plugin, recording the time taken to load it
+    """
+    start = time.perf_counter()
+    try:
+        plugin.load(running_platform, running_elevated)  # attempt to load
+        logger.debug(f'Successfully loaded {plugin}')
+    except Exception as loading_exception:  # if exception add to the plugin so it can be displayed later in GUI
+        logger.debug(f'Failed to load {plugin} due to {loading_exception}, disabling.')
+        plugin.loading_exception = loading_exception
+    finally:
+        plugin.load_duration = time.perf_counter() - start
+
+
 def is_elevated() -> bool:
     """
     Attempts to determine whether Network Guardian is running with elevated permissions (i.e. Sudo or Administrator)
@@ -88,21 +234,47 @@ def is_elevated() -> bool:
         return ctypes.windll.shell32.IsUserAnAdmin() != 0
 
 
-def get_thread_count(max_required: int = None) -> int:
+def get_worker_limit(work_class: WorkClass) -> int:
+    """
+    Function is used to calculate the amount of workers which can run executors of a work class at the same time
+
+    Executors which are I/O bound or waiting on a subprocess spend most of their time blocked rather than using the
+    CPU, so they are allowed far more workers than there are CPU cores. A limit set in the config is always used
+    instead of the automatic size.
+
+    :param work_class: WorkClass to get the limit of
+    :return: Worker Limit
+    """
+    cpu_count = multiprocessing.cpu_count()
+
+    configured = config.getint("workers", work_class_settings[work_class], fallback=0)
+    if configured > 0:
+        return configured
+
+    if work_class is WorkClass.IO:
+        return min(32, cpu_count * 4)  # bounded so a large amount of requests can't exhaust sockets
+    if work_class is WorkClass.SUBPROCESS:
+        return max(4, cpu_count * 2)  # each subprocess uses a CPU core itself when it isn't waiting
+
+    return cpu_count
+
+
+def get_thread_count(max_required: int = None, work_class: WorkClass = WorkClass.CPU) -> int:
     """
     Function is used to calculate the amount of threads that should be used based on three different factors, the
     function can be used in multiple use cases
 
-    The idea around the function is that it will return by default the max allowed threads if set, if not it will
-    either return the maxmium amount of threads possible in the system unless the job count (ie how many threads are
-    even needed) is lower, in that case it will use that
+    The idea around the function is that it will return by default the limit of the work class, unless the job count
+    (ie how many threads are even needed) is lower, in that case it will use that. The max threads setting is then
+    applied on top, if set.
 
     :param max_required: Maximum amount of workers the thread pool needs to process
+    :param work_class: WorkClass of the jobs the thread pool will process
     :return: Thread Count to use
     """
 
-    # by default use the amount of CPU cores installed in the system
-    thread_count = multiprocessing.cpu_count()
+    # by default use the limit for the work class
+    thread_count = get_worker_limit(work_class)
 
     # if there's a max required specified, IE there's only like 2 plugins loaded so why bother creating a larger
     # pool
@@ -111,4 +283,9 @@ def get_thread_count(max_required: int = None) -> int:
         if max_required < thread_count:  # if the required is smaller than thread count
             thread_count = max_required  # just set it the required amount
 
+    max_threads = config.getint("workers", "max_threads", fallback=0)
+    if max_threads > 0:
+        if thread_count > max_threads:  # if the thread count is higher than the max allowed threads set by the user
+            thread_count = max_threads  # set the thread count
+
     return thread_count
@@ -1,30 +1,80 @@
+import asyncio
+import atexit
+import glob
 import os
 import pickle
 import platform
+import tempfile
+import time
+from collections import OrderedDict
 from concurrent import futures
-from concurrent.futures.thread import ThreadPoolExecutor
 from datetime import datetime
-from random import randint
-from threading import Thread
+from enum import Enum
+from threading import Thread, Lock, Condition
 
 from flask import render_template
-from jinja2 import Template
 
 from networkguardian import application_version, reports_directory, logger, threading_enabled
-from networkguardian.exceptions import PluginProcessingError
-from networkguardian.framework.plugin import SystemPlatform, PluginInformation, AbstractPlugin
-from networkguardian.framework.registry import get_thread_count, usable_plugins
+from networkguardian.config import config
+from networkguardian.framework.cache import get_result_cache
+from networkguardian.exceptions import PluginProcessingError, PluginTimeoutError, PluginCancelledError
+from networkguardian.framework.cancellation import CancellationToken
+from networkguardian.framework.plugin import SystemPlatform, PluginInformation, AbstractPlugin, PluginCategory
+from networkguardian.framework.jobs import submit_job, jobs, JobState
+from networkguardian.framework.pool import submit_to_process_pool, get_thread_pool
+from networkguardian.framework.registry import usable_plugins, resolve_plugin
+from networkguardian.framework.scheduler import PluginGraph, record_duration
+from networkguardian.framework.snapshot import SystemSnapshot
+from networkguardian.framework.index import ReportIndex, ReportSummary
+from networkguardian.framework.persistence import BackgroundWriter
+from networkguardian.framework.storage import write_report, read_manifest, read_section, decode_exception, \
+    recover_report, report_information, report_manifest, sync_directory, ReportWriter, \
+    ReportFormatError, remove_shared_sections, manifest_shared_sections, is_pickled_report
+from networkguardian.framework.telemetry import PluginTelemetry
+from networkguardian.framework.templating import render
 
-reports = []  # Used to store all Report obj's
-processing_reports = {}  # Thread ID, Report obj
+report_index = ReportIndex(reports_directory)  # summary of every report, used to list reports without opening them
+
+open_reports = OrderedDict()  # Report ID, Report obj, of the most recently used reports
+open_reports_lock = Lock()
+open_report_limit = 16
+
+event_loop = None  # Event loop shared by all report processors to run coroutine executors
+event_loop_lock = Lock()
 
 report_filename_template = "{{ name }} ({{ system_name }} - {{ platform }}) {{ date }}"
 report_extension = 'rng'
+partial_extension = 'part'  # extension of report files which are still being processed
+
+report_path_lock = Lock()  # held while choosing the path of a report file so reports can't be given the same path
+writing_reports = set()  # paths of the partial report files being written by report processors, until indexed
+shared_section_grace = 3600  # seconds a shared section which no report uses is kept, reports being stored may use it
+
+# mkstemp only lets the owner read the files it creates, partial report files are given the mode open() would use. The
+# umask can only be read by changing it, so it is read once on import rather than while other threads create files
+umask = os.umask(0)
+os.umask(umask)
+report_file_mode = 0o666 & ~umask
+
+
+class PluginState(Enum):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+    TIMED_OUT = "Timed Out"
+    CANCELLED = "Cancelled"
 
 
 class PluginResult(PluginInformation):
+    """
+    Result produced by a plugin, results use slots as large reports hold many of them, and the description and other
+    plugin information is shared with the plugin rather than copied
+    """
+    __slots__ = ("data", "exception", "template", "partial", "cache_age", "telemetry", "checkpoints")
 
-    def __init__(self, plugin: AbstractPlugin, data: {} = None, exception: Exception = None, template: str = None):
+    def __init__(self, plugin: AbstractPlugin, data: {} = None, exception: Exception = None, template: str = None,
+                 partial: bool = False, cache_age: float = None):
         super().__init__(plugin.name, plugin.category, plugin.author, plugin.version)
         # description is usually loaded from __doc__ so needs to be copied manually
         self.description = plugin.description
@@ -32,6 +82,10 @@ class PluginResult(PluginInformation):
         self.data = data  # store the data produced by executor
         self.exception = exception  # store the exception produced by executor
         self.template = template  # store the plugin template
+        self.partial = partial  # whether the data is only what the executor produced before it was stopped
+        self.cache_age = cache_age  # seconds old the data was when it was reused from the cache, None if it wasn't
+        self.telemetry = None  # PluginTelemetry of the execution which produced the result
+        self.checkpoints = None  # shard key, data of the shards completed by a plugin which didn't finish
 
         if exception is None:
             if template is None:
@@ -44,7 +98,129 @@ class PluginResult(PluginInformation):
         Function is used to produce the HTML output of the result for display
         :return: HTML String
         """
-        return Template(self.template).render(self.data)  # render plugin template with data produced
+        return render(self.template, self.data)  # render plugin template with data produced
+
+    def __setstate__(self, state):
+        """
+        Function restores results pickled by older versions, which were pickled with a dictionary of their attributes
+        """
+        if isinstance(state, tuple):  # pickled with slots, (dictionary, slots)
+            state = dict(state[0] or {}, **(state[1] or {}))
+        else:  # attributes added since the result was pickled aren't in the dictionary
+            state = dict({"partial": False, "cache_age": None, "telemetry": None, "checkpoints": None}, **state)
+
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class StoredPluginResult(PluginResult):
+    """
+    PluginResult read from a report file, the data and template are only read from the file the first time they are
+    used so listing reports doesn't need to read any plugin data
+    """
+    __slots__ = ("path", "sections", "checkpoint_sections", "loaded")
+
+    def __init__(self, path: str, entry: {}):
+        """
+        :param path: Path of the report file
+        :param entry: Manifest entry of the result
+        """
+        PluginInformation.__init__(self, entry["name"], PluginCategory(entry["category"]), entry["author"],
+                                   entry["version"])
+        self.description = entry["description"]
+
+        self.exception = decode_exception(entry["exception"])
+        self.partial = entry["partial"]
+        self.cache_age = entry["cache_age"]
+        self.telemetry = None
+        if entry["telemetry"] is not None:
+            self.telemetry = PluginTelemetry()
+            self.telemetry.update(entry["telemetry"])
+
+        self.path = path
+        self.sections = {"data": entry["data"], "template": entry["template"]}  # section name, manifest entry
+        self.checkpoint_sections = entry.get("checkpoints") or {}  # shard key, manifest entry
+        self.loaded = {}  # section name, value read from the file
+
+    def read(self, name: str):
+        """
+        :param name: Name of the section to read
+        :return: Returns the value of the section, reading it from the report file if it hasn't been read yet
+        """
+        if name not in self.loaded:
+            section = self.sections[name]
+            if section is None:
+                self.loaded[name] = None
+                return None
+
+            path = self.path
+            try:
+                self.loaded[name] = read_section(path, section)
+            except FileNotFoundError:
+                with report_path_lock:  # the report file may be being moved as its report has finished
+                    moved = self.path != path
+                if not moved:
+                    raise
+
+                self.loaded[name] = read_section(self.path, section)
+
+        return self.loaded[name]
+
+    @property
+    def data(self) -> {}:
+        return self.read("data")
+
+    @data.setter
+    def data(self, value: {}):
+        self.loaded["data"] = value
+        self.loaded.pop("rendered", None)
+
+    @property
+    def template(self) -> str:
+        return self.read("template")
+
+    @template.setter
+    def template(self, value: str):
+        self.loaded["template"] = value
+        self.loaded.pop("rendered", None)
+
+    def render(self) -> str:
+        """
+        Function is used to produce the HTML output of the result for display, the result can't change once it has been
+        stored so the output is kept for as long as the report is open
+        :return: HTML String
+        """
+        if "rendered" not in self.loaded:
+            self.loaded["rendered"] = super().render()
+
+        return self.loaded["rendered"]
+
+    def read_checkpoints(self) -> {}:
+        """
+        :return: Returns the data of each checkpointed shard, reading them from the report file if they haven't been
+        read yet
+        """
+        if "checkpoints" not in self.loaded:
+            self.loaded["checkpoints"] = {key: read_section(self.path, section)
+                                          for key, section in self.checkpoint_sections.items()}
+
+        return self.loaded["checkpoints"]
+
+    def load(self):
+        """
+        Function reads every section of the result, after which the report file is no longer needed
+        """
+        for name in self.sections:
+            self.read(name)
+        self.read_checkpoints()
+
+    @property
+    def checkpoints(self) -> {}:
+        return self.read_checkpoints()
+
+    @checkpoints.setter
+    def checkpoints(self, value: {}):
+        self.loaded["checkpoints"] = value
 
 
 class Report:
@@ -68,14 +244,15 @@ class Report:
     def __repr__(self):
         return f"Report(name='{self.name}', system_name='{self.system_name}', system_platform='{self.system_platform}', date='{self.date}')"
 
-    def add_result(self, plugin: AbstractPlugin, data: {}, template: str):
+    def add_result(self, plugin: AbstractPlugin, data: {}, template: str, cache_age: float = None):
         """
         Function is used to add successful results to the Report
         :param plugin: Plugin which produced the result
         :param data:  data produced by the plugin executor
         :param template:  template html required to render the data
+        :param cache_age: seconds old the data was if it was reused from the cache
         """
-        self.results.append(PluginResult(plugin, data=data, template=template))
+        self.results.append(PluginResult(plugin, data=data, template=template, cache_age=cache_age))
 
     def add_exception(self, plugin: AbstractPlugin, exception: Exception):
         """
@@ -85,44 +262,336 @@ class Report:
         """
         self.results.append(PluginResult(plugin, exception=exception))
 
+    def add_unfinished(self, plugin: AbstractPlugin, exception: Exception, partial_data: {} = None,
+                       template: str = None, checkpoints: {} = None):
+        """
+        Function is used to add the results of plugins which did not finish i.e. they were cancelled or timed out
+        :param plugin: Plugin which produced the result
+        :param exception: Exception explaining why the plugin did not finish
+        :param partial_data: data the plugin executor produced before it was stopped, if any
+        :param template: template html required to render the partial data
+        :param checkpoints: shards the plugin executor completed before it was stopped, used to resume the report
+        """
+        result = PluginResult(plugin, data=partial_data, exception=exception, template=template,
+                              partial=partial_data is not None)
+        result.checkpoints = checkpoints or None
+        self.results.append(result)
+
 
 def load_reports() -> bool:
-    for root, dirs, files in os.walk(reports_directory):
-        for file in files:
-            if file.endswith(report_extension):
-                import_report(os.path.join(reports_directory, file))
+    """
+    Function loads the report index, bringing it up to date with the reports directory, no reports are opened
+    :return: True if there are any reports
+    """
+    report_index.load()
+    recover_reports()
+    report_index.refresh(report_extension)
+
+    logger.debug(f'Indexed {len(report_index)} reports')
+    return len(report_index) > 0
+
+
+def recover_reports():
+    """
+    Function recovers the reports which were being processed when the application last stopped, the results which were
+    written before it stopped are kept and the report is stored as interrupted
+    """
+    for path in glob.glob(os.path.join(glob.escape(reports_directory), f"*.{partial_extension}")):
+        path = os.path.abspath(path)
+        if path in writing_reports:
+            continue
+
+        try:
+            recovered = recover_report(path)
+        except (OSError, ReportFormatError) as e:
+            logger.error(f'Failed to recover the report {path}, removing it.')
+            logger.debug(e)
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.debug(e)
+            continue
 
-    return len(reports) > 0
+        report = open_report(path)
+        with report_path_lock:
+            report_path = allocate_report_path(report)
+            os.replace(path, report_path)
+
+        logger.info(f'Recovered {len(recovered["results"])} results of the interrupted report {report.name}')
+
+
+def open_report(report_path: str) -> Report:
+    """
+    Function reads a report from a report file, only the manifest is read, the data of each result is read when it is
+    first used
+
+    :param report_path: Path of the report file
+    :return: Report
+    """
+    manifest = read_manifest(report_path)
+    information = manifest["report"]
+
+    report = Report.__new__(Report)
+    report.name = information["name"]
+    report.date = information["date"]
+    report.system_name = information["system_name"]
+    report.system_platform = SystemPlatform(information["system_platform"])
+    report.software_version = information["software_version"]
+    report.results = [StoredPluginResult(report_path, entry) for entry in manifest["results"]]
+    report.path = report_path
+
+    return report
+
+
+def get_report(report_id: int) -> Report:
+    """
+    Function returns a report by its ID, reports are opened the first time they are requested and the most recently
+    used reports are kept open
+
+    :param report_id: ID of the report within the report index
+    :return: Report, or None if there is no report with the ID
+    """
+    with open_reports_lock:
+        if report_id in open_reports:
+            open_reports.move_to_end(report_id)
+            return open_reports[report_id]
+
+    summary = report_index.get(report_id)
+    if summary is None:
+        return None
+
+    try:
+        report = open_report(summary.path)
+    except (OSError, ReportFormatError) as e:
+        logger.error(f'Failed to open report {summary.path}')
+        logger.debug(e)
+        return None
+
+    remember_report(report_id, report)
+    return report
+
+
+def remember_report(report_id: int, report: Report):
+    """
+    Function adds a report to the recently used reports, closing the least recently used report if there are too many
+    """
+    with open_reports_lock:
+        open_reports[report_id] = report
+        open_reports.move_to_end(report_id)
+
+        while len(open_reports) > open_report_limit:
+            open_reports.popitem(last=False)
 
 
 def import_report(report_path: str) -> bool:
+    """
+    Function adds a report file to the report index
+    :return: True if the report was indexed
+    """
     try:
-        report_pickle = pickle.load(open(report_path, "rb"))
-        if isinstance(report_pickle, Report):
-            report_pickle.path = report_path
-            reports.append(report_pickle)
-            logger.debug(f'Successfully imported {report_pickle}')
+        summary = report_index.index_file(report_path)
+        logger.debug(f'Successfully imported {summary}')
 
-            return True
+        return True
     except AttributeError:
         logger.error(f'Failed to import {report_path} due to missing dependency, skipping.')
         return False
+    except ReportFormatError as e:
+        logger.error(f'Failed to import {report_path}, {e}, skipping.')
+        return False
     except Exception as e:
         logger.error(f'Failed to import {report_path} due to an exception, skipping.')
         logger.debug(e)
+        return False
+
+
+def store_report(report: Report, replaces: int = None) -> int:
+    """
+    Function writes a report to a file and adds it to the report index
+    :return: ID of the report in the index
+    """
+    return index_reports([(report, write_report_file(report, replaces), replaces)])[0]
+
+
+def write_report_file(report: Report, replaces: int = None) -> str:
+    """
+    Function writes a report to a new report file
+
+    :param report: Report to write
+    :param replaces: ID of the report which was resumed, its file is removed
+    :return: Path of the report file
+    """
+    report.path = export_report(report)
+    if replaces is not None:
+        with report_path_lock:
+            report.path = replace_report_file(report, report.path, replaces)
+
+    return report.path
+
+
+def move_report_file(report: Report, partial_path: str, replaces: int = None) -> str:
+    """
+    Function moves the partial report file of a report which was written while it was processed to the path of the
+    report
+
+    :param report: Report which was written
+    :param partial_path: Path of the partial report file, which must have its manifest written
+    :param replaces: ID of the report which was resumed, its file is removed
+    :return: Path of the report file
+    """
+    with report_path_lock:
+        report_path = allocate_report_path(report)
+        os.replace(partial_path, report_path)
+        if replaces is not None:
+            report_path = replace_report_file(report, report_path, replaces)
+        sync_directory(reports_directory)
+
+        for result in report.results:
+            if isinstance(result, StoredPluginResult) and result.path == partial_path:
+                result.path = report_path
+
+    report.path = report_path
+    return report_path
+
+
+def index_reports(stored: [tuple]) -> [int]:
+    """
+    Function adds reports which have been written to the report index, the reports are indexed in a single transaction
+
+    :param stored: List of (Report, path of the report file, ID of the report it replaces or None)
+    :return: ID of each report in the index, in the same order
+    """
+    summaries = report_index.index_files([(path, replaces) for _, path, replaces in stored])
+    for (report, _, _), summary in zip(stored, summaries):
+        remember_report(summary.report_id, report)
+
+    return [summary.report_id for summary in summaries]
+
+
+report_writer = BackgroundWriter(index_reports)  # stores the reports of every report processor
+atexit.register(report_writer.join, 30)  # store the reports which finished just before exiting
+
+
+def replace_report_file(report: Report, report_path: str, report_id: int) -> str:
+    """
+    Function moves the file of a resumed report over the file of the report it resumed, once the new file has been
+    written, so the report keeps its path and the original is only lost once it has been replaced. Any results carried
+    over to the resumed report which are still read from the original file are read into memory first.
+    report_path_lock must be held.
+
+    :param report: Resumed report
+    :param report_path: Path the resumed report was written to
+    :param report_id: ID of the report which was resumed
+    :return: Path of the resumed report's file
+    """
+    summary = report_index.get(report_id)
+    if summary is None:
+        return report_path
+
+    load_results(report, summary.path)
+    with open_reports_lock:
+        open_reports.pop(report_id, None)
+
+    try:
+        if os.path.exists(summary.path):
+            os.replace(report_path, summary.path)
+            return summary.path
+    except OSError as e:
+        logger.error(f'Failed to replace {summary.path} after it was resumed, removing it instead')
+        logger.debug(e)
+        try:
+            os.remove(summary.path)
+        except OSError as e:
+            logger.debug(e)
 
+    return report_path
 
-def store_report(report: Report) -> int:
-    export_path = export_report(report)  # export report to file and get path
-    reports.append(report)  # add report to list
-    report.path = export_path  # update path
 
-    return len(reports) - 1  # return index of report in list
+def load_results(report: Report, path: str):
+    """
+    Function reads the data and template of every result of a report which is read from a file, so the file can be
+    removed
+    """
+    for result in report.results:
+        if isinstance(result, StoredPluginResult) and result.path == path:
+            result.load()
+
+
+def delete_stored_report(report_id: int) -> ReportSummary:
+    """
+    Function deletes a report file and removes it from the report index
+
+    :param report_id: ID of the report
+    :return: Summary of the deleted report, or None if there is no report with the ID
+    :raises IOError: if the report file couldn't be deleted
+    """
+    summary = report_index.get(report_id)
+    if summary is None:
+        return None
+
+    digests = report_index.report_sections(report_id)
+    if os.path.exists(summary.path):
+        os.remove(summary.path)  # remove file
+
+    report_index.remove(report_id)
+    with open_reports_lock:
+        open_reports.pop(report_id, None)
+
+    release_shared_sections(digests)
+    return summary
+
+
+def release_shared_sections(digests: [str]) -> int:
+    """
+    Function removes the shared sections which are no longer used by any report in the index. While reports are being
+    processed the sections are left for the compactor, as the reports may be about to use them.
+
+    :param digests: Digests of the sections which may no longer be used
+    :return: Returns the number of bytes freed
+    """
+    if not digests or writing_reports:
+        return 0
+
+    unused = set(digests) - report_index.shared_sections()
+    if unused:
+        try:
+            unused -= unindexed_shared_sections()
+        except (OSError, ReportFormatError, ValueError, KeyError) as e:
+            logger.debug(f'Leaving shared sections for the compactor as a report file couldn\'t be read: {e}')
+            return 0
+
+    return remove_shared_sections(reports_directory, unused, shared_section_grace)
+
+
+def unindexed_shared_sections() -> {str}:
+    """
+    Function finds the shared sections used by report files in the reports directory which aren't in the index, such as
+    a report which failed to be indexed, so they aren't removed while the file still needs them
+
+    :return: Returns the digests of the sections
+    :raises ReportFormatError: if one of the report files can't be read, so which sections it uses isn't known
+    """
+    indexed = {row["path"] for row in report_index.listing()}
+
+    digests = set()
+    if not os.path.isdir(reports_directory):
+        return digests
+
+    for entry in os.scandir(reports_directory):
+        path = os.path.abspath(entry.path)
+        if not entry.is_file() or path in indexed or path in writing_reports:
+            continue
+        if not entry.name.endswith((f".{report_extension}", f".{partial_extension}")) or is_pickled_report(path):
+            continue
+
+        digests.update(manifest_shared_sections(read_manifest(path)))
+
+    return digests
 
 
 def generate_report_filename(report: Report, append_extension: str = report_extension):
     # get user set config filename template and replace needed variables
-    report_filename = Template(report_filename_template).render({
+    report_filename = render(report_filename_template, {
         "name": report.name,
         "system_name": report.system_name,
         "platform": report.system_platform,
@@ -135,7 +604,10 @@ def generate_report_filename(report: Report, append_extension: str = report_exte
     return report_filename
 
 
-def export_report(report: Report):
+def allocate_report_path(report: Report) -> str:
+    """
+    Function chooses the path a report is stored at, report_path_lock must be held until the file has been created
+    """
     report_filename = generate_report_filename(report)
     if not os.path.exists(reports_directory):
         os.mkdir(reports_directory)
@@ -143,11 +615,22 @@ def export_report(report: Report):
     # combine filename with path and extension
     report_path = os.path.abspath(os.path.join(reports_directory, report_filename))
 
-    # save it
-    print(report_path)
-    with open(report_path, "wb") as fw:
-        data = pickle.dumps(report)
-        fw.write(data)  # dump to pickle then write the bytes
+    # reports with the same name from the same day are numbered so they don't replace each other
+    name, extension = os.path.splitext(report_path)
+    duplicate = 1
+    while os.path.exists(report_path):
+        duplicate += 1
+        report_path = f"{name} ({duplicate}){extension}"
+
+    return report_path
+
+
+def export_report(report: Report):
+    with report_path_lock:
+        report_path = allocate_report_path(report)
+
+        # save it
+        write_report(report, report_path)
 
     return report_path  # return the final saved abs path
 
@@ -160,27 +643,73 @@ def export_report_as_html(report: Report, path: str):
         f.write(export_template)
 
 
-def start_report(report_name: str, plugins: [AbstractPlugin]) -> int:
+def create_processor(report_name: str, plugins: [AbstractPlugin]):
     if threading_enabled:
-        logger.debug("Starting threaded report processor")
-        processor = ThreadedReportProcessor(report_name, plugins)
-        processor.daemon = True
-    else:
-        logger.debug("Starting non-threaded report processor")
-        processor = ReportProcessor(report_name, plugins)
+        logger.debug("Creating threaded report processor")
+        return ThreadedReportProcessor(report_name, plugins)
+
+    logger.debug("Creating non-threaded report processor")
+    return ReportProcessor(report_name, plugins)
+
+
+def start_report(report_name: str, plugins: [AbstractPlugin]) -> int:
+    """
+    Function adds a report to the job table, it is processed once there is room for another report to run
+    :return: Job ID of the report
+    """
+    return submit_job(create_processor(report_name, plugins))
+
+
+def resume_report(report_id: int) -> int:
+    """
+    Function adds a report which was interrupted or cancelled to the job table to be resumed, only the plugins which
+    didn't finish are processed again, and the resumed report replaces the original once it has finished
+
+    :param report_id: ID of the report to resume
+    :return: Job ID of the report, or None if the report can't be resumed
+    """
+    for job in list(jobs.values()):  # the report is already being resumed
+        if job.state is not JobState.FINISHED and job.processor.resumes == report_id:
+            return job.job_id
 
-    processor.start()
+    summary = report_index.get(report_id)
+    if summary is None or not summary.resumable:
+        return None
 
-    thread_id = randint(0, 10000)
-    processing_reports[thread_id] = processor
+    report = get_report(report_id)
+    if report is None:
+        return None
 
-    return thread_id
+    available = {plugin.name: plugin for plugin in usable_plugins()}
+    plugins = list(dict.fromkeys(available[result.name] for result in report.results if result.name in available))
+
+    processor = create_processor(report.name, plugins)
+    processor.resume(report_id, report)
+
+    return submit_job(processor)
 
 
 def start_quick_report():
     return start_report("Quick Report", usable_plugins())
 
 
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Function returns the event loop used to run coroutine plugin executors, the loop is started in its own daemon thread
+    the first time it is required and then shared by every report
+    """
+    global event_loop
+
+    with event_loop_lock:
+        if event_loop is None:
+            event_loop = asyncio.new_event_loop()
+            loop_thread = Thread(target=event_loop.run_forever, name="Plugin Event Loop")
+            loop_thread.daemon = True
+            loop_thread.start()
+
+    return event_loop
+
+
 class ReportProcessor:
 
     def __init__(self, report_name, plugins):
@@ -188,49 +717,605 @@ class ReportProcessor:
         self.plugins = {plugin: False for plugin in plugins}  # create dict with all plugins as key and value as false
 
         self.report_id = None
+        self.snapshot = None  # SystemSnapshot captured when processing starts, shared between all plugins
 
-    def start(self):
-        for plugin, complete in self.plugins.items():
+        self.tokens = {}  # Plugin, CancellationToken used to cancel the plugin when it is processing
+        self.cancelled = False  # set when the user cancels the report
+        self.cancel_future = futures.Future()  # completed when the report is cancelled to wake up the processor
+
+        self.states = {plugin: PluginState.QUEUED for plugin in plugins}  # Plugin, PluginState
+        self.start_times = {}  # Plugin, time.monotonic() value the plugin started processing
+        self.durations = {}  # Plugin, seconds the plugin took to process
+        self.cache_ages = {}  # Plugin, seconds old its data was when reused from the result cache
+        self.telemetry = {}  # Plugin, PluginTelemetry measuring the cost of processing the plugin
+        self.finished = False  # set once the report has been stored
+        self.stored = None  # Future which completes with the report ID once the report writer has stored the report
+
+        self.partial_path = None  # path of the partial report file the results are written to as plugins complete
+        self.writer = None  # ReportWriter of the partial report file
+        self.entries = []  # manifest entry of each result written to the partial report file
+        self.writer_lock = Lock()  # checkpoints are written by the executors' threads
+
+        self.resumes = None  # ID of the report being resumed
+        self.carried_over = []  # (Plugin, result) kept from the resumed report, Plugin is None if it isn't available
+        self.checkpoints = {}  # plugin name, shards restored from the resumed report
+
+        self.events = []  # every state change in order, streamed to the processing page
+        self.events_condition = Condition()  # notified whenever an event is added
+
+    def capture_snapshot(self) -> SystemSnapshot:
+        """
+        Function captures the system snapshot shared by every plugin in the report, so the information is only read
+        from the system once per report
+        """
+        logger.debug("Capturing system snapshot")
+        self.snapshot = SystemSnapshot.capture()
+        return self.snapshot
+
+    def open_report_file(self):
+        """
+        Function creates the partial report file which each result is written to as its plugin completes, so the results
+        aren't lost if the application stops and don't need to be kept in memory. If the file can't be created the
+        results are kept in memory and the report is written once it has finished.
+        """
+        try:
+            os.makedirs(reports_directory, exist_ok=True)
+            fd, path = tempfile.mkstemp(prefix=f"{generate_report_filename(self.report, None)} ",
+                                        suffix=f".{partial_extension}", dir=reports_directory)
+            self.partial_path = os.path.abspath(path)
+            os.chmod(path, report_file_mode)  # kept when the file is renamed to the report file
+            writing_reports.add(self.partial_path)
+
+            self.writer = ReportWriter(os.fdopen(fd, "wb"), shared_directory=reports_directory)
+            self.writer.write_information(report_information(self.report), self.plugins)
+            self.writer.sync()
+        except OSError as e:
+            logger.error(f'Failed to create a report file for {self.report.name}, it will be written once it finishes')
+            logger.debug(e)
+            self.close_report_file()
+            self.discard_report_file()
+
+    def write_result(self, result_index: int):
+        """
+        Function appends a result to the partial report file, the result is then replaced by one which reads its data
+        back from the file when it is used
+        """
+        result = self.report.results[result_index]
+        with self.writer_lock:
+            if self.writer is None:
+                return
+
+            try:
+                entry = self.writer.write_result(result)
+                self.writer.sync()
+            except (OSError, ValueError) as e:
+                logger.error(f'Failed to write the result of {result.name} to {self.partial_path}, the report will be '
+                             f'written once it finishes')
+                logger.debug(e)
+                self.close_report_file()
+                return
+
+        self.entries.append(entry)
+        self.report.results[result_index] = StoredPluginResult(self.partial_path, entry)
+
+    def write_checkpoint(self, plugin: AbstractPlugin, key: str, data):
+        """
+        Function appends a shard checkpointed by a plugin to the partial report file, so it is kept if the application
+        stops before the plugin finishes
+        """
+        with self.writer_lock:
+            if self.writer is None:
+                return
+
+            try:
+                self.writer.write_checkpoint(plugin.name, key, data)
+                self.writer.sync()
+            except (OSError, ValueError) as e:
+                logger.debug(f'Failed to write checkpoint {key} of {plugin.name}: {e}')
+
+    def close_report_file(self):
+        if self.writer is not None:
+            try:
+                self.writer.f.close()
+            except OSError as e:
+                logger.debug(e)
+            self.writer = None
+
+    def discard_report_file(self):
+        """
+        Function removes the partial report file, results which were written to it are read back into memory first
+        """
+        if self.partial_path is None:
+            return
+
+        load_results(self.report, self.partial_path)
+        try:
+            os.remove(self.partial_path)
+        except OSError as e:
+            logger.debug(e)
+
+        writing_reports.discard(self.partial_path)
+        self.partial_path = None
+
+    def persist(self) -> tuple:
+        """
+        Function writes the report file, this is run by the report writer. The manifest is written to the partial report
+        file which is then moved to the path of the report, or if the results couldn't all be written to it the whole
+        report is written instead.
+
+        :return: Tuple of the Report, path of the report file and ID of the report it replaces, to be indexed
+        """
+        if self.writer is not None:
             try:
-                template = plugin.template()
-                data = plugin.process()
+                with self.writer_lock:
+                    self.writer.write_manifest(report_manifest(report_information(self.report), self.entries))
+                    self.writer.sync()
+                    self.close_report_file()
+
+                path = move_report_file(self.report, self.partial_path, self.resumes)
+                return self.report, path, self.resumes
+            except OSError as e:
+                logger.error(f'Failed to finish the report file {self.partial_path}, writing the report again')
+                logger.debug(e)
+                self.close_report_file()
+
+        path = write_report_file(self.report, self.resumes)
+        self.discard_report_file()
+        return self.report, path, self.resumes
+
+    def stored_report(self, stored: futures.Future):
+        """
+        Function is called once the report writer has stored the report, anything waiting on the processor is told the
+        report has finished
+        """
+        try:
+            self.report_id = stored.result()
+        except Exception as e:
+            logger.error(f'Failed to store report {self.report.name}')
+            logger.debug(e)
+
+        writing_reports.discard(self.partial_path)  # the shared sections it uses are now listed in the index
+
+        self.finished = True
+        self.add_event({"type": "finished", "report_id": self.report_id})
+
+    def resume(self, report_id: int, report: Report):
+        """
+        Function sets up the processor to resume a stored report. The results of plugins which finished are carried
+        over, and the plugins which were cancelled or timed out are processed again with the shards they checkpointed.
+
+        :param report_id: ID of the report to resume
+        :param report: Report to resume
+        """
+        self.resumes = report_id
+        self.report.date = report.date
+
+        plugins = {plugin.name: plugin for plugin in self.plugins}
+        for result in report.results:
+            plugin = plugins.get(result.name)
+            if plugin is not None and isinstance(result.exception, (PluginCancelledError, PluginTimeoutError)):
+                self.checkpoints[plugin.name] = result.checkpoints
+            else:
+                self.carried_over.append((plugin, result))
+
+    def resolve_plugins(self) -> {}:
+        """
+        Function imports the plugins which were discovered without importing their module, this is done once the report
+        starts processing as importing and loading a plugin may be slow. Each plugin which resolves replaces its
+        LazyPlugin in the processor.
+
+        :return: Returns a dictionary of Plugin, exception raised for each plugin which failed to import or load
+        """
+        resolved = {}
+        failed = {}
+        for plugin in self.plugins:
+            try:
+                resolved[plugin] = resolve_plugin(plugin)
+            except Exception as loading_exception:
+                logger.error(f'Failed to load {plugin}, it won\'t be processed')
+                logger.debug(loading_exception)
+                failed[plugin] = loading_exception
+
+        if any(resolved_plugin is not plugin for plugin, resolved_plugin in resolved.items()):
+            self.plugins = {resolved.get(plugin, plugin): complete for plugin, complete in self.plugins.items()}
+            self.states = {resolved.get(plugin, plugin): state for plugin, state in self.states.items()}
+            self.carried_over = [(resolved.get(plugin, plugin), result) for plugin, result in self.carried_over]
 
-                self.plugins[plugin] = True
+        return failed
+
+    def add_unresolved(self, failed: {}):
+        """
+        Function adds a failed result for each plugin which failed to import or load, the plugins aren't part of the
+        plugin graph so the plugins which consume their data gather it themselves
+
+        :param failed: Dictionary of Plugin, exception returned by resolve_plugins()
+        """
+        for plugin, loading_exception in failed.items():
+            if self.plugins[plugin]:  # its result was carried over from the resumed report
+                continue
+
+            self.report.add_exception(plugin, loading_exception)
+            self.complete_plugin(plugin)
+
+    def carry_over(self, graph: PluginGraph):
+        """
+        Function adds the results carried over from the resumed report, completing their plugins so only the plugins
+        which didn't finish are processed
+        """
+        for plugin, result in self.carried_over:
+            self.report.results.append(result)
+            if plugin is None:  # the plugin is no longer available, its result is kept as it was
+                self.write_result(len(self.report.results) - 1)
+                continue
+
+            self.complete_plugin(plugin)
+            if plugin in graph.plugins:  # plugins which failed to resolve aren't scheduled
+                graph.complete(plugin, result.data if result.exception is None else None)
+
+    def report_deadline(self) -> float:
+        """
+        :return: Returns the time.monotonic() value the whole report must finish by, or None if there is no limit
+        """
+        report_timeout = config.getfloat("reports", "report_timeout", fallback=0)
+        return time.monotonic() + report_timeout if report_timeout > 0 else None
+
+    def create_token(self, plugin: AbstractPlugin, report_deadline: float = None) -> CancellationToken:
+        """
+        Function creates the cancellation token for a plugin which is about to start processing, the deadline of the
+        token is the plugin's own timeout if set, or the plugin timeout setting, limited by the report deadline
+
+        :param plugin: Plugin which is about to start
+        :param report_deadline: Deadline of the whole report
+        :return: CancellationToken for the plugin
+        """
+        timeout = plugin.timeout or config.getfloat("reports", "plugin_timeout", fallback=0)
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+
+        if report_deadline is not None:
+            deadline = report_deadline if deadline is None else min(deadline, report_deadline)
+
+        token = CancellationToken(deadline, self.checkpoints.get(plugin.name),
+                                  lambda key, data: self.write_checkpoint(plugin, key, data))
+        self.tokens[plugin] = token
+        return token
+
+    def cancel(self):
+        """
+        Function cancels the report, plugins which are processing are cancelled and plugins which haven't started are
+        skipped, the results which have already been produced are still stored
+        """
+        logger.debug(f"Cancelling report {self.report.name}")
+        self.cancelled = True
+        for token in list(self.tokens.values()):
+            token.cancel()
 
-                self.report.add_result(plugin, data, template)
-            except Exception as ppe:
-                self.report.add_exception(plugin, ppe)
+        if not self.cancel_future.done():
+            self.cancel_future.set_result(None)
+
+    def add_event(self, event: {}):
+        """
+        Function adds an event to the event log and wakes up anything waiting for events
+        :param event: Dictionary describing the event, must be able to be serialised as JSON
+        """
+        with self.events_condition:
+            self.events.append(event)
+            self.events_condition.notify_all()
+
+    def wait_for_events(self, position: int, timeout: float = None) -> [{}]:
+        """
+        Function blocks until there are events after the position in the event log or the timeout passes
+
+        :param position: Number of events which have already been read
+        :param timeout: Maximum seconds to wait
+        :return: List of the events after the position, empty if the timeout passed
+        """
+        with self.events_condition:
+            self.events_condition.wait_for(lambda: len(self.events) > position, timeout)
+            return self.events[position:]
+
+    def set_state(self, plugin: AbstractPlugin, state: PluginState, result_index: int = None):
+        """
+        Function updates the state of a plugin and adds an event for the change
+
+        :param plugin: Plugin which changed state
+        :param state: New state of the plugin
+        :param result_index: Index of the plugin's result within the report, if it has finished
+        """
+        if state is PluginState.RUNNING:
+            self.start_times[plugin] = time.monotonic()
+        elif plugin in self.start_times:
+            self.durations[plugin] = time.monotonic() - self.start_times[plugin]
+
+        self.states[plugin] = state
+        self.add_event({
+            "type": "state",
+            "plugin": list(self.plugins).index(plugin),
+            "name": plugin.name,
+            "state": state.value,
+            "duration": self.durations.get(plugin),
+            "progress": self.progress,
+            "result": result_index,
+            "cache_age": self.cache_ages.get(plugin),
+        })
+
+    def complete_plugin(self, plugin: AbstractPlugin):
+        """
+        Function marks a plugin as complete once its result has been added to the report, the state of the plugin is
+        taken from the result
+
+        :param plugin: Plugin which has completed
+        """
+        self.plugins[plugin] = True
+
+        result_index = len(self.report.results) - 1
+        result = self.report.results[result_index]
+
+        telemetry = self.telemetry.get(plugin)
+        if telemetry is not None:
+            result.telemetry = telemetry  # the size of the data is measured when the result is written
+
+        self.write_result(result_index)
+
+        exception = result.exception
+        if exception is None:
+            state = PluginState.DONE
+        elif isinstance(exception, PluginTimeoutError):
+            state = PluginState.TIMED_OUT
+        elif isinstance(exception, PluginCancelledError):
+            state = PluginState.CANCELLED
+        else:
+            state = PluginState.FAILED
+
+        self.set_state(plugin, state, result_index)
+
+    def finish(self):
+        """
+        Function hands the report to the report writer to be stored once every plugin has completed
+        """
+        # plugins which failed to resolve are still LazyPlugins, which are never cached
+        if any(isinstance(plugin, AbstractPlugin) and plugin.cache_ttl for plugin in self.plugins):
+            get_result_cache().save()
+
+        self.stored = report_writer.submit(self.persist)
+        self.stored.add_done_callback(self.stored_report)
+
+    def add_unfinished(self, plugin: AbstractPlugin):
+        """
+        Function adds the result of a plugin which did not finish processing, because it was either cancelled or ran
+        past its deadline, along with any partial data the plugin stored
+
+        :param plugin: Plugin which did not finish
+        """
+        token = self.tokens.get(plugin)
+        if token is not None and token.expired and not self.cancelled:
+            exception = PluginTimeoutError("Plugin did not finish processing before its deadline")
+        else:
+            exception = PluginCancelledError("Report was cancelled before the plugin finished processing")
+
+        if token is not None:
+            checkpoints = token.checkpoints
+        else:  # the plugin never started, keep any shards restored from the resumed report
+            checkpoints = self.checkpoints.get(plugin.name)
+
+        self.report.add_unfinished(plugin, exception, token.partial_data if token else None, plugin.template,
+                                   checkpoints)
+
+    def start(self):
+        failed = self.resolve_plugins()
+        snapshot = self.capture_snapshot()
+        self.open_report_file()
+        graph = PluginGraph([plugin for plugin in self.plugins if plugin not in failed])
+        self.carry_over(graph)
+        self.add_unresolved(failed)
+        report_deadline = self.report_deadline()
+
+        while not graph.finished:
+            for plugin in graph.ready():  # plugins are released in dependency order
+                data = None
+                start_time = time.monotonic()
+                try:
+                    if self.cancelled or (report_deadline is not None and start_time >= report_deadline):
+                        self.add_unfinished(plugin)
+                    else:
+                        template = plugin.template
+                        token = self.create_token(plugin, report_deadline)
+                        data = self.submit(plugin, snapshot=snapshot, cancellation=token,
+                                           **graph.inputs(plugin)).result()
+
+                        self.report.add_result(plugin, data, template, self.cache_ages.get(plugin))
+                except PluginCancelledError:  # raised by the executor after checking its token
+                    self.add_unfinished(plugin)
+                except Exception as ppe:
+                    self.report.add_exception(plugin, ppe)
+
+                self.complete_plugin(plugin)
+                if plugin not in self.cache_ages:
+                    record_duration(plugin, time.monotonic() - start_time)
+                graph.complete(plugin, data)
+
+        self.finish()
+
+    def submit(self, plugin: AbstractPlugin, thread_pools: {} = None, **resources) -> futures.Future:
+        """
+        Function starts processing a plugin, if the plugin's data is in the result cache a completed future is returned
+        instead, otherwise the data is stored in the cache once the plugin has finished
+
+        :param plugin: Plugin to process
+        :param thread_pools: Dictionary of WorkClass, thread pool to submit normal executors to
+        :param resources: Resources passed through to the plugin executor
+        :return: Future which completes with the data produced by the plugin
+        """
+        if not plugin.cache_ttl or not config.getboolean("cache", "enabled", fallback=True):
+            return self.dispatch(plugin, thread_pools, **resources)
+
+        try:
+            key = plugin.cache_key(resources)
+        except Exception as e:  # plugin's fingerprint failed, process it as normal without caching
+            logger.debug(f'Failed to get cache key of {plugin.name}: {e}')
+            return self.dispatch(plugin, thread_pools, **resources)
+
+        cache = get_result_cache()
+        entry = cache.get(key)
+        if entry is not None:
+            logger.debug(f'Reusing cached data for {plugin.name} from {entry.age:.0f} seconds ago')
+            self.cache_ages[plugin] = entry.age
+
+            future = futures.Future()
+            future.set_result(entry.data)
+            return future
+
+        def on_done(completed: futures.Future):
+            if not completed.cancelled() and completed.exception() is None and completed.result() is not None:
+                cache.put(key, completed.result(), plugin.cache_ttl)
+
+        future = self.dispatch(plugin, thread_pools, **resources)
+        future.add_done_callback(on_done)
+        return future
+
+    def dispatch(self, plugin: AbstractPlugin, thread_pools: {} = None, **resources) -> futures.Future:
+        """
+        Function starts processing a plugin, executors marked to run in a process are submitted to the shared process
+        pool, coroutine executors are scheduled on the shared event loop, and normal executors are submitted to the
+        thread pool for their work class, or run immediately if there isn't one
+
+        :param plugin: Plugin to process
+        :param thread_pools: Dictionary of WorkClass, shared thread pool to submit normal executors to
+        :param resources: Resources passed through to the plugin executor
+        :return: Future which completes with the data produced by the plugin
+        """
+        telemetry = self.telemetry[plugin] = PluginTelemetry()
+
+        if plugin.runs_in_process or plugin.asynchronous:
+            self.set_state(plugin, PluginState.RUNNING)
+
+        if plugin.runs_in_process:
+            return submit_to_process_pool(plugin, resources, telemetry)
+
+        if plugin.asynchronous:
+            async def process_async():
+                with telemetry.measure(cpu=False):  # the event loop's thread is shared with other coroutines
+                    return await plugin.process_async(**resources)
+
+            return asyncio.run_coroutine_threadsafe(process_async(), get_event_loop())
+
+        def process(**arguments):
+            self.set_state(plugin, PluginState.RUNNING)  # the plugin only starts running once a thread picks it up
+            with telemetry.measure():
+                return plugin.process(**arguments)
+
+        if thread_pools is not None:
+            return thread_pools[plugin.work_class].submit(self, process, **resources)
+
+        future = futures.Future()
+        try:
+            future.set_result(process(**resources))
+        except Exception as e:
+            future.set_exception(e)
+
+        return future
 
     @property
     def progress(self):
         return len([status for status in self.plugins.values() if status]) * (100 / len(self.plugins))
 
 
-class ThreadedReportProcessor(Thread, ReportProcessor):
+class ThreadedReportProcessor(ReportProcessor):
+    """
+    Class processes the plugins of a report concurrently, normal executors are run in the thread pools shared by every
+    report, which are sized by the worker limit of each work class and split fairly between the running reports
+    """
 
-    def __init__(self, report_name, plugins):
-        Thread.__init__(self)
-        ReportProcessor.__init__(self, report_name, plugins)
-
-    def run(self):
-        plugin_count = len(self.plugins)
-        thread_count = get_thread_count(max_required=plugin_count)
-
-        # starting threads within another thread :^) wizardry
-        with ThreadPoolExecutor(max_workers=thread_count) as tpe:
-            # loop through all plugins, submit future for each one
-            future_to_plugin = {
-                tpe.submit(p.process): p for p in self.plugins.keys()
-            }
-
-            for future in futures.as_completed(future_to_plugin):
-                plugin = future_to_plugin[future]
-                self.plugins[plugin] = True
-                try:
-                    template = plugin.template
-                    data = future.result()
-                    self.report.add_result(plugin, data, template)
-                except Exception as executor_exception:
-                    self.report.add_exception(plugin, executor_exception)
+    def get_thread_pools(self, plugins: [AbstractPlugin]) -> {}:
+        """
+        Function returns the shared thread pool for each work class used by the report's normal executors. Coroutine and
+        process executors don't run in the thread pools so they don't need a thread.
+
+        :param plugins: Plugins which are scheduled to be processed
+        :return: Dictionary of WorkClass, FairThreadPool
+        """
+        work_classes = {p.work_class for p in plugins if not p.asynchronous and not p.runs_in_process}
+        return {work_class: get_thread_pool(work_class) for work_class in work_classes}
+
+    def next_deadline(self, running: [AbstractPlugin]) -> float:
+        """
+        :param running: Plugins which are currently processing
+        :return: Returns the seconds until the earliest deadline of the running plugins, or None if they have none
+        """
+        remaining = [self.tokens[p].remaining() for p in running if self.tokens[p].deadline is not None]
+        return min(remaining, default=None)
+
+    def start(self):
+        failed = self.resolve_plugins()
+        snapshot = self.capture_snapshot()
+        self.open_report_file()
+
+        graph = PluginGraph([plugin for plugin in self.plugins if plugin not in failed])
+        self.carry_over(graph)
+        self.add_unresolved(failed)
+        report_deadline = self.report_deadline()
+
+        thread_pools = self.get_thread_pools(graph.plugins)
+        try:
+            future_to_plugin = {}
+            start_times = {}
+
+            while not graph.finished:
+                # submit a future for each plugin whose inputs are ready, or skip them if the report is over
+                for p in graph.ready():
+                    if self.cancelled or (report_deadline is not None and time.monotonic() >= report_deadline):
+                        self.add_unfinished(p)
+                        self.complete_plugin(p)
+                        graph.complete(p)
+                        continue
+
+                    start_times[p] = time.monotonic()
+                    token = self.create_token(p, report_deadline)
+                    future = self.submit(p, thread_pools, snapshot=snapshot, cancellation=token, **graph.inputs(p))
+                    future_to_plugin[future] = p
+
+                if not future_to_plugin:
+                    continue
+
+                # wait for a plugin to finish, a plugin's deadline to pass, or the report to be cancelled
+                done, _ = futures.wait([*future_to_plugin, self.cancel_future],
+                                       timeout=self.next_deadline(future_to_plugin.values()),
+                                       return_when=futures.FIRST_COMPLETED)
+
+                for future in done:
+                    if future is self.cancel_future:
+                        continue
+
+                    plugin = future_to_plugin.pop(future)
+                    if plugin not in self.cache_ages:
+                        record_duration(plugin, time.monotonic() - start_times[plugin])
+                    data = None
+                    try:
+                        template = plugin.template
+                        data = future.result()
+                        self.report.add_result(plugin, data, template, self.cache_ages.get(plugin))
+                    except (PluginCancelledError, futures.CancelledError):
+                        self.add_unfinished(plugin)
+                    except Exception as executor_exception:
+                        self.report.add_exception(plugin, executor_exception)
+
+                    self.complete_plugin(plugin)
+                    graph.complete(plugin, data)
+
+                # give up on plugins which have been cancelled or have run past their deadline, threads can't be killed
+                # so any thread still running is left to finish in the background once its processes are killed
+                for future, plugin in list(future_to_plugin.items()):
+                    token = self.tokens[plugin]
+                    if self.cancelled or token.expired:
+                        token.cancel()
+                        if not future.cancel() and plugin.work_class in thread_pools:
+                            thread_pools[plugin.work_class].abandon(future)  # its thread is replaced
+                        del future_to_plugin[future]
+
+                        self.add_unfinished(plugin)
+                        self.complete_plugin(plugin)
+                        graph.complete(plugin)
+        finally:
+            for thread_pool in thread_pools.values():  # plugins of the report which haven't started are dropped
+                thread_pool.cancel(self)
 
-        self.report_id = store_report(self.report)
+        self.finish()
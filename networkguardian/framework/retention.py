@@ -0,0 +1,231 @@
+"""
+Module contains the compactor, which keeps the reports directory within the retention settings.
+
+The retention settings limit how many reports are kept for each system, how many days reports are kept for and the
+total size of the reports directory. The compactor runs on a background thread every compact_interval seconds, removing
+the reports which are outside the settings, oldest first, through delete_stored_report() so the report index stays
+consistent with the directory. The most recent report of each system is never removed to keep the directory within its
+size, so a single large report can't leave a system without any.
+
+Reports share identical large data sections, see the storage module, so a section is only removed once no report file
+uses it, whether or not the report is in the index. The compactor also removes shared sections which were left behind,
+such as when a report is resumed and replaced or a report file is removed by hand, while no report is being processed.
+"""
+from datetime import date, timedelta
+from threading import Thread, Event, Lock
+
+from networkguardian import logger, reports_directory, threading_enabled
+from networkguardian.config import config
+from networkguardian.framework.jobs import jobs, JobState
+from networkguardian.framework.report import report_index, delete_stored_report, writing_reports, \
+    shared_section_grace, unindexed_shared_sections
+from networkguardian.framework.storage import list_shared_sections, remove_shared_sections, ReportFormatError
+
+compactor = None
+compactor_lock = Lock()
+
+
+class RetentionPolicy:
+    """
+    Class is used to store the retention settings
+    """
+
+    def __init__(self, keep_per_system: int = 0, max_age: int = 0, max_size: int = 0):
+        """
+        :param keep_per_system: Most recent reports kept for each system, 0 for no limit
+        :param max_age: Days reports are kept for, 0 for no limit
+        :param max_size: Bytes the reports and the sections they share may use, 0 for no limit
+        """
+        self.keep_per_system = keep_per_system
+        self.max_age = max_age
+        self.max_size = max_size
+
+    def __repr__(self):
+        return f"RetentionPolicy(keep_per_system={self.keep_per_system}, max_age={self.max_age}, " \
+               f"max_size={self.max_size})"
+
+    @staticmethod
+    def from_config():
+        return RetentionPolicy(config.getint("reports", "keep_per_system"), config.getint("reports", "max_age"),
+                               config.getint("reports", "max_size") * 1024 * 1024)
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.keep_per_system or self.max_age or self.max_size)
+
+
+def report_date(value: str) -> date:
+    """
+    :return: Returns the date of a report, or None if it can't be read
+    """
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def expired_reports(policy: RetentionPolicy, listing: [], today: date = None) -> [int]:
+    """
+    Function finds the reports which are older than the reports kept for their system or the maximum age
+
+    :param policy: Retention settings
+    :param listing: Rows of ReportIndex.listing(), in the order the reports were indexed
+    :param today: Date the age of the reports is measured from, today if None
+    :return: IDs of the expired reports, oldest first
+    """
+    oldest = None
+    if policy.max_age:
+        oldest = (today or date.today()) - timedelta(days=policy.max_age)
+
+    kept = {}  # system name, reports kept so far, counted from the most recent report
+    expired = []
+    for row in reversed(listing):
+        kept[row["system_name"]] = kept.get(row["system_name"], 0) + 1
+        if policy.keep_per_system and kept[row["system_name"]] > policy.keep_per_system:
+            expired.append(row["report_id"])
+            continue
+
+        created = report_date(row["date"])
+        if oldest is not None and created is not None and created < oldest:
+            expired.append(row["report_id"])
+
+    expired.reverse()
+    return expired
+
+
+def oversized_reports(policy: RetentionPolicy, listing: [], removed: {int}) -> [int]:
+    """
+    :return: Returns the IDs of the reports which can be removed to keep the directory within its size, oldest first,
+    leaving the most recent report of each system
+    """
+    latest = {row["system_name"]: row["report_id"] for row in listing}
+    return [row["report_id"] for row in listing
+            if row["report_id"] not in removed and latest[row["system_name"]] != row["report_id"]]
+
+
+def compact(policy: RetentionPolicy = None) -> (int, int):
+    """
+    Function removes the reports outside the retention settings, then the shared sections no report uses
+
+    :param policy: Retention settings, the settings in the config are used if None
+    :return: Tuple of the number of reports removed and the number of shared section bytes freed
+    """
+    policy = policy or RetentionPolicy.from_config()
+
+    # reports which are being resumed are replaced once they finish, so they are left until then
+    resuming = {job.processor.resumes for job in list(jobs.values()) if job.state is not JobState.FINISHED}
+
+    removed = set()
+
+    def remove(report_id: int) -> bool:
+        if report_id in resuming:
+            return False
+
+        try:
+            summary = delete_stored_report(report_id)
+        except OSError as e:
+            logger.error(f'Failed to remove report {report_id} outside the retention settings')
+            logger.debug(e)
+            return False
+
+        removed.add(report_id)
+        if summary is not None:
+            logger.info(f'Removed report {summary.name} ({summary.date}) outside the retention settings')
+        return True
+
+    if policy.limited:
+        listing = report_index.listing()
+        for report_id in expired_reports(policy, listing):
+            remove(report_id)
+
+        if policy.max_size:
+            for report_id in oversized_reports(policy, listing, removed):
+                if report_index.total_size() <= policy.max_size:
+                    break
+                remove(report_id)
+
+    return len(removed), sweep_shared_sections()
+
+
+def sweep_shared_sections() -> int:
+    """
+    Function removes the shared sections which no report in the index uses, this is skipped while reports are being
+    processed as the sections they use aren't in the index until they have been stored
+
+    :return: Returns the number of bytes freed
+    """
+    if writing_reports:
+        return 0
+
+    stored = list_shared_sections(reports_directory)
+    if not stored:
+        return 0
+
+    unused = stored.keys() - report_index.shared_sections()  # includes sections which were never finished writing
+    try:
+        unused -= unindexed_shared_sections()
+    except (OSError, ReportFormatError, ValueError, KeyError) as e:
+        logger.debug(f'Skipped removing unused shared sections as a report file couldn\'t be read: {e}')
+        return 0
+
+    freed = remove_shared_sections(reports_directory, unused, shared_section_grace)
+    if freed:
+        logger.debug(f'Removed {freed} bytes of shared sections which no report uses')
+
+    return freed
+
+
+class Compactor:
+    """
+    Class is used to compact the reports directory on a background thread
+    """
+
+    def __init__(self, name: str = "Report Compactor"):
+        self.name = name
+        self.thread = None
+        self.wake_event = Event()
+
+    def start(self):
+        """
+        Function starts compacting the reports directory, if threading is disabled it is compacted once immediately
+        """
+        if not threading_enabled:
+            compact()
+            return
+
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = Thread(target=self._work, name=self.name)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def wake(self):
+        """
+        Function compacts the reports directory without waiting for the interval, i.e. after the settings changed
+        """
+        self.wake_event.set()
+
+    def _work(self):
+        while True:
+            self.wake_event.clear()
+            try:
+                removed, freed = compact()
+                if removed or freed:
+                    logger.debug(f'Compacted reports, removed {removed} reports and {freed} bytes of shared sections')
+            except Exception as e:
+                logger.error('Failed to compact the reports directory')
+                logger.debug(e)
+
+            interval = config.getint("reports", "compact_interval")
+            self.wake_event.wait(interval if interval > 0 else None)
+
+
+def get_compactor() -> Compactor:
+    global compactor
+    with compactor_lock:
+        if compactor is None:
+            compactor = Compactor()
+        return compactor
+
+
+def start_compactor():
+    get_compactor().start()
@@ -0,0 +1,170 @@
+from networkguardian import logger
+from networkguardian.framework.plugin import AbstractPlugin
+
+plugin_durations = {}  # Plugin name, average duration in seconds of previous executions
+duration_smoothing = 0.3  # weight given to the newest duration when updating the average
+
+
+def record_duration(plugin: AbstractPlugin, duration: float):
+    """
+    Function records how long a plugin took to process, this is kept as an exponential moving average so the estimate
+    follows changes in the network without being thrown off by one slow execution
+
+    :param plugin: Plugin which was processed
+    :param duration: Time taken in seconds
+    """
+    previous = plugin_durations.get(plugin.name)
+    if previous is None:
+        plugin_durations[plugin.name] = duration
+    else:
+        plugin_durations[plugin.name] = previous + duration_smoothing * (duration - previous)
+
+
+def estimate_duration(plugin: AbstractPlugin) -> float:
+    """
+    :param plugin: Plugin to estimate
+    :return: Returns the average duration of the plugin, or 1 second if it has never been processed
+    """
+    return plugin_durations.get(plugin.name, 1.0)
+
+
+class PluginGraph:
+    """
+    Class is used to schedule the plugins within a report as a directed acyclic graph, where an edge exists from a
+    plugin which produces an output to every plugin which consumes it.
+
+    Consumed outputs are optional, a plugin which consumes an output nobody in the report produces has no dependency
+    and is expected to gather the information itself. Plugins are released as soon as every plugin they depend on has
+    completed, with plugins on the longest (critical) path through the graph released first.
+    """
+
+    def __init__(self, plugins: [AbstractPlugin], weight=None):
+        """
+        :param plugins: Loaded plugins to be scheduled
+        :param weight: Optional function returning the estimated cost of a plugin, by default the average duration of
+        its previous executions
+        """
+        self.plugins = list(plugins)
+        self.weight = weight or estimate_duration
+
+        self.outputs = {}  # output name, data produced
+        self.started = set()
+        self.completed = set()
+
+        # map each output to the plugin which produces it
+        self.producers = {}
+        for plugin in self.plugins:
+            if plugin.produces is None:
+                continue
+
+            if plugin.produces in self.producers:
+                logger.warning(f'{plugin} produces {plugin.produces} which is already produced by '
+                               f'{self.producers[plugin.produces]}, ignoring')
+                continue
+
+            self.producers[plugin.produces] = plugin
+
+        # plugin, set of plugins which must complete before it can start
+        self.dependencies = {
+            plugin: {self.producers[name] for name in plugin.consumes if name in self.producers} - {plugin}
+            for plugin in self.plugins
+        }
+
+        self._break_cycles()
+
+        # plugin, set of plugins which depend on it
+        self.dependents = {plugin: set() for plugin in self.plugins}
+        for plugin, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                self.dependents[dependency].add(plugin)
+
+        self.priorities = {}
+        for plugin in self.plugins:
+            self._priority(plugin)
+
+    def _break_cycles(self):
+        """
+        Function removes the dependencies of any plugins which depend on each other in a cycle, as they could otherwise
+        never start. Those plugins run without the consumed outputs instead.
+        """
+        remaining = {plugin: set(dependencies) for plugin, dependencies in self.dependencies.items()}
+        resolved = True
+        while resolved:  # Kahn's algorithm, repeatedly remove plugins with no unresolved dependencies
+            resolved = False
+            for plugin in [p for p, dependencies in remaining.items() if not dependencies]:
+                del remaining[plugin]
+                for dependencies in remaining.values():
+                    dependencies.discard(plugin)
+                resolved = True
+
+        # anything left over is either part of a cycle or waits on one, only the plugins within a cycle are changed
+        for plugin in [p for p in remaining if self._reaches(p, p, remaining)]:
+            logger.warning(f'{plugin} has a cyclic dependency, running without consumed outputs')
+            self.dependencies[plugin] = set()
+
+    @staticmethod
+    def _reaches(start: AbstractPlugin, target: AbstractPlugin, dependencies: {}) -> bool:
+        """
+        :return: Returns True if the target can be reached by following the dependencies of the start plugin
+        """
+        visited = set()
+        stack = list(dependencies[start])
+        while stack:
+            plugin = stack.pop()
+            if plugin is target:
+                return True
+            if plugin not in visited:
+                visited.add(plugin)
+                stack.extend(dependencies.get(plugin, ()))
+
+        return False
+
+    def _priority(self, plugin: AbstractPlugin) -> float:
+        """
+        Function calculates the length of the longest path from the plugin to the end of the graph, this is used to
+        start plugins on the critical path first
+        """
+        if plugin not in self.priorities:
+            downstream = [self._priority(dependent) for dependent in self.dependents[plugin]]
+            self.priorities[plugin] = self.weight(plugin) + max(downstream, default=0)
+
+        return self.priorities[plugin]
+
+    def ready(self) -> [AbstractPlugin]:
+        """
+        Function returns the plugins which can be started and marks them as started, ordered by their priority
+
+        :return: List of plugins ready to be processed
+        """
+        ready = [
+            plugin for plugin in self.plugins
+            if plugin not in self.started and self.dependencies[plugin] <= self.completed
+        ]
+        ready.sort(key=lambda plugin: self.priorities[plugin], reverse=True)
+
+        self.started.update(ready)
+        return ready
+
+    def inputs(self, plugin: AbstractPlugin) -> {}:
+        """
+        :param plugin: Plugin to get the inputs for
+        :return: Dictionary containing each output consumed by the plugin which has been produced
+        """
+        return {name: self.outputs[name] for name in plugin.consumes if name in self.outputs}
+
+    def complete(self, plugin: AbstractPlugin, data: {} = None):
+        """
+        Function marks a plugin as completed, releasing any plugins that depend on it
+
+        :param plugin: Plugin which has completed
+        :param data: Data produced by the plugin, None if the plugin failed
+        """
+        self.started.add(plugin)  # plugins carried over from a resumed report complete without being started
+        self.completed.add(plugin)
+
+        if data is not None and self.producers.get(plugin.produces) is plugin:
+            self.outputs[plugin.produces] = data
+
+    @property
+    def finished(self) -> bool:
+        return len(self.completed) == len(self.plugins)
@@ -0,0 +1,97 @@
+import ipaddress
+import platform
+from types import MappingProxyType
+
+import psutil
+
+from networkguardian.framework.plugin import SystemPlatform
+
+
+class SystemSnapshot:
+    """
+    Immutable point-in-time capture of the system information commonly required by plugins (network interfaces, their
+    statistics and IO counters, the process table, and platform information).
+
+    A snapshot is captured once per report by the report processor and shared between every plugin executor that asks
+    for it, rather than each plugin reading the same information from the operating system separately.
+    """
+
+    __slots__ = ('interfaces', 'interface_stats', 'io_counters', 'processes', 'platform_information')
+
+    def __init__(self, interfaces: {}, interface_stats: {}, io_counters: {}, processes: {}, platform_information: {}):
+        """
+        :param interfaces: Interface name to a tuple of addresses, as returned by psutil.net_if_addrs()
+        :param interface_stats: Interface name to statistics, as returned by psutil.net_if_stats()
+        :param io_counters: Interface name to IO counters, as returned by psutil.net_io_counters(pernic=True)
+        :param processes: PID to process name
+        :param platform_information: Dictionary containing information about the running system
+        """
+        # object.__setattr__ is used because __setattr__ is disabled to make the snapshot immutable
+        object.__setattr__(self, 'interfaces', MappingProxyType({k: tuple(v) for k, v in interfaces.items()}))
+        object.__setattr__(self, 'interface_stats', MappingProxyType(dict(interface_stats)))
+        object.__setattr__(self, 'io_counters', MappingProxyType(dict(io_counters)))
+        object.__setattr__(self, 'processes', MappingProxyType(dict(processes)))
+        object.__setattr__(self, 'platform_information', MappingProxyType(dict(platform_information)))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("SystemSnapshot is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("SystemSnapshot is immutable")
+
+    def __reduce__(self):
+        # mapping proxies cannot be pickled, so the snapshot is rebuilt from plain copies of the dictionaries
+        return SystemSnapshot, (dict(self.interfaces), dict(self.interface_stats), dict(self.io_counters),
+                                dict(self.processes), dict(self.platform_information))
+
+    def __repr__(self):
+        return f"SystemSnapshot(interfaces={len(self.interfaces)}, processes={len(self.processes)})"
+
+    @staticmethod
+    def capture():
+        """
+        Function reads all of the information stored within a snapshot from the running system
+
+        :return: SystemSnapshot of the running system
+        """
+        try:
+            io_counters = psutil.net_io_counters(pernic=True)
+        except RuntimeError:  # raised when no interface counters are available
+            io_counters = {}
+
+        processes = {p.info['pid']: p.info['name'] for p in psutil.process_iter(attrs=['pid', 'name'])}
+
+        platform_information = {
+            "system_platform": SystemPlatform.detect(),
+            "system_name": platform.node(),
+            "platform": platform.platform(),
+            "system": platform.system(),
+            "processor": platform.processor(),
+            "memory": psutil.virtual_memory().total
+        }
+
+        return SystemSnapshot(psutil.net_if_addrs(), psutil.net_if_stats(), io_counters, processes,
+                              platform_information)
+
+    def usable_addresses(self):
+        """
+        Generator yields the addresses of every interface which can be used to reach a network, excluding loopback and
+        link local addresses, addresses which are not IP addresses (i.e. MAC addresses), and interfaces which are down
+
+        :return: Generator of (interface name, psutil address) tuples
+        """
+        for interface_name, addresses in self.interfaces.items():
+            stats = self.interface_stats.get(interface_name)
+            if stats is None or not stats.isup:  # if disabled (down)
+                continue
+
+            for address in addresses:
+                try:
+                    ip_address = ipaddress.ip_address(address.address)
+                except ValueError:  # not valid ip address
+                    continue
+
+                if ip_address.is_loopback or ip_address.is_link_local:
+                    continue
+
+                yield interface_name, address
@@ -0,0 +1,736 @@
+"""
+Module contains the on-disk format used to store reports.
+
+A report file is made up of a header, a record for the report and each plugin result, then a manifest and a fixed
+size trailer at the end of the file:
+
+    header      MAGIC, format version
+    records     RECORD_MAGIC, length of the sections, length of the record, then the encoded plugin data and template
+                sections of the record followed by the record as JSON
+    manifest    JSON describing the report and each result, including where its sections are within the file
+    trailer     offset and length of the manifest, END_MAGIC
+
+A checkpoint record is written for each shard of work a plugin completes, see CancellationToken.checkpoint(). If the
+plugin doesn't finish, the sections of its checkpoints are listed in its manifest entry so the report can be resumed
+without repeating them.
+
+The manifest holds everything needed to list reports and their results, so reports can be listed by only reading the
+trailer and manifest. Sections are read the first time a result's data or template is used. Each section records its
+own encoding and codec, so it can be read without the rest of the file.
+
+Reports are written while they are processed, a record is appended for each result as the plugin completes and the
+manifest is only written once the report is finished. The records hold the same entries as the manifest, so a report
+file which was never finished, because the application stopped, can be recovered by reading its records and writing
+the manifest of the results it contains.
+
+Sections are compressed on their own with the codec set by the compression setting, so a section can be read and
+decompressed without touching the rest of the file. The codec is recorded with each section, and codecs other than the
+zlib and lzma codecs from the standard library can be added with register_codec(). Sections which don't get smaller
+are stored uncompressed.
+
+Sections can be shared between reports rather than stored within the report file. They are kept in the shared
+sections directory next to the report files, named by the SHA-256 digest of their contents, and the manifest entry of
+the section holds the digest in place of its offset. Only data sections are shared, once they are large enough to be
+worth a file of their own, so identical plugin results, such as those of consecutive reports of an unchanged system, are
+stored once. Templates and the information about each plugin always stay within the report file, so a report copied
+to another reports directory can still be opened and listed, only the large data it shared can't be read without the
+shared sections. Shared sections are removed once no report file uses them, see the retention module.
+
+Plugin data is stored as JSON. Dictionaries with keys which aren't strings, tuples, sets and bytes are tagged so they
+are read back as the same type, and any other objects are stored as their string representation, which is all the
+templates use. Older report files which were written with pickle are read and rewritten in this format.
+"""
+import base64
+import hashlib
+import json
+import lzma
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, date
+from enum import Enum
+
+from networkguardian import logger, exceptions
+from networkguardian.config import config
+from networkguardian.exceptions import PluginProcessingError, PluginCancelledError
+
+MAGIC = b"NGREPORT"
+END_MAGIC = b"NGEND\0\0\0"
+RECORD_MAGIC = b"NGRC"
+FORMAT_VERSION = 1
+
+header_format = struct.Struct("<8sH")  # magic, format version
+record_format = struct.Struct("<4sQQ")  # record magic, sections length, record length
+trailer_format = struct.Struct("<QQ8s")  # manifest offset, manifest length, end magic
+
+PICKLE_PROTOCOL_MARKER = b"\x80"  # first byte of a report written with pickle protocol 2 and above
+
+TAG = "__ng_type__"  # key used to mark values which aren't plain JSON
+
+minimum_compressed_size = 256  # sections smaller than this are stored uncompressed, they wouldn't get much smaller
+minimum_shared_size = 4096  # smaller sections are kept within the report file, a file of its own would use a block
+shared_sections_directory = "sections"  # directory next to the report files holding the sections they share
+
+
+class ReportFormatError(Exception):
+    """
+    Exception is raised when a report file is damaged or was written in a format which isn't supported
+    """
+
+
+class Codec:
+    """
+    Class is used to compress and decompress the sections of a report file
+    """
+
+    def __init__(self, name: str, compress, decompress):
+        """
+        :param name: Name the codec is recorded as within report files
+        :param compress: Function taking the bytes of a section and returning them compressed
+        :param decompress: Function taking compressed bytes and returning the bytes of the section
+        """
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+
+    def __repr__(self):
+        return f"Codec(name='{self.name}')"
+
+
+codecs = {}  # codec name, Codec
+
+
+def register_codec(name: str, compress, decompress) -> Codec:
+    """
+    Function adds a codec which can be used to compress report sections, report files which use the codec can only be
+    read while it is registered
+    """
+    codecs[name] = Codec(name, compress, decompress)
+    return codecs[name]
+
+
+register_codec("zlib", lambda data: zlib.compress(data, 6), zlib.decompress)
+register_codec("lzma", lambda data: lzma.compress(data, preset=6), lzma.decompress)
+
+
+def report_codec() -> Codec:
+    """
+    :return: Returns the codec set by the compression setting, or None if sections shouldn't be compressed
+    """
+    name = config.get("reports", "compression", fallback="zlib")
+    if name in ("", "none"):
+        return None
+
+    if name not in codecs:
+        logger.warning(f'Report compression {name} is not available, storing reports uncompressed')
+        return None
+
+    return codecs[name]
+
+
+def compress_section(data: bytes, codec: Codec = None) -> (bytes, {}):
+    """
+    :param data: Bytes of the section
+    :param codec: Codec to compress the section with, None to not compress it
+    :return: Returns the bytes to store and the manifest entry fields describing them
+    """
+    fields = {"size": len(data)}
+    if codec is not None and len(data) >= minimum_compressed_size:
+        compressed = codec.compress(data)
+        if len(compressed) < len(data):
+            return compressed, dict(fields, codec=codec.name)
+
+    return data, fields
+
+
+def decompress_section(data: bytes, section: {}) -> bytes:
+    """
+    :param data: Bytes stored for the section
+    :param section: Manifest entry locating the section
+    :return: Returns the bytes of the section
+    """
+    name = section.get("codec")
+    if name is None:
+        return data
+
+    codec = codecs.get(name)
+    if codec is None:
+        raise ReportFormatError(f"Report section is compressed with {name}, which is not available")
+
+    try:
+        return codec.decompress(data)
+    except (zlib.error, lzma.LZMAError) as e:
+        raise ReportFormatError(f"Report section could not be decompressed, {e}")
+
+
+def encode_value(value):
+    """
+    Function converts plugin data into values which can be stored as JSON, keeping the type of values JSON doesn't
+    support
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [encode_value(v) for v in value]
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value) and TAG not in value:
+            return {k: encode_value(v) for k, v in value.items()}
+        return {TAG: "dict", "items": [[encode_value(k), encode_value(v)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {TAG: "tuple", "items": [encode_value(v) for v in value]}
+    if isinstance(value, (set, frozenset)):
+        return {TAG: "set", "items": [encode_value(v) for v in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {TAG: "bytes", "value": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, Enum):
+        return encode_value(value.value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    return str(value)  # unknown objects are only ever rendered
+
+
+def decode_value(value):
+    """
+    Function converts values produced by encode_value() back into plugin data
+    """
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    if isinstance(value, dict):
+        tag = value.get(TAG)
+        if tag is None:
+            return {k: decode_value(v) for k, v in value.items()}
+        if tag == "dict":
+            return {_hashable(decode_value(k)): decode_value(v) for k, v in value["items"]}
+        if tag == "tuple":
+            return tuple(decode_value(v) for v in value["items"])
+        if tag == "set":
+            return {_hashable(decode_value(v)) for v in value["items"]}
+        if tag == "bytes":
+            return base64.b64decode(value["value"])
+
+        raise ReportFormatError(f"Unknown value type {tag}")
+
+    return value
+
+
+def _hashable(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+def encode_section(value, encoding: str = "json") -> bytes:
+    """
+    :param value: Value to store in the section
+    :param encoding: Name of the encoding to use
+    :return: Returns the bytes of the section
+    """
+    if encoding == "json":
+        return json.dumps(encode_value(value), separators=(",", ":")).encode("utf-8")
+    if encoding == "text":
+        return value.encode("utf-8")
+
+    raise ReportFormatError(f"Unknown section encoding {encoding}")
+
+
+def decode_section(data: bytes, encoding: str):
+    """
+    :param data: Bytes of the section
+    :param encoding: Name of the encoding the section was stored with
+    :return: Returns the value stored in the section
+    """
+    if encoding == "json":
+        return decode_value(json.loads(data.decode("utf-8")))
+    if encoding == "text":
+        return data.decode("utf-8")
+
+    raise ReportFormatError(f"Unknown section encoding {encoding}")
+
+
+def encode_exception(exception: Exception) -> {}:
+    if exception is None:
+        return None
+
+    return {"type": type(exception).__name__, "message": str(exception)}
+
+
+def decode_exception(exception: {}) -> Exception:
+    """
+    Function recreates a stored exception, exceptions which aren't part of Network Guardian are recreated as a
+    PluginProcessingError with the same message
+    """
+    if exception is None:
+        return None
+
+    exception_class = getattr(exceptions, exception["type"], None)
+    if not (isinstance(exception_class, type) and issubclass(exception_class, Exception)):
+        return PluginProcessingError(f'{exception["type"]}: {exception["message"]}')
+
+    return exception_class(exception["message"])
+
+
+class ReportWriter:
+    """
+    Class is used to write the records of a report file, followed by its manifest
+    """
+
+    def __init__(self, f, append: bool = False, codec: Codec = None, shared_directory: str = None):
+        """
+        :param f: File opened for writing in binary mode
+        :param append: True if the file already has its header, records are written from the current position
+        :param codec: Codec to compress sections with, the compression setting is used if None
+        :param shared_directory: Directory of the report file, large data sections are shared with the other reports
+        in it, or None to store every section within the file
+        """
+        self.f = f
+        self.codec = codec if codec is not None else report_codec()
+        self.shared_directory = shared_directory
+        if not append:
+            self.f.write(header_format.pack(MAGIC, FORMAT_VERSION))
+
+    def write_record(self, record: {}, sections: [bytes] = ()):
+        """
+        :param record: Record to write, must be able to be serialised as JSON
+        :param sections: Encoded sections which belong to the record, written in order before it
+        """
+        data = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        self.f.write(record_format.pack(RECORD_MAGIC, sum(len(section) for section in sections), len(data)))
+        for section in sections:
+            self.f.write(section)
+        self.f.write(data)
+
+    def share(self, data: bytes, encoding: str, fields: {}) -> {}:
+        """
+        :param data: Compressed section
+        :param encoding: Encoding of the section
+        :param fields: Fields returned by compress_section()
+        :return: Returns the manifest entry of the section once it is stored in the shared sections directory
+        """
+        digest = write_shared_section(self.shared_directory, data)
+        return {"digest": digest, "length": len(data), "encoding": encoding, **fields}
+
+    def write_information(self, information: {}, plugins: []):
+        """
+        :param information: Report information, as created by report_information()
+        :param plugins: Every plugin in the report, or their results
+        """
+        self.write_record({"type": "report", "report": information,
+                           "plugins": [plugin_entry(plugin) for plugin in plugins]})
+
+    def write_result(self, result) -> {}:
+        """
+        :param result: PluginResult to write
+        :return: Returns the manifest entry of the result
+        """
+        sections = []
+        offset = self.f.tell() + record_format.size
+
+        def locate(value, encoding: str, shareable: bool = False) -> {}:
+            nonlocal offset
+            if value is None:
+                return None
+
+            data, fields = compress_section(encode_section(value, encoding), self.codec)
+            if shareable and self.shared_directory is not None and len(data) >= minimum_shared_size:
+                return self.share(data, encoding, fields)
+
+            sections.append(data)
+            section = {"offset": offset, "length": len(data), "encoding": encoding, **fields}
+            offset += len(data)
+            return section
+
+        data = locate(result.data, "json", shareable=True)
+
+        # executors run in a thread return their data without it being serialized, so the size of the data as stored
+        # is recorded instead
+        telemetry = getattr(result, "telemetry", None)
+        if telemetry is not None and telemetry.bytes_returned is None and data is not None:
+            telemetry.bytes_returned = data["size"]
+
+        entry = dict(plugin_entry(result), **{
+            "exception": encode_exception(result.exception),
+            "partial": getattr(result, "partial", False),
+            "cache_age": getattr(result, "cache_age", None),
+            "telemetry": telemetry.to_dict() if telemetry else None,
+            "data": data,
+            "template": locate(result.template, "text"),
+        })
+
+        checkpoints = getattr(result, "checkpoints", None)
+        if checkpoints:
+            entry["checkpoints"] = {key: locate(data, "json") for key, data in checkpoints.items()}
+
+        self.write_record({"type": "result", "result": entry}, sections)
+
+        return entry
+
+    def write_checkpoint(self, plugin_name: str, key: str, data) -> {}:
+        """
+        :param plugin_name: Name of the plugin which completed the shard
+        :param key: Key identifying the shard
+        :param data: Data of the shard
+        :return: Returns the manifest entry locating the section of the shard's data
+        """
+        section, fields = compress_section(encode_section(data), self.codec)
+        located = {"offset": self.f.tell() + record_format.size, "length": len(section), "encoding": "json", **fields}
+        self.write_record({"type": "checkpoint", "plugin": plugin_name, "key": key, "data": located}, [section])
+
+        return located
+
+    def write_manifest(self, manifest: {}):
+        data = json.dumps(manifest, separators=(",", ":")).encode("utf-8")
+        offset = self.f.tell()
+        self.f.write(data)
+        self.f.write(trailer_format.pack(offset, len(data), END_MAGIC))
+
+    def sync(self):
+        """
+        Function makes sure everything written so far is stored on disk
+        """
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+
+def plugin_entry(plugin) -> {}:
+    """
+    :param plugin: Plugin or PluginResult
+    :return: Returns the information stored about the plugin which produced a result
+    """
+    return {
+        "name": plugin.name,
+        "category": plugin.category.value,
+        "author": plugin.author,
+        "version": plugin.version,
+        "description": plugin.description,
+    }
+
+
+def report_information(report) -> {}:
+    return {
+        "name": report.name,
+        "date": report.date,
+        "system_name": report.system_name,
+        "system_platform": str(report.system_platform),
+        "software_version": report.software_version,
+    }
+
+
+def report_manifest(information: {}, results: [{}], interrupted: bool = False) -> {}:
+    """
+    :param information: Report information, as created by report_information()
+    :param results: Manifest entry of each result
+    :param interrupted: True if the report was recovered after the application stopped while processing it
+    """
+    return {"format": FORMAT_VERSION, "report": information, "results": results, "interrupted": interrupted}
+
+
+def write_report(report, path: str):
+    """
+    Function writes a report to a file in the report format. The report is written to a temporary file which is synced
+    to disk then renamed to the path, so the file at the path is never incomplete.
+
+    :param report: Report to write
+    :param path: Path of the file
+    """
+    temporary_path = f"{path}.writing"
+    try:
+        with open(temporary_path, "wb") as f:
+            writer = ReportWriter(f, shared_directory=os.path.dirname(path))
+
+            information = report_information(report)
+            writer.write_information(information, report.results)
+            results = [writer.write_result(result) for result in report.results]
+
+            writer.write_manifest(report_manifest(information, results))
+            writer.sync()
+
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+    sync_directory(os.path.dirname(path))
+
+
+def sync_directory(path: str):
+    """
+    Function makes sure files renamed within a directory stay renamed if the system stops, this isn't supported on
+    every platform so failures are ignored
+    """
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_header(f):
+    """
+    Function reads the header of a report file, leaving the file positioned after it
+    :raises ReportFormatError: if the file isn't a report file or is a format which isn't supported
+    """
+    header = f.read(header_format.size)
+    if len(header) < header_format.size:
+        raise ReportFormatError("File is too small to be a report")
+
+    magic, version = header_format.unpack(header)
+    if magic != MAGIC:
+        raise ReportFormatError("File is not a report")
+    if version != FORMAT_VERSION:
+        raise ReportFormatError(f"Report format {version} is not supported")
+
+
+def read_manifest(path: str) -> {}:
+    """
+    Function reads the manifest of a report file without reading any of its sections
+
+    :param path: Path of the report file
+    :return: Manifest dictionary
+    :raises ReportFormatError: if the file isn't a report file, is damaged, or is a format which isn't supported
+    """
+    with open(path, "rb") as f:
+        read_header(f)
+
+        size = f.seek(0, os.SEEK_END)
+        if size < header_format.size + trailer_format.size:
+            raise ReportFormatError("Report is incomplete or damaged")
+
+        f.seek(size - trailer_format.size)
+        offset, length, end_magic = trailer_format.unpack(f.read(trailer_format.size))
+        if end_magic != END_MAGIC or offset + length > size - trailer_format.size:
+            raise ReportFormatError("Report is incomplete or damaged")
+
+        f.seek(offset)
+        return json.loads(f.read(length).decode("utf-8"))
+
+
+def read_section(path: str, section: {}):
+    """
+    :param path: Path of the report file
+    :param section: Manifest entry locating the section
+    :return: Returns the value stored in the section
+    """
+    if "digest" in section:
+        try:
+            with open(shared_section_path(os.path.dirname(path), section["digest"]), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise ReportFormatError(f'Shared section {section["digest"]} is missing, the report may have been moved '
+                                    f'without its shared sections')
+    else:
+        with open(path, "rb") as f:
+            f.seek(section["offset"])
+            data = f.read(section["length"])
+
+    if len(data) != section["length"]:
+        raise ReportFormatError("Report section is incomplete")
+
+    return decode_section(decompress_section(data, section), section["encoding"])
+
+
+def manifest_shared_sections(manifest: {}) -> {}:
+    """
+    :param manifest: Manifest of a report file
+    :return: Returns a dictionary of digest, length of the shared sections the report uses
+    """
+    shared_sections = {}
+    for entry in manifest["results"]:
+        sections = [entry["data"], *(entry.get("checkpoints") or {}).values()]
+        for section in sections:
+            if section is not None and "digest" in section:
+                shared_sections[section["digest"]] = section["length"]
+
+    return shared_sections
+
+
+def shared_section_path(directory: str, digest: str) -> str:
+    """
+    :param directory: Directory of the report files which share the section
+    :param digest: Digest of the section
+    :return: Returns the path of the shared section file
+    """
+    return os.path.join(directory, shared_sections_directory, digest)
+
+
+def write_shared_section(directory: str, data: bytes) -> str:
+    """
+    Function stores a section in the shared sections directory, if a section with the same contents is already stored
+    it is used instead. Either way the file is marked as used now, so it isn't removed before the report using it is
+    indexed.
+
+    :param directory: Directory of the report file the section belongs to
+    :param data: Compressed section
+    :return: Digest of the section
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = shared_section_path(directory, digest)
+    try:
+        os.utime(path)
+        return digest
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}-{threading.get_ident()}.writing"  # unique while writing the same section
+    try:
+        with open(temporary_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+    return digest
+
+
+def list_shared_sections(directory: str) -> {}:
+    """
+    :param directory: Directory of the report files
+    :return: Dictionary of digest, os.stat_result of each shared section file, including any being written
+    """
+    shared_directory = os.path.join(directory, shared_sections_directory)
+    if not os.path.isdir(shared_directory):
+        return {}
+
+    return {entry.name: entry.stat() for entry in os.scandir(shared_directory) if entry.is_file()}
+
+
+def remove_shared_sections(directory: str, digests, grace_period: float = 0) -> int:
+    """
+    Function removes shared sections which are no longer used, sections used within the grace period are kept as
+    reports which are still being stored may use them
+
+    :param directory: Directory of the report files
+    :param digests: Digests of the sections to remove
+    :param grace_period: Seconds since a section was last used for it to be removed
+    :return: Returns the number of bytes freed
+    """
+    freed = 0
+    cutoff = time.time() - grace_period
+    for digest in digests:
+        path = shared_section_path(directory, digest)
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+
+            os.remove(path)
+            freed += stat.st_size
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.debug(f'Failed to remove shared section {digest}: {e}')
+
+    return freed
+
+
+def recover_report(path: str) -> {}:
+    """
+    Function finishes a report file which was being written when the application stopped. The records which were
+    completely written are kept, anything after them is removed, and the manifest is written with a cancelled result
+    for each plugin which didn't complete, along with any shards it checkpointed.
+
+    :param path: Path of the report file, which is updated
+    :return: Manifest of the recovered report
+    :raises ReportFormatError: if the file isn't a report file or stopped before the report information was written
+    """
+    information = None
+    plugins = []
+    results = []
+    checkpoints = {}  # plugin name, dictionary of shard key, section
+
+    with open(path, "r+b") as f:
+        read_header(f)
+        size = f.seek(0, os.SEEK_END)
+
+        position = header_format.size
+        while position + record_format.size <= size:
+            f.seek(position)
+            magic, sections_length, record_length = record_format.unpack(f.read(record_format.size))
+
+            end = position + record_format.size + sections_length + record_length
+            if magic != RECORD_MAGIC or end > size:
+                break  # the record was only partly written
+
+            f.seek(end - record_length)
+            try:
+                record = json.loads(f.read(record_length).decode("utf-8"))
+            except ValueError:
+                break
+
+            if record["type"] == "report":
+                information = record["report"]
+                plugins = record["plugins"]
+            elif record["type"] == "result":
+                results.append(record["result"])
+            elif record["type"] == "checkpoint":
+                checkpoints.setdefault(record["plugin"], {})[record["key"]] = record["data"]
+
+            position = end
+
+        if information is None:
+            raise ReportFormatError("Report stopped before any of it was written")
+
+        completed = {entry["name"] for entry in results}
+        exception = encode_exception(
+            PluginCancelledError("Report was interrupted before the plugin finished processing"))
+        for plugin in plugins:
+            if plugin["name"] not in completed:
+                results.append(dict(plugin, exception=exception, partial=False, cache_age=None, telemetry=None,
+                                    data=None, template=None, checkpoints=checkpoints.get(plugin["name"])))
+
+        manifest = report_manifest(information, results, interrupted=True)
+
+        f.seek(position)
+        f.truncate()
+        writer = ReportWriter(f, append=True)
+        writer.write_manifest(manifest)
+        writer.sync()
+
+    return manifest
+
+
+def is_pickled_report(path: str) -> bool:
+    """
+    :return: Returns True if the file was written by a version which stored reports with pickle
+    """
+    with open(path, "rb") as f:
+        return f.read(1) == PICKLE_PROTOCOL_MARKER
+
+
+def read_pickled_report(path: str):
+    """
+    Function reads a report written with pickle by an older version, this requires the classes the report was pickled
+    with to still be importable
+
+    :return: The unpickled Report
+    """
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def migrate_report(path: str):
+    """
+    Function rewrites a report written with pickle in the report format
+
+    :param path: Path of the report file, which is replaced
+    :return: The migrated Report
+    """
+    report = read_pickled_report(path)
+    write_report(report, path)
+
+    logger.info(f'Migrated {path} to report format {FORMAT_VERSION}')
+    return report
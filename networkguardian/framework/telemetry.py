@@ -0,0 +1,144 @@
+"""
+Module is used to measure the cost of processing plugins, so the plugins which dominate the time taken by reports can be
+found and plugin upgrades which make them slower can be spotted.
+"""
+import time
+from contextlib import contextmanager
+
+import psutil
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+
+def peak_rss() -> int:
+    """
+    :return: Returns the highest resident set size of the running process so far in bytes, or None if it is unknown
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if psutil.MACOS else peak * 1024  # Mac OS X reports bytes, Linux reports kilobytes
+
+    return getattr(psutil.Process().memory_info(), "peak_wset", None)  # Windows
+
+
+def child_time() -> float:
+    """
+    :return: Returns the CPU seconds used by child processes of the running process which have finished, or None if it
+    is unknown
+    """
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    return None
+
+
+class PluginTelemetry:
+    """
+    Class is used to store how much a single execution of a plugin cost.
+
+    Thread executors share the process with everything else, so the peak RSS delta is how much the plugin raised the
+    peak of the whole process and child process time includes any other plugin's processes which finished while it was
+    running. Both are exact for executors run in a worker process. Coroutine executors share their thread with other
+    coroutines, so only their wall time is recorded.
+    """
+
+    def __init__(self):
+        self.wall_time = None  # seconds from the executor starting to it returning
+        self.cpu_time = None  # CPU seconds used by the executor
+        self.peak_rss_delta = None  # bytes the peak resident set size increased by
+        self.child_time = None  # CPU seconds used by child processes i.e. nmap
+        self.bytes_returned = None  # size in bytes of the data returned when pickled, or as stored if it wasn't
+
+    def __repr__(self):
+        return f'PluginTelemetry({", ".join(f"{k}={v!r}" for k, v in self.to_dict().items())})'
+
+    def to_dict(self) -> {}:
+        return dict(vars(self))
+
+    def update(self, values: {}):
+        """
+        Function copies the values measured elsewhere i.e. within a worker process
+        :param values: Dictionary produced by to_dict()
+        """
+        for name, value in values.items():
+            if value is not None:
+                setattr(self, name, value)
+
+    @contextmanager
+    def measure(self, cpu: bool = True, process_wide: bool = False):
+        """
+        Context manager measures the code run within it
+
+        :param cpu: Whether to measure CPU time, peak RSS and child process time, only wall time is measured if False
+        :param process_wide: Whether the CPU time of every thread in the process is counted, used in worker processes
+        """
+        cpu_clock = time.process_time if process_wide else time.thread_time
+        start_wall = time.perf_counter()
+        if cpu:
+            start_cpu, start_rss, start_children = cpu_clock(), peak_rss(), child_time()
+
+        try:
+            yield self
+        finally:
+            self.wall_time = time.perf_counter() - start_wall
+            if cpu:
+                self.cpu_time = cpu_clock() - start_cpu
+
+                end_rss, end_children = peak_rss(), child_time()
+                if start_rss is not None and end_rss is not None:
+                    self.peak_rss_delta = end_rss - start_rss
+                if start_children is not None and end_children is not None:
+                    self.child_time = end_children - start_children
+
+
+def aggregate_telemetry(results: [{}]) -> [{}]:
+    """
+    Function combines the telemetry of every result within the reports by plugin and version, so a version of a plugin
+    can be compared against the version before it
+
+    :param results: Dictionaries containing the name, version and telemetry of each result, taken from the report index
+    :return: List of dictionaries, one per plugin version, ordered by the total wall time of the plugin
+    """
+    groups = {}  # (plugin name, version), list of PluginTelemetry
+    for result in results:
+        if result["telemetry"] is None:  # reports from older versions have no telemetry
+            continue
+
+        telemetry = PluginTelemetry()
+        telemetry.update(result["telemetry"])
+        if telemetry.wall_time is not None:
+            groups.setdefault((result["name"], result["version"]), []).append(telemetry)
+
+    def mean(values: [], name: str) -> float:
+        values = [getattr(t, name) for t in values if getattr(t, name) is not None]
+        return sum(values) / len(values) if values else None
+
+    rows = []
+    for (name, version), values in groups.items():
+        rows.append({
+            "name": name,
+            "version": version,
+            "executions": len(values),
+            "total_wall_time": sum(t.wall_time for t in values),
+            "max_wall_time": max(t.wall_time for t in values),
+            **{f"mean_{field}": mean(values, field) for field in PluginTelemetry().to_dict()},
+        })
+
+    # compare each version against the previous version of the same plugin
+    previous = {}
+    for row in sorted(rows, key=lambda r: (r["name"], r["version"])):
+        before = previous.get(row["name"])
+        row["wall_time_change"] = row["mean_wall_time"] / before["mean_wall_time"] - 1 \
+            if before is not None and before["mean_wall_time"] else None
+        previous[row["name"]] = row
+
+    plugin_totals = {}
+    for row in rows:
+        plugin_totals[row["name"]] = plugin_totals.get(row["name"], 0) + row["total_wall_time"]
+
+    rows.sort(key=lambda r: (-plugin_totals[r["name"]], r["name"], r["version"]))
+    return rows
@@ -0,0 +1,101 @@
+"""
+Module contains the template environment used to render plugin results and report filenames.
+
+Plugin templates are stored as strings within each result, so rendering a result used to compile its template every
+time. Templates are now compiled through a shared environment which keeps the most recently used compiled templates,
+keyed by the SHA-256 digest of their source, so a template is compiled once however many results and reports use it.
+The compiled bytecode can also be saved in the template cache directory with the templates setting of the cache, so
+templates aren't compiled again after the application restarts.
+
+Results read from report files don't change, so they remember what they rendered, see StoredPluginResult.render().
+"""
+import hashlib
+import os
+from threading import Lock
+
+from jinja2 import Environment, FunctionLoader, FileSystemBytecodeCache, Template
+
+from networkguardian import logger, find_user_resource
+from networkguardian.config import config
+
+template_cache_directory = find_user_resource("template_cache")
+compiled_template_limit = 256  # compiled templates kept in memory, the least recently used are compiled again
+
+template_environment = None
+template_environment_lock = Lock()
+
+template_sources = {}  # digest, template source, only held while the loader reads it to compile the template
+template_sources_lock = Lock()
+
+
+def template_digest(source: str) -> str:
+    """
+    :return: Returns the digest a template is keyed by
+    """
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def load_template_source(digest: str) -> (str, str, object):
+    """
+    Function is used by the environment's loader to find the source of a template
+    """
+    source = template_sources.get(digest)
+    if source is None:
+        return None
+
+    return source, None, lambda: True  # sources are keyed by their contents, so they can't be out of date
+
+
+def create_environment() -> Environment:
+    """
+    :return: Returns an environment with the same settings as jinja2.Template, which plugin templates were written for
+    """
+    bytecode_cache = None
+    if config.getboolean("cache", "templates", fallback=False):
+        try:
+            os.makedirs(template_cache_directory, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(template_cache_directory)
+        except OSError as e:
+            logger.error(f'Failed to create the template cache {template_cache_directory}, templates won\'t be saved')
+            logger.debug(e)
+
+    return Environment(loader=FunctionLoader(load_template_source), bytecode_cache=bytecode_cache,
+                       cache_size=compiled_template_limit, auto_reload=False)
+
+
+def get_environment() -> Environment:
+    """
+    :return: Returns the template environment shared by all results, creating it from the cache settings if required
+    """
+    global template_environment
+
+    with template_environment_lock:
+        if template_environment is None:
+            template_environment = create_environment()
+
+    return template_environment
+
+
+def get_template(source: str) -> Template:
+    """
+    :param source: Source of the template
+    :return: Returns the compiled template, it is only compiled if it isn't already in the cache
+    """
+    digest = template_digest(source)
+    environment = get_environment()
+
+    with template_sources_lock:
+        template_sources[digest] = source
+        try:
+            return environment.get_template(digest)
+        finally:
+            del template_sources[digest]  # the compiled template is cached, the source isn't needed to use it
+
+
+def render(source: str, context: {}) -> str:
+    """
+    :param source: Source of the template
+    :param context: Variables the template is rendered with
+    :return: Returns the rendered template
+    """
+    return get_template(source).render(context)
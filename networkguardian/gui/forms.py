@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField, SelectMultipleField, BooleanField
-from wtforms.validators import DataRequired
+from wtforms import StringField, SubmitField, SelectMultipleField, BooleanField, IntegerField, SelectField
+from wtforms.validators import DataRequired, NumberRange, InputRequired
 
 
 class CreateReportForm(FlaskForm):
@@ -21,4 +21,17 @@ class SettingsForm(FlaskForm):
     report_filename_template = StringField("Report Filename", validators=[DataRequired()])
     threading = BooleanField(label="Multi Threading")
 
+    # worker limits, 0 is used to size automatically / not limit
+    max_threads = IntegerField("Maximum Threads per Pool", validators=[InputRequired(), NumberRange(min=0)])
+    io_workers = IntegerField("I/O Workers", validators=[InputRequired(), NumberRange(min=0)])
+    subprocess_workers = IntegerField("Subprocess Workers", validators=[InputRequired(), NumberRange(min=0)])
+    cpu_workers = IntegerField("CPU Workers", validators=[InputRequired(), NumberRange(min=0)])
+    max_reports = IntegerField("Concurrent Reports", validators=[InputRequired(), NumberRange(min=0)])
+    compression = SelectField("Report Compression")
+
+    # report retention, 0 is used to not limit
+    keep_per_system = IntegerField("Reports Kept per System", validators=[InputRequired(), NumberRange(min=0)])
+    max_age = IntegerField("Days Reports are Kept", validators=[InputRequired(), NumberRange(min=0)])
+    max_size = IntegerField("Maximum Reports Size (MB)", validators=[InputRequired(), NumberRange(min=0)])
+
     submit = SubmitField("Update Settings")
@@ -1,14 +1,23 @@
+import json
 import os
 import webbrowser
 
 import webview
-from flask import render_template, flash, redirect, url_for, abort, jsonify, request
+from flask import render_template, flash, redirect, url_for, abort, jsonify, request, Response, stream_with_context
 
 from networkguardian import reports_directory, plugins_directory, logger, application_name, application_version
+from networkguardian.config import config, save_config
+from networkguardian.framework.diff import diff_reports, format_key, format_row, first_rows
+from networkguardian.framework.jobs import jobs, cancel_job, JobState
 from networkguardian.framework.plugin import SystemPlatform
-from networkguardian.framework.registry import registered_plugins, usable_plugins, import_external_plugins, load_plugins
-from networkguardian.framework.report import reports, processing_reports, start_report, export_report_as_html, \
-    generate_report_filename, report_extension, report_filename_template, start_quick_report
+from networkguardian.framework.retention import get_compactor
+from networkguardian.framework.registry import registered_plugins, usable_plugins, import_external_plugins, \
+    load_plugins, slow_plugin_duration
+from networkguardian.framework.report import report_index, get_report, delete_stored_report, start_report, \
+    export_report_as_html, generate_report_filename, report_extension, report_filename_template, start_quick_report, \
+    resume_report
+from networkguardian.framework.storage import codecs
+from networkguardian.framework.telemetry import aggregate_telemetry
 from networkguardian.gui import app, window
 from networkguardian.gui.forms import SettingsForm, CreateReportForm
 
@@ -46,12 +55,18 @@ def template_injector():
 def index():
     return render_template('pages/dashboard.html',
                            plugins=registered_plugins,
-                           reports=reports)
+                           report_count=len(report_index),
+                           reports=report_index.query(limit=3))
+
+
+worker_settings = ("max_threads", "io_workers", "subprocess_workers", "cpu_workers")
+retention_settings = ("keep_per_system", "max_age", "max_size")
 
 
 @app.route('/settings/', methods=['GET', 'POST'])
 def settings():
     form = SettingsForm()
+    form.compression.choices = [("none", "None")] + [(name, name) for name in codecs]
 
     if form.validate_on_submit():
         plugin_directory = form.plugin_directory
@@ -59,7 +74,16 @@ def settings():
         n_report_filename_template = form.report_filename_template
         threading = form.threading
 
-        # TODO: Save this to config
+        for field in worker_settings:
+            config.set("workers", field, str(getattr(form, field).data))
+        config.set("reports", "max_reports", str(form.max_reports.data))
+        config.set("reports", "compression", form.compression.data)
+        for field in retention_settings:
+            config.set("reports", field, str(getattr(form, field).data))
+        save_config()
+        get_compactor().wake()  # apply the retention settings now rather than at the next interval
+
+        # TODO: Save the remaining settings to config
         flash("Updated settings")
     else:
         form.plugin_directory.data = plugins_directory
@@ -67,12 +91,20 @@ def settings():
         form.report_filename_template.data = report_filename_template
         form.threading.data = True
 
+        for field in worker_settings:
+            getattr(form, field).data = config.getint("workers", field)
+        form.max_reports.data = config.getint("reports", "max_reports")
+        form.compression.data = config.get("reports", "compression")
+        for field in retention_settings:
+            getattr(form, field).data = config.getint("reports", field)
+
     return render_template("pages/settings.html", form=form, report_extension=report_extension)
 
 
 @app.route('/plugins/')
 def view_plugins():
-    return render_template('pages/plugins.html', plugins=registered_plugins.values())
+    return render_template('pages/plugins.html', plugins=registered_plugins.values(),
+                           slow_plugin_duration=slow_plugin_duration)
 
 
 @app.route('/plugins/<plugin_name>')
@@ -93,9 +125,9 @@ def create_report():
         selected_plugins = [registered_plugins[plugin] for plugin in form.plugins.data]
         logger.info(f"Creating report {report_name}, with {selected_plugins}")
 
-        thread_id = start_report(report_name, selected_plugins)
+        job_id = start_report(report_name, selected_plugins)
 
-        return redirect(url_for("process_report", thread_id=thread_id))
+        return redirect(url_for("process_report", job_id=job_id))
 
     return render_template('pages/create-report.html', form=form)
 
@@ -106,53 +138,159 @@ def quick_report():
         flash("Cannot create report with no plugins")
         return index()
 
-    thread_id = start_quick_report()
-    return redirect(url_for("process_report", thread_id=thread_id))
+    job_id = start_quick_report()
+    return redirect(url_for("process_report", job_id=job_id))
+
 
+@app.route('/reports/processing/<int:job_id>')
+def process_report(job_id):
+    if job_id in jobs:
+        job = jobs[job_id]
+        report_processor = job.processor
+        if report_processor.finished:
+            if report_processor.report_id is None:
+                flash("Report was cancelled before it started")
+                return redirect(url_for("view_reports"))
 
-@app.route('/reports/processing/<int:thread_id>')
-def process_report(thread_id):
-    if thread_id in processing_reports:
-        report_processor = processing_reports[thread_id]
-        if report_processor.progress >= 100 and not report_processor.isAlive():
             flash("Report completed")
 
             return redirect(url_for("view_report", report_id=report_processor.report_id))
 
-        return render_template('pages/processing-report.html', report=report_processor)
+        return render_template('pages/processing-report.html', report=report_processor, job=job)
+
+    return abort(404)
+
+
+@app.route('/reports/cancel/<int:job_id>')
+def cancel_report(job_id):
+    if job_id in jobs:
+        if cancel_job(job_id):
+            flash("Cancelling report, plugins which have finished will still be saved")
+
+        return redirect(url_for("process_report", job_id=job_id))
 
     return abort(404)
 
 
-@app.route('/reports/progress/<int:thread_id>')
-def report_progress(thread_id):
-    if thread_id in processing_reports:
+@app.route('/reports/progress/<int:job_id>')
+def report_progress(job_id):
+    if job_id in jobs:
+        job = jobs[job_id]
+        report_processor = job.processor
         return jsonify({
-            "progress": processing_reports[thread_id].progress
+            "state": job.state.value,
+            "position": job.position,
+            "progress": report_processor.progress,
+            "plugins": {plugin.name: state.value for plugin, state in report_processor.states.items()},
+            "finished": report_processor.finished
         })
 
-    # TODO: Use this rather than refreshing whole page
-    #  add to api probs
     return abort(404)
 
 
+@app.route('/reports/stream/<int:job_id>')
+def stream_report(job_id):
+    """
+    Server-Sent Events stream of a processing report, an event is pushed whenever a plugin changes state and the HTML of
+    each plugin result is pushed as soon as the plugin finishes. Events are numbered so a reconnecting browser carries
+    on from the last event it received.
+    """
+    if job_id not in jobs:
+        return abort(404)
+
+    report_processor = jobs[job_id].processor
+    position = request.headers.get("Last-Event-ID", 0, type=int)
+
+    def generate():
+        nonlocal position
+        while True:
+            events = report_processor.wait_for_events(position, timeout=15)
+            if not events:
+                yield ": keep-alive\n\n"  # comment line, stops the connection from being closed while plugins run
+                continue
+
+            for event in events:
+                position += 1
+                if event.get("result") is not None:
+                    event = dict(event, html=render_template('elements/plugin_result.html',
+                                                             result=report_processor.report.results[event["result"]],
+                                                             index=event["result"] + 1))
+
+                yield f'id: {position}\nevent: {event["type"]}\ndata: {json.dumps(event)}\n\n'
+
+                if event["type"] == "finished":
+                    return
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"X-Accel-Buffering": "no"})
+
+
+diff_row_limit = 500  # rows shown for each kind of change, the rest are only counted so large diffs render quickly
+report_filters = ("system_name", "system_platform", "plugin")
+
+
 @app.route('/reports/')
 def view_reports():
-    return render_template('pages/reports.html', reports=reports)
+    processing = [job for job in jobs.values() if job.state is not JobState.FINISHED]
+
+    filters = {name: request.args.get(name) or None for name in report_filters}
+    filter_values = {name: report_index.values(name) for name in report_filters}
+
+    return render_template('pages/reports.html', reports=report_index.query(**filters), jobs=processing,
+                           filters=filters, filter_values=filter_values)
+
+
+@app.route('/reports/telemetry')
+def view_telemetry():
+    return render_template('pages/telemetry.html', rows=aggregate_telemetry(report_index.telemetry()))
 
 
 @app.route('/reports/<int:report_id>')
 def view_report(report_id: int):
-    try:
-        return render_template('pages/view-report.html', report=reports[report_id], report_id=report_id)
-    except IndexError:
+    report = get_report(report_id)
+    if report is None:
+        return abort(404)
+
+    return render_report(report, report_id)
+
+
+def render_report(report, report_id: int):
+    summary = report_index.get(report_id)
+    previous_id = report_index.previous(summary) if summary is not None else None
+
+    return render_template('pages/view-report.html', report=report, report_id=report_id, summary=summary,
+                           previous_id=previous_id)
+
+
+@app.route('/reports/diff/<int:before_id>/<int:after_id>')
+def view_diff(before_id: int, after_id: int):
+    before = get_report(before_id)
+    after = get_report(after_id)
+    if before is None or after is None:
         return abort(404)
 
+    return render_template('pages/diff.html', before=before, after=after, before_id=before_id, after_id=after_id,
+                           diffs=diff_reports(before, after), row_limit=diff_row_limit, first_rows=first_rows,
+                           format_key=format_key, format_row=format_row)
+
+
+@app.route('/reports/resume/<int:report_id>')
+def resume_stored_report(report_id: int):
+    job_id = resume_report(report_id)
+    if job_id is None:
+        flash("The report can't be resumed, either every plugin finished or the report no longer exists")
+        return redirect(url_for('view_reports'))
+
+    return redirect(url_for('process_report', job_id=job_id))
+
 
 @app.route('/reports/export/<int:report_id>')
 def export_report(report_id: int):
+    report = get_report(report_id)
+    if report is None:
+        return abort(404)
+
     try:
-        report = reports[report_id]
         report_filename = generate_report_filename(report, "html")
 
         save_path = window.create_file_dialog(webview.SAVE_DIALOG, directory='/', save_filename=report_filename)
@@ -161,28 +299,25 @@ def export_report(report_id: int):
             export_report_as_html(report, save_path[0])
             flash(f"Exported {report.name} to {save_path}")
 
-    except IndexError:
-        return abort(404)
     except IOError:
         flash("Exporting report failed")
 
-    return render_template('pages/view-report.html', report=reports[report_id], report_id=report_id)
+    return render_report(report, report_id)
 
 
 @app.route("/reports/delete/<int:report_id>")
 def delete_report(report_id: int):
     try:
-        report = reports[report_id]
-        os.remove(report.path)  # remove file
-        reports.remove(report)  # remove from list
-        flash(f"Removed report {report.name}")
+        summary = delete_stored_report(report_id)
+        if summary is None:
+            return abort(404)
+
+        flash(f"Removed report {summary.name}")
 
         return redirect(url_for("view_reports"))
-    except IndexError:
-        return abort(404)
     except IOError:
         flash("Error occurred while attempting to delete report file")
-        return render_template('pages/view-report.html', report=reports[report_id], report_id=report_id)
+        return render_template('pages/view-report.html', report=get_report(report_id), report_id=report_id)
 
 
 @app.route('/help/view')
@@ -200,6 +335,20 @@ def refresh_plugins():
     return redirect(request.headers.get("Referer"))
 
 
+@app.route("/api/reports/diff/<int:before_id>/<int:after_id>")
+def report_diff(before_id: int, after_id: int):
+    before = get_report(before_id)
+    after = get_report(after_id)
+    if before is None or after is None:
+        return abort(404)
+
+    return jsonify({
+        "before": before_id,
+        "after": after_id,
+        "plugins": [plugin_diff.to_dict() for plugin_diff in diff_reports(before, after)]
+    })
+
+
 @app.route("/api/plugins/directory")
 def plugin_directory():
     open_directory(plugins_directory)
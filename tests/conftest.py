@@ -0,0 +1,23 @@
+import pytest
+
+from networkguardian.framework.plugin import PluginCategory, PluginInformation
+from networkguardian.framework.registry import registered_plugins
+
+
+def create_plugin(name: str) -> PluginInformation:
+    """
+    :return: Returns the information of a plugin, which is all results need from the plugin that produced them
+    """
+    return PluginInformation(name, PluginCategory.OTHER, "Tests", 1.0)
+
+
+@pytest.fixture
+def registry():
+    """
+    Fixture restores the registered plugins once the test has finished, for tests which import plugins
+    """
+    registered = dict(registered_plugins)
+    yield registered_plugins
+
+    registered_plugins.clear()
+    registered_plugins.update(registered)
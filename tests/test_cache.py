@@ -0,0 +1,109 @@
+import pytest
+
+from networkguardian.framework import cache
+from networkguardian.framework.cache import ResultCache
+
+
+class Clock:
+    """
+    Stand-in for the time module, so entries can be expired without waiting
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_copies_are_returned(clock):
+    result_cache = ResultCache(0, 0)
+    data = {"hosts": ["10.0.0.1"]}
+    result_cache.put(("Host Scan",), data, 60)
+
+    data["hosts"].append("10.0.0.2")
+    cached = result_cache.get(("Host Scan",)).data
+    cached["hosts"].clear()
+
+    assert result_cache.get(("Host Scan",)).data == {"hosts": ["10.0.0.1"]}
+
+
+def test_ttl_expiry(clock):
+    result_cache = ResultCache(0, 0)
+    result_cache.put(("Host Scan",), {"hosts": 1}, 60)
+
+    clock.now += 30
+    entry = result_cache.get(("Host Scan",))
+    assert entry.data == {"hosts": 1}
+    assert entry.age == 30
+
+    clock.now += 30
+    assert result_cache.get(("Host Scan",)) is None
+    assert result_cache.entries == {}
+    assert result_cache.size == 0
+
+
+def test_least_recently_used_is_evicted(clock):
+    result_cache = ResultCache(2, 0)
+    result_cache.put(("a",), 1, 60)
+    result_cache.put(("b",), 2, 60)
+    result_cache.get(("a",))  # b is now the least recently used
+
+    result_cache.put(("c",), 3, 60)
+
+    assert list(result_cache.entries) == [("a",), ("c",)]
+
+
+def test_size_limit(clock):
+    result_cache = ResultCache(0, 200)
+    result_cache.put(("a",), b"a" * 80, 60)
+    result_cache.put(("b",), b"b" * 80, 60)
+    result_cache.put(("c",), b"c" * 80, 60)
+
+    assert list(result_cache.entries) == [("b",), ("c",)]
+    assert result_cache.size == sum(entry.size for entry in result_cache.entries.values())
+
+    assert not result_cache.put(("d",), b"d" * 300, 60)  # larger than the whole cache
+    assert ("d",) not in result_cache.entries
+
+
+def test_unpicklable_data_isnt_stored(clock):
+    result_cache = ResultCache(0, 0)
+
+    assert not result_cache.put(("a",), {"lock": lambda: None}, 60)
+    assert result_cache.get(("a",)) is None
+
+
+def test_persistence(clock, tmp_path):
+    path = str(tmp_path / "cache" / "cache.pickle")
+    result_cache = ResultCache(0, 0, path)
+    result_cache.put(("a",), {"hosts": 1}, 60)
+    result_cache.put(("b",), {"hosts": 2}, 10)
+    result_cache.save()
+
+    clock.now += 30  # b expires before the cache is loaded again
+    reloaded = ResultCache(0, 0, path)
+
+    assert reloaded.load()
+    assert list(reloaded.entries) == [("a",)]
+    assert reloaded.get(("a",)).data == {"hosts": 1}
+    assert reloaded.get(("a",)).age == 30
+
+
+def test_missing_or_corrupt_file(clock, tmp_path):
+    path = tmp_path / "cache.pickle"
+    assert not ResultCache(0, 0, str(path)).load()
+    assert not ResultCache(0, 0).load()  # not persistent
+
+    path.write_bytes(b"not a pickle")
+    result_cache = ResultCache(0, 0, str(path))
+
+    assert not result_cache.load()
+    assert result_cache.entries == {}
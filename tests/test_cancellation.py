@@ -0,0 +1,74 @@
+import sys
+import time
+
+import pytest
+
+from networkguardian.exceptions import PluginCancelledError
+from networkguardian.framework.cancellation import CancellationToken
+
+timeout = 5  # seconds before a test fails rather than hanging
+
+
+def test_no_deadline():
+    token = CancellationToken()
+
+    assert not token.expired
+    assert token.remaining() is None
+    token.check()
+
+
+def test_deadline():
+    token = CancellationToken(time.monotonic() + 60)
+    assert not token.expired
+    assert 0 < token.remaining() <= 60
+    token.check()
+
+    token = CancellationToken(time.monotonic() - 1)
+    assert token.expired
+    assert token.remaining() == 0.0
+    with pytest.raises(PluginCancelledError):
+        token.check()
+
+
+def test_cancel():
+    token = CancellationToken()
+    assert not token.wait(0)
+
+    token.cancel()
+
+    assert token.cancelled
+    assert token.wait(0)
+    with pytest.raises(PluginCancelledError):
+        token.check()
+
+
+def test_run_is_killed_at_deadline():
+    token = CancellationToken(time.monotonic() + 0.5)
+
+    start = time.monotonic()
+    with pytest.raises(PluginCancelledError):
+        token.run([sys.executable, "-c", "import time; time.sleep(30)"])
+    assert time.monotonic() - start < timeout
+
+
+def test_checkpoints():
+    stored = []
+    token = CancellationToken(checkpoints={"10.0.0.0/24": {"hosts": 1}},
+                              on_checkpoint=lambda key, data: stored.append((key, data)))
+
+    assert token.restore("10.0.0.0/24") == {"hosts": 1}  # completed before the report was resumed
+    assert token.restore("192.168.1.0/24") is None
+
+    token.checkpoint("192.168.1.0/24", {"hosts": 2})
+
+    assert token.restore("192.168.1.0/24") == {"hosts": 2}
+    assert stored == [("192.168.1.0/24", {"hosts": 2})]
+
+
+def test_partial():
+    token = CancellationToken()
+    assert token.partial_data is None
+
+    token.partial({"networks": 1})
+
+    assert token.partial_data == {"networks": 1}
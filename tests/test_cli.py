@@ -0,0 +1,52 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from networkguardian import __main__ as main
+from networkguardian.framework import profiling
+
+package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_entry_point(directory, *arguments) -> subprocess.CompletedProcess:
+    """
+    Function runs a copy of the entry point in the directory, so the application directory is created within it
+    """
+    entry_point = shutil.copy(os.path.join(package_directory, "entry_point.py"), directory)
+    environment = dict(os.environ, PYTHONPATH=package_directory)
+    return subprocess.run([sys.executable, entry_point, *arguments], cwd=directory, env=environment,
+                          capture_output=True, text=True, timeout=120)
+
+
+def test_profile_startup(tmp_path):
+    trace_path = tmp_path / "trace.json"
+    completed = run_entry_point(tmp_path, "--profile-startup", "--profile-trace", str(trace_path), "diff", "1", "2")
+
+    assert completed.returncode == 1, completed.stderr
+    assert "Report 1 doesn't exist" in completed.stdout
+    assert "Startup took" in completed.stdout
+    assert "Imports (excluding the modules each imported):" in completed.stdout
+
+    with open(trace_path) as f:
+        events = json.load(f)["traceEvents"]
+    phases = {event["name"] for event in events if event["cat"] == "phase"}
+    imports = {event["name"] for event in events if event["cat"] == "import"}
+    assert {"Module Imports", "Plugin Import", "Plugin Load", "Report Loading"} <= phases
+    assert "networkguardian.config" in imports  # imported by the networkguardian package after profiling started
+
+
+def test_profile_startup_default_command(monkeypatch):
+    started = []
+    for name in ("create_directories", "import_external_plugins", "load_plugins"):  # use the application directory
+        monkeypatch.setattr(main, name, lambda *arguments: None)
+    monkeypatch.setattr(main.gui, "callback", lambda debug: started.append(debug))
+
+    result = CliRunner().invoke(main.cli, ["--profile-startup"])
+    profiling.stop_profile()  # the stubbed gui command doesn't finish the profile
+
+    assert result.exit_code == 0, result.output
+    assert started == [False]  # the gui command is run with its defaults rather than parsing the arguments again
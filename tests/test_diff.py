@@ -0,0 +1,60 @@
+from conftest import create_plugin
+from networkguardian.exceptions import PluginProcessingError
+from networkguardian.framework.diff import diff_reports, default_rows
+from networkguardian.framework.report import Report
+
+template = "<p>{{ data }}</p>"
+
+
+def create_report(results: {}) -> Report:
+    """
+    :param results: Dictionary of plugin name, data produced or the exception raised
+    """
+    report = Report("Diff Test")
+    for name, data in results.items():
+        if isinstance(data, Exception):
+            report.add_exception(create_plugin(name), data)
+        else:
+            report.add_result(create_plugin(name), data, template)
+
+    return report
+
+
+def test_default_rows():
+    rows = default_rows({"ports": {22: "ssh"}, "users": ["root"], "hostname": "server"})
+    assert rows == {("ports", 22): "ssh", ("users", "root"): "root", ("hostname",): "server"}
+
+
+def test_diff_reports():
+    before = create_report({
+        "Ports": {"ports": {22: "ssh", 80: "http", 3306: "mysql"}, "hostname": "server"},
+        "Removed": {"value": 1},
+    })
+    after = create_report({
+        "Ports": {"ports": {22: "ssh", 80: "nginx", 443: "https"}, "hostname": "server"},
+        "Added": PluginProcessingError("Plugin failed"),
+    })
+
+    diffs = {plugin_diff.name: plugin_diff for plugin_diff in diff_reports(before, after)}
+    assert list(diffs) == ["Ports", "Added", "Removed"]  # in the order of the later report
+
+    ports = diffs["Ports"]
+    assert ports.added == {("ports", 443): "https"}
+    assert ports.removed == {("ports", 3306): "mysql"}
+    assert ports.changed == {("ports", 80): ("http", "nginx")}
+    assert ports.unchanged == 2
+    assert not ports.status_changed
+
+    assert (diffs["Added"].before_status, diffs["Added"].after_status) == ("Missing", "Failed")
+    assert diffs["Added"].changes == 0
+    assert (diffs["Removed"].before_status, diffs["Removed"].after_status) == ("Done", "Missing")
+    assert diffs["Removed"].removed == {("value",): 1}
+
+
+def test_diff_to_dict():
+    before = create_report({"Ports": {"ports": {22: "ssh"}}})
+    after = create_report({"Ports": {"ports": {22: "ssh", 443: "https"}}})
+
+    plugin_diff = diff_reports(before, after)[0].to_dict()
+    assert plugin_diff["added"] == [{"key": ["ports", 443], "row": "https"}]
+    assert plugin_diff["unchanged"] == 1
@@ -0,0 +1,103 @@
+import pytest
+
+from networkguardian.framework.discovery import LazyPlugin, NotStaticError, discover_plugins
+from networkguardian.framework.plugin import AbstractPlugin, PluginCategory, SystemPlatform
+from networkguardian.framework.registry import import_external_plugins, resolve_plugin
+
+plugin_module = '''
+from networkguardian.framework.plugin import AbstractPlugin, PluginCategory, executor
+from networkguardian.framework.registry import register_plugin
+{imports}
+
+open({marker!r}, "w").close()  # shows the module was imported
+
+
+@register_plugin("{name}", PluginCategory.NETWORK, "Tests", 1.0)
+class DiscoveredPlugin(AbstractPlugin):
+    """
+        Plugin used to test discovery
+    """
+
+    @executor("template.html", produces="test data", timeout=30)
+    def execute(self):
+        return {{"value": 1}}
+'''
+
+
+def write_plugin(directory, name: str, imports: str = "") -> (str, str):
+    """
+    :return: Returns the path of the plugin module and of the file it creates when imported
+    """
+    directory.mkdir(parents=True)
+    marker = str(directory / "imported")
+    path = directory / "plugin.py"
+    path.write_text(plugin_module.format(name=name, imports=imports, marker=marker))
+    (directory / "template.html").write_text("<p>{{ data.value }}</p>")
+    return str(path), marker
+
+
+def test_discover_plugins(tmp_path):
+    path, marker = write_plugin(tmp_path / "discovered", "Discovered Plugin")
+
+    declaration, = discover_plugins(path)
+    assert declaration.name == "Discovered Plugin"
+    assert declaration.class_name == "DiscoveredPlugin"
+    assert declaration.category is PluginCategory.NETWORK
+    assert declaration.description == "Plugin used to test discovery"
+    assert set(declaration.executors) == set(SystemPlatform)  # executors without platforms support all of them
+
+    executor = declaration.executors[SystemPlatform.detect()]
+    assert executor["produces"] == "test data"
+    assert executor["timeout"] == 30
+    assert executor["template_path"] == "template.html"
+
+    with pytest.raises(FileNotFoundError):  # discovering the plugin doesn't import it
+        open(marker)
+
+
+def test_dynamic_registration_isnt_static(tmp_path):
+    path = tmp_path / "dynamic.py"
+    path.write_text('''
+from networkguardian.framework.registry import register_plugin
+
+name = "Dynamic Plugin"
+
+
+@register_plugin(name, PluginCategory.OTHER, "Tests", 1.0)
+class DynamicPlugin:
+    pass
+''')
+
+    with pytest.raises(NotStaticError):
+        discover_plugins(str(path))
+
+
+def test_plugin_imported_once_resolved(tmp_path, registry):
+    path, marker = write_plugin(tmp_path / "plugins" / "lazy", "Lazy Plugin")
+    import_external_plugins(str(tmp_path / "plugins"))
+
+    plugin = registry["Lazy Plugin"]
+    assert isinstance(plugin, LazyPlugin)
+    plugin.load(SystemPlatform.detect(), True)
+
+    resolved = resolve_plugin(plugin)
+    assert isinstance(resolved, AbstractPlugin)
+    assert resolved.loaded
+    assert resolved.produces == "test data"
+    assert registry["Lazy Plugin"] is resolved
+    assert resolved.process() == {"value": 1}
+
+    open(marker).close()  # imported by resolving the plugin
+
+
+def test_failed_import_is_recorded(tmp_path, registry):
+    write_plugin(tmp_path / "plugins" / "broken", "Broken Plugin", imports="import missing_test_module")
+    import_external_plugins(str(tmp_path / "plugins"))
+
+    plugin = registry["Broken Plugin"]
+    assert isinstance(plugin, LazyPlugin)  # discovered without being imported, so it isn't known to be broken yet
+    plugin.load(SystemPlatform.detect(), True)
+
+    with pytest.raises(ImportError):
+        resolve_plugin(plugin)
+    assert isinstance(plugin.loading_exception, ImportError)
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from networkguardian.framework import persistence
+from networkguardian.framework.persistence import BackgroundWriter
+
+timeout = 5  # seconds before a test fails rather than hanging
+
+
+@pytest.fixture(autouse=True)
+def threaded(monkeypatch):
+    monkeypatch.setattr(persistence, "threading_enabled", True)
+
+
+def complete(batches: []):
+    """
+    :return: Returns a complete_batch function which records each batch, batches containing "bad" fail
+    """
+    def complete_batch(values: [str]) -> [str]:
+        batches.append(list(values))
+        if "bad" in values:
+            raise ValueError("Failed to index")
+        return [value.upper() for value in values]
+
+    return complete_batch
+
+
+def submit_batch(writer: BackgroundWriter, values: [str]) -> []:
+    """
+    Function submits the values while the writer is busy with another write, so they are completed as one batch
+    """
+    started = threading.Event()
+    release = threading.Event()
+    blocking = writer.submit(lambda: started.set() or release.wait(timeout) and "first")
+    started.wait(timeout)
+
+    submitted = [writer.submit(lambda value=value: value) for value in values]
+    release.set()
+    assert blocking.result(timeout) == "FIRST"
+    return submitted
+
+
+def test_writes_are_batched():
+    batches = []
+    writer = BackgroundWriter(complete(batches))
+
+    submitted = submit_batch(writer, ["a", "b", "c"])
+
+    assert writer.join(timeout)
+    assert [future.result() for future in submitted] == ["A", "B", "C"]
+    assert batches == [["first"], ["a", "b", "c"]]
+
+
+def test_failed_batch_is_completed_one_at_a_time():
+    batches = []
+    writer = BackgroundWriter(complete(batches))
+
+    submitted = submit_batch(writer, ["a", "bad", "c"])
+
+    assert writer.join(timeout)
+    assert submitted[0].result() == "A"
+    assert isinstance(submitted[1].exception(), ValueError)  # only the write which fails on its own is failed
+    assert submitted[2].result() == "C"
+    assert batches == [["first"], ["a", "bad", "c"], ["a"], ["bad"], ["c"]]
+
+
+def test_failed_write_isnt_completed():
+    batches = []
+    writer = BackgroundWriter(complete(batches))
+
+    def fail():
+        raise OSError("Disk full")
+
+    failed = writer.submit(fail)
+
+    assert writer.join(timeout)
+    assert isinstance(failed.exception(), OSError)
+    assert batches == []
+
+
+def test_join_timeout():
+    writer = BackgroundWriter(complete([]))
+    release = threading.Event()
+    writer.submit(lambda: release.wait(timeout) and "slow")
+
+    assert not writer.join(0.1)
+
+    release.set()
+    assert writer.join(timeout)
@@ -0,0 +1,135 @@
+import threading
+import time
+
+from networkguardian.framework import jobs
+from networkguardian.framework.jobs import JobState
+from networkguardian.framework.pool import FairThreadPool
+
+timeout = 5  # seconds before a test fails rather than hanging
+
+
+def test_burst_runs_concurrently():
+    pool = FairThreadPool(4, "Burst Test")
+    pool.submit("warm", lambda: None).result(timeout)  # leaves an idle thread, which used to take the whole burst
+
+    barrier = threading.Barrier(4, timeout=timeout)  # broken unless all four tasks run at once
+    burst = [pool.submit("report", barrier.wait) for _ in range(4)]
+
+    assert sorted(future.result(timeout) for future in burst) == [0, 1, 2, 3]
+    assert pool.workers == 4
+
+
+def test_owners_are_served_fairly():
+    pool = FairThreadPool(1, "Fair Test")
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def task(name: str):
+        order.append(name)
+        if name == "a1":
+            started.set()
+            release.wait(timeout)
+
+    futures = [pool.submit("a", task, "a1")]
+    started.wait(timeout)
+    futures += [pool.submit("a", task, name) for name in ("a2", "a3")]
+    futures.append(pool.submit("b", task, "b1"))
+    release.set()
+
+    for future in futures:
+        future.result(timeout)
+    assert order == ["a1", "a2", "b1", "a3"]  # b's task isn't queued behind every task of a
+
+
+def test_cancel_owner():
+    pool = FairThreadPool(1, "Cancel Test")
+    started = threading.Event()
+    release = threading.Event()
+    running = pool.submit("a", lambda: started.set() or release.wait(timeout))
+    started.wait(timeout)
+    queued = [pool.submit("a", lambda: None) for _ in range(3)]
+
+    assert pool.cancel("a") == 3
+    assert all(future.cancelled() for future in queued)
+
+    release.set()
+    assert running.result(timeout)
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_abandoned_task_is_replaced():
+    pool = FairThreadPool(2, "Abandon Test")
+    release = threading.Event()
+    hung = [pool.submit("hung", release.wait, timeout) for _ in range(2)]
+    wait_until(lambda: len(pool.running) == 2)  # both tasks have been taken by a thread
+
+    for future in hung:
+        pool.abandon(future)
+
+    assert pool.workers == 0
+    assert pool.submit("next", lambda: "done").result(timeout) == "done"
+
+    release.set()
+    for future in hung:
+        assert future.result(timeout)
+    wait_until(lambda: not pool.abandoned)  # the abandoned threads leave the pool once their tasks return
+    assert all(thread.is_alive() for thread in pool.threads)
+    assert pool.workers == len(pool.threads) <= 2
+
+
+class StubProcessor:
+    """
+    Stand-in for a ReportProcessor, the report keeps processing until it is released
+    """
+
+    def __init__(self, name: str):
+        self.report = type("Report", (), {"name": name})()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.stored = None
+        self.finished = False
+        self.events = []
+
+    def start(self):
+        self.started.set()
+        self.release.wait(timeout)
+
+    def add_event(self, event: {}):
+        self.events.append(event)
+
+    def cancel(self):
+        self.release.set()
+
+
+def test_max_reports(monkeypatch):
+    monkeypatch.setattr(jobs, "jobs", {})
+    monkeypatch.setattr(jobs, "threading_enabled", True)
+    monkeypatch.setattr(jobs, "max_reports", lambda: 1)
+
+    processors = [StubProcessor(name) for name in ("first", "second", "third")]
+    job_ids = [jobs.submit_job(processor) for processor in processors]
+    first, second, third = (jobs.jobs[job_id] for job_id in job_ids)
+
+    processors[0].started.wait(timeout)
+    assert [first.state, second.state, third.state] == [JobState.RUNNING, JobState.QUEUED, JobState.QUEUED]
+    assert third.position == 1
+
+    assert jobs.cancel_job(third.job_id)  # removed from the queue without being processed
+    assert third.state is JobState.FINISHED
+    assert not processors[2].started.is_set()
+
+    processors[0].release.set()  # the next job is admitted once the first finishes
+    assert processors[1].started.wait(timeout)
+    wait_until(lambda: first.state is JobState.FINISHED)
+    assert second.state is JobState.RUNNING
+
+    processors[1].release.set()
+    wait_until(lambda: second.state is JobState.FINISHED)
+    assert not processors[2].started.is_set()
@@ -0,0 +1,48 @@
+from networkguardian.exceptions import PluginProcessingError, PluginCancelledError
+from networkguardian.framework.plugin import PluginCategory, PluginInformation
+from networkguardian.framework.report import Report, ReportProcessor, open_report
+from networkguardian.framework.scheduler import PluginGraph
+from networkguardian.framework.storage import write_report
+
+template = "<p>{{ data }}</p>"
+
+
+class StubPlugin(PluginInformation):
+    """
+    Stands in for a loaded plugin, resuming a report only uses its information and what it produces and consumes
+    """
+
+    def __init__(self, name: str, produces: str = None, consumes: (str,) = ()):
+        super().__init__(name, PluginCategory.OTHER, "Tests", 1.0)
+        self.produces = produces
+        self.consumes = consumes
+
+
+def test_resume_skips_completed_plugins(tmp_path):
+    hosts = StubPlugin("Hosts", produces="hosts")
+    scan = StubPlugin("Scan", consumes=("hosts",))
+    failed = StubPlugin("Failed")
+    removed = StubPlugin("Removed")  # no longer available when the report is resumed
+
+    stored = Report("Resume Test")
+    stored.add_result(hosts, {"hosts": ["10.0.0.1"]}, template)
+    stored.add_unfinished(scan, PluginCancelledError("Report was cancelled"), checkpoints={"10.0.0.0/24": {"open": 1}})
+    stored.add_exception(failed, PluginProcessingError("Plugin failed"))
+    stored.add_result(removed, {"users": 1}, template)
+    path = str(tmp_path / "report.rng")
+    write_report(stored, path)
+
+    processor = ReportProcessor("Resume Test", [hosts, scan, failed])
+    processor.resume(1, open_report(path))
+    graph = PluginGraph(list(processor.plugins), weight=lambda plugin: 0)
+    processor.carry_over(graph)
+
+    assert processor.resumes == 1
+    assert processor.report.date == stored.date
+    assert processor.plugins == {hosts: True, scan: False, failed: True}  # failed plugins aren't processed again
+    assert [result.name for result in processor.report.results] == ["Hosts", "Failed", "Removed"]
+
+    # only the cancelled plugin is left to process, with the data of the carried over plugin and its checkpoints
+    assert graph.ready() == [scan]
+    assert graph.inputs(scan) == {"hosts": {"hosts": ["10.0.0.1"]}}
+    assert list(processor.checkpoints["Scan"]) == ["10.0.0.0/24"]
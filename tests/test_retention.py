@@ -0,0 +1,44 @@
+from datetime import date
+
+from networkguardian.framework.retention import RetentionPolicy, expired_reports, oversized_reports
+
+today = date(2024, 6, 30)
+
+
+def create_listing(*reports: (str, str)) -> [{}]:
+    """
+    :param reports: System name and date of each report, in the order they were indexed
+    :return: Rows in the form of ReportIndex.listing()
+    """
+    return [{"report_id": report_id, "system_name": system_name, "date": created}
+            for report_id, (system_name, created) in enumerate(reports, 1)]
+
+
+def test_unlimited_policy():
+    listing = create_listing(("server", "2020-01-01"), ("server", "2024-06-30"))
+
+    assert not RetentionPolicy().limited
+    assert expired_reports(RetentionPolicy(), listing, today) == []
+
+
+def test_keep_per_system():
+    listing = create_listing(("server", "2024-06-01"), ("laptop", "2024-06-02"), ("server", "2024-06-03"),
+                             ("server", "2024-06-04"), ("laptop", "2024-06-05"))
+
+    assert expired_reports(RetentionPolicy(keep_per_system=2), listing, today) == [1]
+    assert expired_reports(RetentionPolicy(keep_per_system=1), listing, today) == [1, 2, 3]
+
+
+def test_max_age():
+    listing = create_listing(("server", "2024-05-01"), ("server", "not a date"), ("laptop", "2024-06-29"))
+
+    # reports without a date they can be aged by are kept
+    assert expired_reports(RetentionPolicy(max_age=30), listing, today) == [1]
+
+
+def test_oversized_reports_keep_latest_of_each_system():
+    listing = create_listing(("server", "2024-06-01"), ("laptop", "2024-06-02"), ("server", "2024-06-03"),
+                             ("server", "2024-06-04"))
+
+    assert oversized_reports(RetentionPolicy(max_size=1), listing, set()) == [1, 3]
+    assert oversized_reports(RetentionPolicy(max_size=1), listing, {1}) == [3]  # already removed as expired
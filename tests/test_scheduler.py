@@ -0,0 +1,98 @@
+from networkguardian.framework import scheduler
+from networkguardian.framework.scheduler import PluginGraph, record_duration, estimate_duration
+
+
+class GraphPlugin:
+    """
+    Stands in for a plugin, the graph only uses what a plugin produces and consumes
+    """
+
+    def __init__(self, name: str, produces: str = None, consumes: (str,) = (), weight: float = 1.0):
+        self.name = name
+        self.produces = produces
+        self.consumes = consumes
+        self.weight = weight
+
+    def __repr__(self):
+        return self.name
+
+
+def create_graph(*plugins: GraphPlugin) -> PluginGraph:
+    return PluginGraph(plugins, weight=lambda plugin: plugin.weight)
+
+
+def run(graph: PluginGraph) -> [[str]]:
+    """
+    :return: Returns the names of the plugins released each time the graph was asked for the plugins which are ready
+    """
+    released = []
+    while not graph.finished:
+        ready = graph.ready()
+        assert ready, "the graph stopped releasing plugins before it finished"
+        released.append([plugin.name for plugin in ready])
+        for plugin in ready:
+            graph.complete(plugin, {"from": plugin.name})
+
+    return released
+
+
+def test_dependencies_run_first():
+    hosts = GraphPlugin("hosts", produces="hosts")
+    ports = GraphPlugin("ports", produces="ports", consumes=("hosts",))
+    vulnerabilities = GraphPlugin("vulnerabilities", consumes=("hosts", "ports"))
+
+    assert run(create_graph(vulnerabilities, ports, hosts)) == [["hosts"], ["ports"], ["vulnerabilities"]]
+
+
+def test_inputs():
+    hosts = GraphPlugin("hosts", produces="hosts")
+    ports = GraphPlugin("ports", consumes=("hosts", "users"))  # nothing produces users, so it isn't waited for
+    graph = create_graph(hosts, ports)
+
+    assert [plugin.name for plugin in graph.ready()] == ["hosts"]
+    graph.complete(hosts, {"address": "10.0.0.1"})
+    assert graph.ready() == [ports]
+    assert graph.inputs(ports) == {"hosts": {"address": "10.0.0.1"}}
+
+
+def test_failed_producer_releases_consumers():
+    hosts = GraphPlugin("hosts", produces="hosts")
+    ports = GraphPlugin("ports", consumes=("hosts",))
+    graph = create_graph(hosts, ports)
+
+    graph.ready()
+    graph.complete(hosts, None)  # failed plugins complete without data
+
+    assert graph.ready() == [ports]
+    assert graph.inputs(ports) == {}
+
+
+def test_cycles_are_broken():
+    first = GraphPlugin("first", produces="a", consumes=("b",))
+    second = GraphPlugin("second", produces="b", consumes=("a",))
+    after = GraphPlugin("after", consumes=("a",))
+
+    released = run(create_graph(first, second, after))
+    assert sorted(released[0]) == ["first", "second"]  # run without the outputs of each other
+    assert released[1:] == [["after"]]
+
+
+def test_critical_path_first():
+    short = GraphPlugin("short", weight=5)
+    long_start = GraphPlugin("long start", produces="hosts", weight=2)
+    long_end = GraphPlugin("long end", consumes=("hosts",), weight=10)
+    quick = GraphPlugin("quick", weight=1)
+
+    graph = create_graph(quick, short, long_start, long_end)
+    assert graph.priorities[long_start] == 12
+    assert [plugin.name for plugin in graph.ready()] == ["long start", "short", "quick"]
+
+
+def test_record_duration(monkeypatch):
+    monkeypatch.setattr(scheduler, "plugin_durations", {})
+    plugin = GraphPlugin("timed")
+
+    assert estimate_duration(plugin) == 1.0
+    record_duration(plugin, 10)
+    record_duration(plugin, 20)
+    assert estimate_duration(plugin) == 10 + scheduler.duration_smoothing * 10
@@ -0,0 +1,77 @@
+import pickle
+import socket
+from collections import namedtuple
+
+import pytest
+
+from networkguardian.framework.plugin import SystemPlatform
+from networkguardian.framework.snapshot import SystemSnapshot
+
+# the parts of psutil's interface tuples the snapshot uses
+Address = namedtuple("Address", ("family", "address", "netmask"))
+Stats = namedtuple("Stats", ("isup",))
+
+
+def create_snapshot() -> SystemSnapshot:
+    interfaces = {
+        "lo": [Address(socket.AF_INET, "127.0.0.1", "255.0.0.0")],
+        "eth0": [Address(socket.AF_INET, "192.168.1.10", "255.255.255.0"),
+                 Address(socket.AF_INET6, "fe80::1", "ffff:ffff:ffff:ffff::"),
+                 Address(socket.AF_INET6, "2001:db8::10", "ffff:ffff:ffff:ffff::"),
+                 Address(-1, "00:11:22:33:44:55", None)],
+        "eth1": [Address(socket.AF_INET, "10.0.0.10", "255.0.0.0")],
+        "wlan0": [Address(socket.AF_INET, "172.16.0.10", "255.255.0.0")],
+    }
+    stats = {"lo": Stats(True), "eth0": Stats(True), "eth1": Stats(False)}  # wlan0 has no statistics
+    return SystemSnapshot(interfaces, stats, {"eth0": (1, 2)}, {1: "init"}, {"system_name": "server"})
+
+
+def test_capture():
+    snapshot = SystemSnapshot.capture()
+
+    assert snapshot.platform_information["system_platform"] is SystemPlatform.detect()
+    assert snapshot.interfaces
+    assert all(isinstance(addresses, tuple) for addresses in snapshot.interfaces.values())
+    assert all(isinstance(pid, int) for pid in snapshot.processes)
+
+
+def test_immutable():
+    snapshot = create_snapshot()
+
+    with pytest.raises(AttributeError):
+        snapshot.processes = {}
+    with pytest.raises(AttributeError):
+        del snapshot.interfaces
+    with pytest.raises(TypeError):  # the dictionaries are read only views
+        snapshot.processes[2] = "kthreadd"
+    with pytest.raises(TypeError):
+        snapshot.interfaces["eth0"] = ()
+
+    assert snapshot.processes == {1: "init"}
+
+
+def test_snapshot_is_copied():
+    processes = {1: "init"}
+    snapshot = SystemSnapshot({}, {}, {}, processes, {})
+    processes[2] = "kthreadd"
+
+    assert dict(snapshot.processes) == {1: "init"}
+
+
+def test_pickle_round_trip():
+    snapshot = create_snapshot()
+    copied = pickle.loads(pickle.dumps(snapshot))  # as done when it is sent to a worker process
+
+    assert isinstance(copied, SystemSnapshot)
+    for name in SystemSnapshot.__slots__:
+        assert dict(getattr(copied, name)) == dict(getattr(snapshot, name))
+
+    with pytest.raises(TypeError):
+        copied.processes[2] = "kthreadd"
+
+
+def test_usable_addresses():
+    usable = [(name, address.address) for name, address in create_snapshot().usable_addresses()]
+
+    # loopback, link local and MAC addresses are skipped, as are interfaces which are down or have no statistics
+    assert usable == [("eth0", "192.168.1.10"), ("eth0", "2001:db8::10")]
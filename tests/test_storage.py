@@ -0,0 +1,142 @@
+import os
+import random
+import shutil
+import string
+
+import pytest
+
+from conftest import create_plugin
+from networkguardian.exceptions import PluginProcessingError, PluginCancelledError
+from networkguardian.framework.report import Report, open_report
+from networkguardian.framework.storage import write_report, ReportFormatError, header_format, MAGIC, ReportWriter, \
+    report_information, recover_report, record_format, RECORD_MAGIC, FORMAT_VERSION, shared_sections_directory, \
+    remove_shared_sections
+
+template = "<p>{{ data }}</p>"
+
+
+def create_report(data) -> Report:
+    report = Report("Storage Test")
+    report.add_result(create_plugin("Data Plugin"), data, template)
+    report.add_exception(create_plugin("Failed Plugin"), PluginProcessingError("Plugin failed"))
+    return report
+
+
+def write(report: Report, directory) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "report.rng")
+    write_report(report, path)
+    return path
+
+
+def test_round_trip(tmp_path):
+    data = {"ports": {22: "ssh", 80: "http"}, "address": ("10.0.0.1", 24), "flags": {"up"}, "raw": b"\x00\x01"}
+    path = write(create_report(data), tmp_path / "reports")
+
+    report = open_report(path)
+    assert report.name == "Storage Test"
+    assert [result.name for result in report.results] == ["Data Plugin", "Failed Plugin"]
+
+    stored, failed = report.results
+    assert stored.data == data
+    assert stored.template == template
+    assert stored.exception is None
+
+    assert failed.data is None
+    assert isinstance(failed.exception, PluginProcessingError)
+    assert "Plugin failed" in str(failed.exception)
+
+
+def test_copied_report(tmp_path):
+    data = {"users": {"root": "root", "owen": "users"}}
+    path = write(create_report(data), tmp_path / "reports")
+
+    copied_path = tmp_path / "copied.rng"
+    shutil.copy(path, copied_path)
+
+    report = open_report(str(copied_path))
+    assert report.results[0].data == data
+    assert report.results[0].template == template
+
+
+def test_large_data_is_shared(tmp_path):
+    generator = random.Random(0)  # random text doesn't compress below the size sections are shared at
+    data = {"lines": ["".join(generator.choices(string.ascii_letters, k=64)) for _ in range(256)]}
+    directory = tmp_path / "reports"
+    first_path = write(create_report(data), directory)
+    second_path = os.path.join(directory, "second.rng")
+    write_report(create_report(data), second_path)
+
+    assert len(os.listdir(directory / shared_sections_directory)) == 1  # the same data is only stored once
+    assert open_report(first_path).results[0].data == data
+    assert open_report(second_path).results[0].data == data
+
+    # the template is kept within the report file, the shared data is reported as missing rather than not found
+    copied_path = tmp_path / "copied.rng"
+    shutil.copy(first_path, copied_path)
+    copied = open_report(str(copied_path))
+    assert copied.results[0].template == template
+    with pytest.raises(ReportFormatError):
+        copied.results[0].data
+
+
+def test_unused_shared_sections_are_removed(tmp_path):
+    generator = random.Random(1)
+    data = {"lines": ["".join(generator.choices(string.ascii_letters, k=64)) for _ in range(256)]}
+    directory = tmp_path / "reports"
+    write(create_report(data), directory)
+    digests = os.listdir(directory / shared_sections_directory)
+
+    # sections written within the grace period may be used by a report which is still being stored
+    assert remove_shared_sections(str(directory), digests, grace_period=3600) == 0
+    assert remove_shared_sections(str(directory), digests) > 0
+    assert os.listdir(directory / shared_sections_directory) == []
+
+
+def test_unsupported_format(tmp_path):
+    path = write(create_report({"users": {}}), tmp_path / "reports")
+    with open(path, "r+b") as f:
+        f.write(header_format.pack(MAGIC, 2))
+
+    with pytest.raises(ReportFormatError, match="Report format 2 is not supported"):
+        open_report(path)
+
+
+def test_recover_truncated_report(tmp_path):
+    report = create_report({"users": {"root": "root"}})
+    plugins = report.results + [create_plugin("Scan Plugin")]
+    path = str(tmp_path / "report.part")
+
+    with open(path, "wb") as f:
+        writer = ReportWriter(f)
+        writer.write_information(report_information(report), plugins)
+        writer.write_result(report.results[0])
+        writer.write_checkpoint("Scan Plugin", "10.0.0.0/24", {"hosts": 1})
+        complete = f.tell()
+
+        # the application stopped part of the way through writing the next record
+        f.write(record_format.pack(RECORD_MAGIC, 1024, 1024) + b"\x00" * 100)
+
+    manifest = recover_report(path)
+
+    assert manifest["interrupted"]
+    assert os.path.getsize(path) > complete  # the partial record is replaced by the manifest
+
+    recovered = open_report(path)
+    assert [result.name for result in recovered.results] == ["Data Plugin", "Failed Plugin", "Scan Plugin"]
+
+    stored, failed, scan = recovered.results
+    assert stored.data == {"users": {"root": "root"}}
+    assert stored.template == template
+    for result in (failed, scan):  # neither plugin's result was written before the application stopped
+        assert isinstance(result.exception, PluginCancelledError)
+        assert result.data is None
+    assert list(scan.checkpoint_sections) == ["10.0.0.0/24"]
+
+
+def test_recover_empty_report(tmp_path):
+    path = tmp_path / "report.part"
+    path.write_bytes(header_format.pack(MAGIC, FORMAT_VERSION))
+
+    with pytest.raises(ReportFormatError):
+        recover_report(str(path))
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from networkguardian.framework.plugin import load_template
+from networkguardian.framework.templating import get_template, render, template_sources
+
+
+def test_template_is_read_once(tmp_path):
+    path = tmp_path / "template.html"
+    path.write_text("<p>{{ data }}</p>")
+    assert load_template(str(path)) == "<p>{{ data }}</p>"
+
+    stat = os.stat(path)
+    path.write_text("<b>{{ data }}</b>")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # unchanged modification time, the cached copy is used
+
+    assert load_template(str(path)) == "<p>{{ data }}</p>"
+
+
+def test_template_is_reloaded_when_modified(tmp_path):
+    path = tmp_path / "template.html"
+    path.write_text("<p>{{ data }}</p>")
+    assert load_template(str(path)) == "<p>{{ data }}</p>"
+
+    stat = os.stat(path)
+    path.write_text("<b>{{ data }}</b>")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert load_template(str(path)) == "<b>{{ data }}</b>"
+
+
+def test_removed_template(tmp_path):
+    path = tmp_path / "template.html"
+    path.write_text("<p>{{ data }}</p>")
+    load_template(str(path))
+
+    os.remove(path)
+    assert load_template(str(path)) == "<p>{{ data }}</p>"  # the last contents read are kept
+
+    with pytest.raises(OSError):
+        load_template(str(tmp_path / "missing.html"))
+
+
+def test_compiled_template_is_shared():
+    source = "<p>{{ data | length }}</p>"
+
+    assert get_template(source) is get_template(source)
+    assert render(source, {"data": [1, 2]}) == "<p>2</p>"
+    assert template_sources == {}  # sources are only held while they are compiled